@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARP suppression check on the lab topology
+─────────────────────────────────────────────────────────────
+• Starts ryu_app.py once per SDN_ARP_SUPPRESSION mode (off, controller,
+  flows) and the LabTopology against it
+• h1/h2 (VLAN 10) and h3/h4 (VLAN 20) each emulate many hosts with raw
+  ARP frames: announce every binding, then ask for random peers on the
+  other host and answer requests for their own addresses
+• r1/r2 only listen: every request they see for someone else is a
+  flooded frame that suppression should have saved
+• Prints flooded frames, answered requests and controller counters
+  (read from the metrics endpoint) per mode
+
+Usage: sudo python3 arp_suppression.py [--hosts 40] [--rate 50] [--modes off controller flows]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from mininet.net import Mininet
+from mininet.node import OVSSwitch, RemoteController
+from mininet.link import TCLink
+from mininet.log import setLogLevel, info
+
+from topology import LabTopology
+
+SDN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sdn')
+
+# ─── ANSI Colors ─────────────────────────────────────────────
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+RESET = "\033[0m"
+
+METRICS_PORT = 9180
+SIM_PATH = "/tmp/arp_sim.py"
+
+# Emulated hosts behind one interface: argv = iface tag net first count peer_first peer_count duration rate
+ARP_SIM = r"""
+import json, random, socket, struct, sys, time
+iface, net = sys.argv[1], sys.argv[3]
+tag, first, count, peer_first, peer_count = map(int, sys.argv[2:3] + sys.argv[4:8])
+duration, rate = float(sys.argv[8]), float(sys.argv[9])
+own = {socket.inet_aton(f'{net}.{first + i}'): bytes([2, 0, 0, 0, tag, i]) for i in range(count)}
+peers = [socket.inet_aton(f'{net}.{peer_first + i}') for i in range(peer_count)]
+BCAST = b'\xff' * 6
+
+def frame(dst, src, op, sha, spa, tha, tpa):
+    body = struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, op, sha, spa, tha, tpa)
+    return (dst + src + b'\x08\x06' + body).ljust(60, b'\0')
+
+s = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(0x0806))
+s.bind((iface, 0))
+s.setblocking(False)
+for ip, mac in own.items():
+    s.send(frame(BCAST, mac, 1, mac, ip, bytes(6), ip))
+time.sleep(2)
+
+counts = {'sent': 0, 'replies': 0, 'answered': 0, 'flooded': 0}
+end = time.time() + duration
+next_send = time.time()
+while time.time() < end:
+    if peers and time.time() >= next_send:
+        ip, mac = random.choice(list(own.items()))
+        s.send(frame(BCAST, mac, 1, mac, ip, bytes(6), random.choice(peers)))
+        counts['sent'] += 1
+        next_send += 1.0 / rate
+    try:
+        data, addr = s.recvfrom(2048)
+    except BlockingIOError:
+        time.sleep(0.001)
+        continue
+    if addr[2] == socket.PACKET_OUTGOING or len(data) < 42 or data[12:14] != b'\x08\x06':
+        continue
+    op, sha, spa, tha, tpa = struct.unpack('!H6s4s6s4s', data[20:42])
+    if op == 1 and tpa in own:
+        s.send(frame(sha, own[tpa], 2, own[tpa], tpa, sha, spa))
+        counts['answered'] += 1
+    elif op == 1 and spa != tpa:
+        counts['flooded'] += 1
+    elif op == 2 and tha in own.values():
+        counts['replies'] += 1
+print(json.dumps(counts))
+"""
+
+# (node, interface, tag, subnet, first, count, peer first, peer count); count 0 = listener
+def sim_plan(n):
+    return [
+        ("h1", "h1-eth0", 1, "10.10.10", 100, n, 150, n),
+        ("h2", "h2-eth0", 2, "10.10.10", 150, n, 100, n),
+        ("r1", "r1-left", 3, "10.10.10", 0, 0, 0, 0),
+        ("h3", "h3-eth0", 4, "10.20.20", 100, n, 150, n),
+        ("h4", "h4-eth0", 5, "10.20.20", 150, n, 100, n),
+        ("r2", "r2-right", 6, "10.20.20", 0, 0, 0, 0),
+    ]
+
+def controller_counters():
+    """events_total samples from the controller's metrics endpoint"""
+    body = urllib.request.urlopen(f"http://127.0.0.1:{METRICS_PORT}/metrics", timeout=2).read().decode()
+    counters = {}
+    for line in body.splitlines():
+        if line.startswith('sdn_events_total{event="'):
+            name, value = line[len('sdn_events_total{event="'):].split('"} ')
+            counters[name] = float(value)
+    return counters
+
+# ─── One run ─────────────────────────────────────────────────
+def run(mode, args):
+    env = dict(os.environ, SDN_ARP_SUPPRESSION=mode, SDN_METRICS_PORT=str(METRICS_PORT))
+    ryu = subprocess.Popen(["ryu-manager", "ryu_app.py"], cwd=SDN_DIR, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(3)
+    net = Mininet(topo=LabTopology(), switch=OVSSwitch, link=TCLink,
+                  controller=RemoteController("c0", ip="127.0.0.1", port=6653),
+                  autoSetMacs=True)
+    try:
+        net.start()
+        for sw in net.switches:
+            sw.cmd(f"ovs-vsctl set-fail-mode {sw.name} secure")
+        time.sleep(args.settle)
+
+        before = controller_counters()
+        plan = sim_plan(args.hosts)
+        for node, intf, tag, subnet, first, count, peer_first, peer_count in plan:
+            net[node].sendCmd(f"{sys.executable} {SIM_PATH} {intf} {tag} {subnet} {first} {count} "
+                              f"{peer_first} {peer_count} {args.duration} {args.rate}")
+        totals = {'sent': 0, 'replies': 0, 'answered': 0, 'flooded': 0}
+        for node, *_ in plan:
+            result = json.loads(net[node].waitOutput().strip().splitlines()[-1])
+            for key, value in result.items():
+                totals[key] += value
+        after = controller_counters()
+
+        for key in ('packets_in', 'arp_flooded', 'arp_suppressed', 'garp_absorbed'):
+            totals[f'ctl_{key}'] = int(after.get(key, 0) - before.get(key, 0))
+        info(f"{CYAN}{mode}: {totals}{RESET}\n")
+        return totals
+    finally:
+        net.stop()
+        ryu.terminate()
+        ryu.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Flooded ARP frames per suppression mode")
+    parser.add_argument("--hosts", type=int, default=40, help="emulated hosts per active node")
+    parser.add_argument("--rate", type=float, default=50.0, help="ARP requests/s per active node")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--settle", type=float, default=12.0, help="seconds for LLDP discovery")
+    parser.add_argument("--modes", nargs="+", default=["off", "controller", "flows"])
+    args = parser.parse_args()
+
+    setLogLevel("info")
+    with open(SIM_PATH, "w") as f:
+        f.write(ARP_SIM)
+    results = {mode: run(mode, args) for mode in args.modes}
+
+    base = results[args.modes[0]]['flooded'] or 1
+    print(f"\n{CYAN}Mode        Sent  Answered  Flooded  vs {args.modes[0]:<6} PacketIn{RESET}")
+    for mode, r in results.items():
+        color = GREEN if r['replies'] >= 0.95 * r['sent'] else YELLOW
+        print(f"{color}{mode:<10} {r['sent']:>5} {r['replies']:>9} {r['flooded']:>8} "
+              f"{r['flooded'] / base:>8.1%} {r['ctl_packets_in']:>9}{RESET}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Non-interactive throughput/latency benchmark matrix
+─────────────────────────────────────────────────────────────
+• iperf TCP and UDP (rate, jitter, loss) for every host pair given
+• ping RTT percentiles, and first-packet latency after the pair's
+  flows and neighbour entries are wiped (controller round trip)
+• Flow setup rate: back-to-back short TCP connections per second
+• Results + environment metadata (kernel, OVS, git revision, args)
+  written as JSON and a flat CSV so runs can be diffed
+
+Used by topology.py --benchmark; run(net, pairs, args) works on any
+started Mininet network.
+"""
+
+import csv
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+
+CONNECT_SERVER_PORT = 5801
+SCRIPT_DIR = "/tmp"
+
+# Accepts and closes connections forever
+CONNECT_SERVER = r"""
+import socket, sys
+s = socket.socket()
+s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+s.bind(('', int(sys.argv[1])))
+s.listen(1024)
+while True:
+    c, _ = s.accept()
+    c.close()
+"""
+
+# argv = ip port count; prints {"rate": conns/s, "p50_ms", "p99_ms", "errors"}
+CONNECT_CLIENT = r"""
+import json, socket, sys, time
+ip, port, n = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+lat, errors = [], 0
+start = time.perf_counter()
+for _ in range(n):
+    t = time.perf_counter()
+    try:
+        socket.create_connection((ip, port), timeout=2).close()
+        lat.append(time.perf_counter() - t)
+    except OSError:
+        errors += 1
+elapsed = time.perf_counter() - start
+lat.sort()
+pick = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else None
+print(json.dumps({'rate': len(lat) / elapsed, 'p50_ms': pick(0.5), 'p99_ms': pick(0.99), 'errors': errors}))
+"""
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def host_ip(host):
+    return host.IP()
+
+
+# ─── Tests ───────────────────────────────────────────────────
+def ping_rtt(src, dst, count):
+    out = src.cmd(f"ping -c {count} -i 0.01 -W 1 {host_ip(dst)}")
+    rtts = [float(t) for t in re.findall(r"time=([\d.]+) ms", out)]
+    return {'sent': count, 'received': len(rtts),
+            'p50_ms': percentile(rtts, 0.5), 'p90_ms': percentile(rtts, 0.9),
+            'p99_ms': percentile(rtts, 0.99), 'max_ms': max(rtts) if rtts else None}
+
+
+def first_packet(net, src, dst):
+    """RTT of the first ping once the switches and both hosts forgot the path"""
+    # Host flows (L2 table) and host routes (L3 table) of ryu_app.py
+    flows = [f"table=2,dl_dst={h.MAC()}" for h in (src, dst)]
+    flows += [f"table=1,ip,nw_dst={host_ip(h)}" for h in (src, dst)]
+    for sw in net.switches:
+        for flow in flows:
+            sw.cmd(f"ovs-ofctl -O OpenFlow13 del-flows {sw.name} '{flow}'")
+    for host in (src, dst):
+        host.cmd("ip neigh flush all")
+    out = src.cmd(f"ping -c 1 -W 2 {host_ip(dst)}")
+    match = re.search(r"time=([\d.]+) ms", out)
+    return {'first_ms': float(match.group(1)) if match else None}
+
+
+def iperf_tcp(src, dst, duration):
+    from ecmp_iperf import parse_mbps
+    dst.cmd("iperf -s -D")
+    time.sleep(0.5)
+    mbps = parse_mbps(src.cmd(f"iperf -c {host_ip(dst)} -t {duration} -f m"))
+    dst.cmd("pkill -f 'iperf -s'")
+    return {'mbps': mbps}
+
+
+def iperf_udp(src, dst, duration, rate):
+    dst.cmd("iperf -s -u -D")
+    time.sleep(0.5)
+    out = src.cmd(f"iperf -c {host_ip(dst)} -u -b {rate}M -t {duration} -f m")
+    dst.cmd("pkill -f 'iperf -s'")
+    # Server report: "<rate> Mbits/sec  <jitter> ms  <lost>/<total> (<pct>%)"
+    match = re.search(r"([\d.]+) Mbits/sec\s+([\d.]+) ms\s+(\d+)/\s*(\d+)", out)
+    if not match:
+        return {'mbps': None, 'jitter_ms': None, 'loss_pct': None}
+    lost, total = int(match.group(3)), int(match.group(4))
+    return {'mbps': float(match.group(1)), 'jitter_ms': float(match.group(2)),
+            'loss_pct': 100.0 * lost / total if total else None}
+
+
+def connect_rate(src, dst, count):
+    dst.cmd(f"python3 {SCRIPT_DIR}/bench_server.py {CONNECT_SERVER_PORT} &")
+    time.sleep(0.5)
+    out = src.cmd(f"python3 {SCRIPT_DIR}/bench_client.py {host_ip(dst)} {CONNECT_SERVER_PORT} {count}")
+    dst.cmd("pkill -f bench_server.py")
+    try:
+        return json.loads(out.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return {'rate': None, 'p50_ms': None, 'p99_ms': None, 'errors': count}
+
+
+# ─── Matrix ──────────────────────────────────────────────────
+def environment(args):
+    def probe(cmd):
+        try:
+            return subprocess.check_output(cmd, text=True, stderr=subprocess.DEVNULL).strip().splitlines()[0]
+        except (OSError, subprocess.CalledProcessError, IndexError):
+            return None
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'hostname': platform.node(),
+        'kernel': platform.release(),
+        'python': platform.python_version(),
+        'ovs': probe(["ovs-vsctl", "--version"]),
+        'mininet': probe(["mn", "--version"]),
+        'git_revision': probe(["git", "-C", repo, "rev-parse", "HEAD"]),
+        'args': vars(args),
+    }
+
+
+def run(net, pairs, args):
+    """Run the matrix over [(src name, dst name)], returns the result document"""
+    with open(f"{SCRIPT_DIR}/bench_server.py", "w") as f:
+        f.write(CONNECT_SERVER)
+    with open(f"{SCRIPT_DIR}/bench_client.py", "w") as f:
+        f.write(CONNECT_CLIENT)
+
+    results = []
+    for src_name, dst_name in pairs:
+        src, dst = net[src_name], net[dst_name]
+        tests = [
+            ('first_packet', lambda: first_packet(net, src, dst)),
+            ('ping', lambda: ping_rtt(src, dst, args.pings)),
+            ('tcp', lambda: iperf_tcp(src, dst, args.duration)),
+            ('udp', lambda: iperf_udp(src, dst, args.duration, args.udp_rate)),
+            ('connect', lambda: connect_rate(src, dst, args.connections)),
+        ]
+        for test, fn in tests:
+            start = time.time()
+            metrics = fn()
+            results.append({'test': test, 'src': src_name, 'dst': dst_name,
+                            'seconds': round(time.time() - start, 3), 'metrics': metrics})
+            print(f"{test:>12} {src_name}->{dst_name}: {metrics}")
+    return {'environment': environment(args), 'results': results}
+
+
+def write(doc, json_path, csv_path=None):
+    with open(json_path, "w") as f:
+        json.dump(doc, f, indent=1)
+    if csv_path:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "git_revision", "test", "src", "dst", "metric", "value"])
+            env = doc['environment']
+            for row in doc['results']:
+                for metric, value in row['metrics'].items():
+                    writer.writerow([env['timestamp'], env['git_revision'], row['test'],
+                                     row['src'], row['dst'], metric, value])
+
+
+def add_arguments(parser):
+    parser.add_argument("--benchmark", metavar="JSON", help="run the benchmark matrix, write results and exit")
+    parser.add_argument("--csv", help="also write a flat CSV")
+    parser.add_argument("--duration", type=int, default=10, help="iperf seconds per test")
+    parser.add_argument("--udp-rate", type=int, default=50, help="iperf UDP Mbps")
+    parser.add_argument("--pings", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=500)
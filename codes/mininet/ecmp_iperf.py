@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multipath throughput check on the lab topology
+─────────────────────────────────────────────────────────────
+• Same LabTopology/TCLink limits as topology.py (s1-s3 direct 100 Mbps,
+  via s2 300 Mbps), controller must run with MULTIPATH = True
+• h1/h2 get addresses in the controller's VLAN 10/20 gateway subnets
+  so their traffic is routed by s1 and crosses the s1 -> s3 paths
+• Parallel iperf flows to h3/h4; aggregate must beat the best
+  single path (300 Mbps) for the check to pass
+
+Usage: sudo python3 ecmp_iperf.py [--controller-ip IP] [--flows 8]
+"""
+
+import argparse
+import re
+import time
+
+from mininet.net import Mininet
+from mininet.node import OVSSwitch, RemoteController
+from mininet.link import TCLink
+from mininet.log import setLogLevel, info
+
+from topology import LabTopology
+
+# ─── ANSI Colors ─────────────────────────────────────────────
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+RESET = "\033[0m"
+
+SINGLE_PATH_MBPS = 300
+
+# Controller gateways (ryu_app.gateway_ips) and test addresses
+ADDRESSES = {
+    "h1": ("10.0.10.11/24", "10.0.10.254"),
+    "h2": ("10.0.10.12/24", "10.0.10.254"),
+    "h3": ("10.0.20.11/24", "10.0.20.254"),
+    "h4": ("10.0.20.12/24", "10.0.20.254"),
+}
+
+def configure_hosts(net):
+    for name, (addr, gw) in ADDRESSES.items():
+        host = net[name]
+        host.cmd(f"ip addr add {addr} dev {host.defaultIntf()}")
+        subnet = "10.0.20.0/24" if gw.startswith("10.0.10.") else "10.0.10.0/24"
+        host.cmd(f"ip route replace {subnet} via {gw}")
+
+def parse_mbps(output):
+    """Sum of the [SUM] (or single) iperf bandwidth line, in Mbps"""
+    rates = re.findall(r"([\d.]+)\s+([KMG])bits/sec", output)
+    if not rates:
+        return 0.0
+    value, unit = rates[-1]
+    return float(value) * {"K": 1e-3, "M": 1.0, "G": 1e3}[unit]
+
+def main():
+    parser = argparse.ArgumentParser(description="Multipath iperf check")
+    parser.add_argument("--controller-ip", default="127.0.0.1")
+    parser.add_argument("--flows", type=int, default=8, help="parallel TCP flows per client")
+    parser.add_argument("--duration", type=int, default=15)
+    args = parser.parse_args()
+
+    setLogLevel("info")
+    net = Mininet(topo=LabTopology(), switch=OVSSwitch, link=TCLink,
+                  controller=RemoteController("c0", ip=args.controller_ip, port=6653),
+                  autoSetMacs=True)
+    try:
+        net.start()
+        for sw in net.switches:
+            sw.cmd(f"ovs-vsctl set-fail-mode {sw.name} secure")
+        configure_hosts(net)
+
+        # Let LLDP find the links, then resolve ARP both ways
+        info(f"{YELLOW}Waiting for topology discovery...{RESET}\n")
+        time.sleep(12)
+        for src, dst in (("h1", "h3"), ("h2", "h4")):
+            net[src].cmd(f"ping -c 3 -W 1 {ADDRESSES[dst][0].split('/')[0]}")
+
+        for server in ("h3", "h4"):
+            net[server].cmd("iperf -s -D")
+        time.sleep(1)
+
+        clients = [("h1", "h3"), ("h2", "h4")]
+        for src, dst in clients:
+            ip = ADDRESSES[dst][0].split("/")[0]
+            net[src].sendCmd(f"iperf -c {ip} -P {args.flows} -t {args.duration}")
+        total = 0.0
+        for src, dst in clients:
+            mbps = parse_mbps(net[src].waitOutput())
+            info(f"{CYAN}{src} -> {dst}: {mbps:.1f} Mbps{RESET}\n")
+            total += mbps
+
+        for sw in ("s1", "s3"):
+            info(net[sw].cmd(f"ovs-ofctl -O OpenFlow13 dump-group-stats {sw}"))
+
+        verdict = GREEN + "PASS" if total > SINGLE_PATH_MBPS else YELLOW + "FAIL"
+        print(f"{verdict}: aggregate {total:.1f} Mbps vs single-path limit {SINGLE_PATH_MBPS} Mbps{RESET}")
+    finally:
+        for server in ("h3", "h4"):
+            net[server].cmd("pkill -f 'iperf -s'")
+        net.stop()
+
+if __name__ == "__main__":
+    main()
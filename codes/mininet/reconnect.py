@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controller restart recovery on the lab topology
+─────────────────────────────────────────────────────────────
+• Per SDN_RECONNECT mode (clear, reconcile): start ryu_app.py and the
+  LabTopology, learn every host with pingAll, then keep pings running
+  across a controller kill + restart
+• Switches are fail-mode secure, so their flows outlive the controller;
+  the mode decides whether the restarted controller wipes them
+• Reports the longest ping outage per pair after the restart, and what
+  the new controller did in its first seconds: PacketIns, OpenFlow
+  messages sent, flows kept/added/deleted by reconciliation
+
+Usage: sudo python3 reconnect.py [--modes clear reconcile] [--down 1] [--window 10]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import time
+import urllib.request
+
+from mininet.net import Mininet
+from mininet.node import OVSSwitch, RemoteController
+from mininet.link import TCLink
+from mininet.log import setLogLevel, info
+
+from topology import LabTopology
+
+SDN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sdn')
+
+# ─── ANSI Colors ─────────────────────────────────────────────
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+RESET = "\033[0m"
+
+METRICS_PORT = 9180
+PING_INTERVAL = 0.01
+PAIRS = [("h1", "h2"), ("h1", "h3"), ("h2", "h4")]
+
+
+def start_controller(mode):
+    env = dict(os.environ, SDN_RECONNECT=mode, SDN_METRICS_PORT=str(METRICS_PORT))
+    return subprocess.Popen(["ryu-manager", "ryu_app.py"], cwd=SDN_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_controller(ryu):
+    ryu.terminate()
+    ryu.wait()
+
+
+def metric_sums():
+    """{metric name or events_total event: value} from the metrics endpoint"""
+    body = urllib.request.urlopen(f"http://127.0.0.1:{METRICS_PORT}/metrics", timeout=2).read().decode()
+    sums = {}
+    for line in body.splitlines():
+        match = re.match(r'sdn_(\w+)(?:\{([^}]*)\})? ([\d.e+-]+)$', line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        if name == 'events_total':
+            name = re.search(r'event="(\w+)"', labels).group(1)
+        sums[name] = sums.get(name, 0) + float(value)
+    return sums
+
+
+def wait_metrics(timeout=15):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            return metric_sums()
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("controller metrics endpoint did not come up")
+
+
+def longest_gap_ms(path):
+    """Longest run of missing echo replies in a ping log, in ms"""
+    with open(path) as f:
+        seqs = sorted(int(s) for s in re.findall(r"icmp_seq=(\d+)", f.read()))
+    gap = max((b - a for a, b in zip(seqs, seqs[1:])), default=0)
+    return round(max(gap - 1, 0) * PING_INTERVAL * 1000, 1)
+
+
+# ─── One run ─────────────────────────────────────────────────
+def run(mode, args):
+    ryu = start_controller(mode)
+    time.sleep(3)
+    net = Mininet(topo=LabTopology(), switch=OVSSwitch, link=TCLink,
+                  controller=RemoteController("c0", ip="127.0.0.1", port=6653),
+                  autoSetMacs=True)
+    try:
+        net.start()
+        for sw in net.switches:
+            sw.cmd(f"ovs-vsctl set-fail-mode {sw.name} secure")
+            # Reconnect within a second of the controller coming back
+            sw.cmd(f"for c in $(ovs-vsctl get bridge {sw.name} controller | tr -d '[],'); "
+                   f"do ovs-vsctl set controller $c max_backoff=1000; done")
+        time.sleep(args.settle)
+        net.pingAll()
+
+        duration = args.down + args.window + 5
+        logs = {}
+        for src, dst in PAIRS:
+            logs[(src, dst)] = f"/tmp/reconnect_{src}_{dst}.log"
+            net[src].cmd(f"ping -i {PING_INTERVAL} -w {duration} {net[dst].IP()} > {logs[(src, dst)]} 2>&1 &")
+        time.sleep(2)
+
+        stop_controller(ryu)
+        time.sleep(args.down)
+        restart = time.time()
+        ryu = start_controller(mode)
+        before = wait_metrics()
+        up = time.time() - restart
+        time.sleep(max(0.0, args.window - up))
+        after = metric_sums()
+        time.sleep(duration - args.window - args.down)
+
+        result = {'outage_ms': {f"{s}->{d}": longest_gap_ms(path) for (s, d), path in logs.items()}}
+        for key in ('packets_in', 'ofp_messages_total', 'reconciles', 'reconcile_flows_kept',
+                    'reconcile_flows_added', 'reconcile_flows_deleted', 'reconcile_timeouts'):
+            result[key] = int(after.get(key, 0))
+        result['packets_in_after_metrics_up'] = int(after.get('packets_in', 0) - before.get('packets_in', 0))
+        result['reconcile_seconds'] = round(after.get('reconcile_seconds_sum', 0), 4)
+        info(f"{CYAN}{mode}: {result}{RESET}\n")
+        return result
+    finally:
+        net.stop()
+        stop_controller(ryu)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recovery after a controller restart per reconnect mode")
+    parser.add_argument("--modes", nargs="+", default=["clear", "reconcile"])
+    parser.add_argument("--down", type=float, default=1.0, help="seconds the controller stays down")
+    parser.add_argument("--window", type=float, default=10.0,
+                        help="seconds after the restart to count PacketIns/messages over")
+    parser.add_argument("--settle", type=float, default=12.0, help="seconds for LLDP discovery")
+    args = parser.parse_args()
+
+    setLogLevel("info")
+    results = {mode: run(mode, args) for mode in args.modes}
+
+    print(f"\n{CYAN}Mode        Worst outage  PacketIn  OF msgs  Kept  Added  Deleted{RESET}")
+    for mode, r in results.items():
+        worst = max(r['outage_ms'].values())
+        color = GREEN if worst < 100 else YELLOW
+        print(f"{color}{mode:<10} {worst:>10.0f}ms {r['packets_in']:>9} {r['ofp_messages_total']:>8} "
+              f"{r['reconcile_flows_kept']:>5} {r['reconcile_flows_added']:>6} "
+              f"{r['reconcile_flows_deleted']:>8}{RESET}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controller sharding scale test
+─────────────────────────────────────────────────────────────
+• Runs 1, 2, 4... Ryu workers plus the shared state service
+• Linear chain of OpenFlow 1.3 switches, every switch connected to
+  every worker; each worker is MASTER for its share of the dpids
+• Hosts blast frames with unknown MACs so each one is a PacketIn
+• Prints aggregate PacketIn/s per worker count
+
+Usage: sudo python3 shard_scale.py --workers 1 2 4 --switches 16
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from mininet.net import Mininet
+from mininet.node import OVSSwitch, RemoteController
+from mininet.topo import Topo
+from mininet.log import setLogLevel, info
+
+SDN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sdn')
+sys.path.insert(0, SDN_DIR)
+import state_service
+
+# ─── ANSI Colors ─────────────────────────────────────────────
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+RESET = "\033[0m"
+
+BASE_PORT = 6653
+
+# Sends random-MAC frames on the host's interface as fast as it can
+BLASTER = r"""
+import os, socket, sys, time
+s = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+s.bind((sys.argv[1], 0))
+end = time.time() + float(sys.argv[2])
+while time.time() < end:
+    for _ in range(256):
+        s.send(b'\x02' + os.urandom(5) + b'\x02' + os.urandom(5) + b'\x88\xb5' + bytes(46))
+"""
+
+# ─── Topology ────────────────────────────────────────────────
+class ChainTopo(Topo):
+    def build(self, switches=16, hosts_per_switch=2):
+        prev = None
+        for i in range(1, switches + 1):
+            sw = self.addSwitch(f"s{i}", dpid=f"{i:016x}", protocols="OpenFlow13")
+            for j in range(1, hosts_per_switch + 1):
+                self.addLink(self.addHost(f"h{i}x{j}"), sw)
+            if prev:
+                self.addLink(prev, sw)
+            prev = sw
+
+# ─── Controller workers ──────────────────────────────────────
+def start_workers(count, sock):
+    procs = [subprocess.Popen([sys.executable, "state_service.py", "--socket", sock],
+                              cwd=SDN_DIR, stdout=subprocess.DEVNULL)]
+    time.sleep(1)
+    for worker in range(count):
+        env = dict(os.environ, SDN_WORKERS=str(count), SDN_WORKER_ID=str(worker),
+                   SDN_STATE_SOCKET=sock)
+        procs.append(subprocess.Popen(
+            ["ryu-manager", "--ofp-tcp-listen-port", str(BASE_PORT + worker), "ryu_app.py"],
+            cwd=SDN_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    time.sleep(3)
+    return procs
+
+def stop_workers(procs):
+    for proc in reversed(procs):
+        proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+def total_packets_in(sock):
+    reply = state_service.query_stats(sock)
+    return sum(s.get('packets_in', 0) for s in reply['workers'].values()), reply
+
+# ─── One run ─────────────────────────────────────────────────
+def run(workers, args):
+    sock = f"/tmp/sdn-scale-{workers}.sock"
+    procs = start_workers(workers, sock)
+    net = Mininet(topo=ChainTopo(args.switches, args.hosts), switch=OVSSwitch,
+                  controller=None, autoSetMacs=True)
+    for worker in range(workers):
+        net.addController(RemoteController(f"c{worker}", ip="127.0.0.1",
+                                           port=BASE_PORT + worker))
+    try:
+        net.start()
+        time.sleep(args.settle)
+
+        before, reply = total_packets_in(sock)
+        info(f"{CYAN}workers={workers} members={reply['members']}{RESET}\n")
+        start = time.time()
+        for host in net.hosts:
+            host.cmd(f"{sys.executable} -c \"{BLASTER}\" {host.defaultIntf()} {args.duration} &")
+        time.sleep(args.duration + 2)  # workers report stats every aging tick
+        after, reply = total_packets_in(sock)
+        elapsed = time.time() - start
+
+        rate = (after - before) / elapsed
+        per_worker = {w: s.get('owned', []) for w, s in sorted(reply['workers'].items())}
+        print(f"{GREEN}{workers} worker(s): {rate:,.0f} PacketIn/s  owned={per_worker}{RESET}")
+        return rate
+    finally:
+        net.stop()
+        stop_workers(procs)
+
+def main():
+    parser = argparse.ArgumentParser(description="PacketIn throughput vs controller workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--switches", type=int, default=16)
+    parser.add_argument("--hosts", type=int, default=2, help="hosts per switch")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--settle", type=float, default=5.0)
+    args = parser.parse_args()
+
+    setLogLevel("info")
+    results = {n: run(n, args) for n in args.workers}
+
+    base = results[args.workers[0]] or 1
+    print(f"\n{CYAN}Workers  PacketIn/s  Speedup{RESET}")
+    for n, rate in results.items():
+        print(f"{n:>7}  {rate:>10,.0f}  {rate / base:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
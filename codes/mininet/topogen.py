@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parameterized fabric generator for controller scaling tests
+─────────────────────────────────────────────────────────────
+• Presets: lab (LabTopology as-is), linear, leaf-spine, fat-tree (k-ary)
+• Hosts per VLAN spread round-robin over the edge switches; VLAN v is
+  subnet 10.<v / 256>.<v % 256>.0/24 with gateway .254, so VLAN 10/20
+  match the controller's built-in gateways
+• Writes the controller side of the same fabric as JSON (port_config,
+  gateway_ips/macs, link_params): run ryu_app.py with SDN_FABRIC=<file>
+• Hundreds of hosts start quickly: switches (fail-mode secure) are
+  configured in one ovs-vsctl batch and host links are plain veths,
+  only switch-to-switch links get TCLink shaping
+
+Usage: sudo python3 topogen.py leaf-spine --leaves 4 --spines 2 --vlans 10 20 --hosts-per-vlan 64 \\
+           --config fabric.json [--start] [--controller-ip IP]
+"""
+
+import argparse
+import json
+import time
+from functools import partial
+
+# ─── ANSI Colors ─────────────────────────────────────────────
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+RESET = "\033[0m"
+
+MAX_HOSTS_PER_VLAN = 253
+
+
+def vlan_subnet(vlan):
+    return f"10.{vlan >> 8}.{vlan & 0xff}"
+
+
+def gateway_mac(vlan):
+    return f"00:00:00:{vlan >> 8:02x}:01:{vlan & 0xff:02x}"
+
+
+# ─── Fabric description ──────────────────────────────────────
+class Fabric(object):
+    """Switches, hosts and links of a generated topology, with port numbers"""
+
+    def __init__(self, name, vlans):
+        self.name = name
+        self.vlans = list(vlans)
+        self.switches = []        # [(name, dpid)]
+        self.hosts = []           # [{name, switch, port, vlan, ip, mac}]
+        self.links = []           # [(sw a, port a, sw b, port b, bw, delay)]
+        self.port_config = {}     # dpid -> {port: config}
+        self.next_port = {}
+
+    def add_switch(self):
+        dpid = len(self.switches) + 1
+        name = f"s{dpid}"
+        self.switches.append((name, dpid))
+        self.port_config[dpid] = {}
+        self.next_port[dpid] = 1
+        return dpid
+
+    def _port(self, dpid, config):
+        port = self.next_port[dpid]
+        self.next_port[dpid] += 1
+        self.port_config[dpid][port] = config
+        return port
+
+    def add_host(self, dpid, vlan, index):
+        if index >= MAX_HOSTS_PER_VLAN:
+            raise ValueError(f"VLAN {vlan}: at most {MAX_HOSTS_PER_VLAN} hosts in a /24")
+        port = self._port(dpid, {'type': 'access', 'vlan': vlan})
+        self.hosts.append({
+            'name': f"h{vlan}x{index + 1}",
+            'switch': dpid,
+            'port': port,
+            'vlan': vlan,
+            'ip': f"{vlan_subnet(vlan)}.{index + 1}",
+            'mac': f"02:00:{vlan >> 8:02x}:{vlan & 0xff:02x}:{index >> 8:02x}:{index & 0xff:02x}",
+        })
+
+    def add_link(self, a, b, bw, delay):
+        pa = self._port(a, {'type': 'trunk'})
+        pb = self._port(b, {'type': 'trunk'})
+        self.links.append((a, pa, b, pb, bw, delay))
+
+    def place_hosts(self, edges, hosts_per_vlan):
+        """Round-robin every VLAN's hosts over the edge switches"""
+        for vlan in self.vlans:
+            for i in range(hosts_per_vlan):
+                self.add_host(edges[i % len(edges)], vlan, i)
+
+    def controller_config(self):
+        """JSON-ready port_config / gateway / link data for ryu_app.py"""
+        link_params = []
+        for a, pa, b, pb, bw, delay in self.links:
+            link_params.append({'dpid': a, 'port': pa, 'bw': bw, 'delay': delay})
+            link_params.append({'dpid': b, 'port': pb, 'bw': bw, 'delay': delay})
+        return {
+            'name': self.name,
+            'port_config': {str(dpid): {str(port): cfg for port, cfg in ports.items()}
+                            for dpid, ports in self.port_config.items()},
+            'gateway_ips': {str(v): f"{vlan_subnet(v)}.254" for v in self.vlans},
+            'gateway_macs': {str(v): gateway_mac(v) for v in self.vlans},
+            'link_params': link_params,
+        }
+
+    def summary(self):
+        return (f"{self.name}: {len(self.switches)} switches, {len(self.hosts)} hosts, "
+                f"{len(self.links)} switch links, VLANs {self.vlans}")
+
+
+# ─── Presets ─────────────────────────────────────────────────
+def lab():
+    """LabTopology (3 switches, 2 routers, 4 hosts) with the controller's built-in config"""
+    fabric = Fabric("lab", [10, 20])
+    for _ in range(3):
+        fabric.add_switch()
+    hosts = [(1, 1, 10, "h1", "10.10.10.11"), (1, 2, 10, "h2", "10.10.10.12"),
+             (1, 3, 10, "r1", "10.10.10.1"), (3, 1, 20, "h3", "10.20.20.11"),
+             (3, 2, 20, "h4", "10.20.20.12"), (3, 3, 20, "r2", "10.20.20.1")]
+    for dpid, port, vlan, name, ip in hosts:
+        fabric.port_config[dpid][port] = {'type': 'access', 'vlan': vlan}
+        fabric.hosts.append({'name': name, 'switch': dpid, 'port': port, 'vlan': vlan,
+                             'ip': ip, 'mac': None})
+    for a, pa, b, pb, bw, delay in [(1, 5, 3, 5, 100, 10), (1, 4, 2, 1, 300, 2), (2, 2, 3, 4, 300, 2)]:
+        fabric.port_config[a][pa] = fabric.port_config[b][pb] = {'type': 'trunk'}
+        fabric.links.append((a, pa, b, pb, bw, delay))
+    fabric.port_config[2][3] = {'type': 'trunk'}
+    fabric.port_config[2][4] = {'type': 'trunk'}
+    return fabric
+
+
+def linear(switches=3, vlans=(10, 20), hosts_per_vlan=2, bw=1000, delay=1):
+    fabric = Fabric("linear", vlans)
+    dpids = [fabric.add_switch() for _ in range(switches)]
+    fabric.place_hosts(dpids, hosts_per_vlan)
+    for a, b in zip(dpids, dpids[1:]):
+        fabric.add_link(a, b, bw, delay)
+    return fabric
+
+
+def leaf_spine(leaves=4, spines=2, vlans=(10, 20), hosts_per_vlan=2, bw=1000, delay=1):
+    fabric = Fabric("leaf-spine", vlans)
+    leaf_ids = [fabric.add_switch() for _ in range(leaves)]
+    spine_ids = [fabric.add_switch() for _ in range(spines)]
+    fabric.place_hosts(leaf_ids, hosts_per_vlan)
+    for leaf in leaf_ids:
+        for spine in spine_ids:
+            fabric.add_link(leaf, spine, bw, delay)
+    return fabric
+
+
+def fat_tree(k=4, vlans=(10, 20), hosts_per_vlan=2, bw=1000, delay=1):
+    """k pods of k/2 edge + k/2 aggregation switches, (k/2)^2 cores"""
+    if k % 2:
+        raise ValueError("fat-tree k must be even")
+    half = k // 2
+    fabric = Fabric("fat-tree", vlans)
+    edges = []
+    cores = [fabric.add_switch() for _ in range(half * half)]
+    for _ in range(k):
+        pod_edges = [fabric.add_switch() for _ in range(half)]
+        pod_aggs = [fabric.add_switch() for _ in range(half)]
+        for edge in pod_edges:
+            for agg in pod_aggs:
+                fabric.add_link(edge, agg, bw, delay)
+        for i, agg in enumerate(pod_aggs):
+            for core in cores[i * half:(i + 1) * half]:
+                fabric.add_link(agg, core, bw, delay)
+        edges += pod_edges
+    fabric.place_hosts(edges, hosts_per_vlan)
+    return fabric
+
+
+PRESETS = {'lab': lab, 'linear': linear, 'leaf-spine': leaf_spine, 'fat-tree': fat_tree}
+
+
+# ─── Mininet ─────────────────────────────────────────────────
+def make_topo(fabric):
+    from mininet.topo import Topo
+    from mininet.link import TCLink
+
+    if fabric.name == "lab":
+        from topology import LabTopology
+        return LabTopology()
+
+    class FabricTopo(Topo):
+        def build(self):
+            names = {}
+            for name, dpid in fabric.switches:
+                names[dpid] = self.addSwitch(name, dpid=f"{dpid:016x}", protocols="OpenFlow13")
+            for h in fabric.hosts:
+                gw = f"{vlan_subnet(h['vlan'])}.254"
+                host = self.addHost(h['name'], ip=f"{h['ip']}/24", mac=h['mac'],
+                                    defaultRoute=f"via {gw}")
+                self.addLink(host, names[h['switch']], port2=h['port'])
+            for a, pa, b, pb, bw, delay in fabric.links:
+                self.addLink(names[a], names[b], port1=pa, port2=pb, cls=TCLink,
+                             bw=bw, delay=f"{delay}ms")
+
+    return FabricTopo()
+
+
+def make_net(fabric, controller_ip="127.0.0.1", port=6653):
+    """Built (not started) Mininet for a fabric; OVS bridges are set up in one batch"""
+    from mininet.net import Mininet
+    from mininet.node import OVSSwitch, RemoteController
+
+    switch = partial(OVSSwitch, batch=True, failMode="secure")
+    return Mininet(topo=make_topo(fabric), switch=switch,
+                   controller=RemoteController("c0", ip=controller_ip, port=port),
+                   autoSetMacs=fabric.name == "lab")
+
+
+def start_net(net, fabric):
+    """Start a make_net() network; the lab preset also gets its router setup"""
+    net.start()
+    if fabric.name == "lab":
+        from topology import configure_static_routing
+        # LabTopology picks its own switch class, outside the batch
+        for sw in net.switches:
+            sw.cmd(f"ovs-vsctl set-fail-mode {sw.name} secure")
+        configure_static_routing(net)
+
+
+def build_fabric(args):
+    if args.preset == "lab":
+        return lab()
+    common = {'vlans': args.vlans, 'hosts_per_vlan': args.hosts_per_vlan,
+              'bw': args.bw, 'delay': args.delay}
+    if args.preset == "linear":
+        return linear(args.switches, **common)
+    if args.preset == "leaf-spine":
+        return leaf_spine(args.leaves, args.spines, **common)
+    return fat_tree(args.k, **common)
+
+
+def add_arguments(parser):
+    """Fabric options, shared with scripts that build on this generator"""
+    parser.add_argument("preset", choices=sorted(PRESETS))
+    parser.add_argument("--vlans", type=int, nargs="+", default=[10, 20])
+    parser.add_argument("--hosts-per-vlan", type=int, default=2)
+    parser.add_argument("--switches", type=int, default=3, help="linear: chain length")
+    parser.add_argument("--leaves", type=int, default=4)
+    parser.add_argument("--spines", type=int, default=2)
+    parser.add_argument("--k", type=int, default=4, help="fat-tree arity")
+    parser.add_argument("--bw", type=float, default=1000, help="switch link Mbps")
+    parser.add_argument("--delay", type=float, default=1, help="switch link ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a fabric and its controller config")
+    add_arguments(parser)
+    parser.add_argument("--config", default="fabric.json", help="controller config output")
+    parser.add_argument("--start", action="store_true", help="start it in Mininet")
+    parser.add_argument("--controller-ip", default="127.0.0.1")
+    args = parser.parse_args()
+
+    fabric = build_fabric(args)
+    with open(args.config, "w") as f:
+        json.dump(fabric.controller_config(), f, indent=1)
+    print(f"{GREEN}{fabric.summary()}{RESET}")
+    print(f"{CYAN}Controller config: {args.config} (SDN_FABRIC={args.config} ryu-manager ryu_app.py){RESET}")
+    if not args.start:
+        return
+
+    from mininet.cli import CLI
+    from mininet.log import setLogLevel, info
+
+    setLogLevel("info")
+    start = time.time()
+    net = make_net(fabric, args.controller_ip)
+    start_net(net, fabric)
+    info(f"{GREEN}{fabric.summary()} up in {time.time() - start:.1f}s{RESET}\n")
+    CLI(net)
+    net.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,13 @@ Ultimate Mininet L3 Lab – Final Optimized Version
 • Auto Ryu controller detection + fallback
 • Static routing + SDN-ready (secure fail-mode)
 • Detailed topology print + extra tests
+• --benchmark results.json: run the benchmark matrix instead of the CLI
 """
 
 import argparse
 import subprocess
 import re
+import time
 
 from mininet.net import Mininet
 from mininet.node import OVSSwitch, Node, RemoteController
@@ -22,21 +24,28 @@ from mininet.topo import Topo
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info, warn
 
+import benchmark
+
 # ─── ANSI Colors ─────────────────────────────────────────────
 GREEN = "\033[32m"
 YELLOW = "\033[33m"
 CYAN = "\033[36m"
 RESET = "\033[0m"
 
-# ─── Controller IP Detection ─────────────────────────────────
-def get_controller_ip():
+# Intra-VLAN, inter-VLAN (via r1/r2) pairs for --benchmark
+BENCHMARK_PAIRS = [("h1", "h2"), ("h1", "h3"), ("h2", "h4")]
+
+# ─── Arguments / Controller IP Detection ─────────────────────
+def parse_args():
     parser = argparse.ArgumentParser(description="Ultimate L3 Lab")
     parser.add_argument("--controller-ip", type=str, default=None,
                         help="External Ryu controller IP")
     parser.add_argument("--fallback-ip", type=str, default="192.168.152.160",
                         help="Fallback controller IP")
-    args = parser.parse_args()
+    benchmark.add_arguments(parser)
+    return parser.parse_args()
 
+def get_controller_ip(args):
     if args.controller_ip:
         info(f"{YELLOW}Using controller IP from argument: {args.controller_ip}{RESET}\n")
         return args.controller_ip
@@ -160,7 +169,8 @@ def main():
     setLogLevel("info")
     info(f"{CYAN}Starting Ultimate Hybrid L3 Lab with s2 redundancy path{RESET}\n")
 
-    controller_ip = get_controller_ip()
+    args = parse_args()
+    controller_ip = get_controller_ip(args)
 
     net = Mininet(
         topo=LabTopology(),
@@ -180,6 +190,17 @@ def main():
         info(f"{sw.name} fail-mode set to secure (SDN mode)\n")
 
     configure_static_routing(net)
+
+    if args.benchmark:
+        # Let LLDP discovery settle, warm up ARP/flows, then measure
+        time.sleep(10)
+        net.pingAll()
+        doc = benchmark.run(net, BENCHMARK_PAIRS, args)
+        benchmark.write(doc, args.benchmark, args.csv)
+        info(f"{GREEN}Benchmark results written to {args.benchmark}{RESET}\n")
+        net.stop()
+        return
+
     show_topology()
 
     info(f"\n{GREEN}Network ready! Recommended tests:{RESET}\n")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lazy min-heap for MAC/ARP aging
+─────────────────────────────────────────────────────────────
+• One heap entry per key, pushed when the key is first learned
+• Refreshing a key only updates its timestamp in the owning table
+• A tick pops due entries: expired ones are removed, refreshed ones
+  are rescheduled at their new deadline -> O(due) instead of O(table)
+"""
+
+import heapq
+
+
+class AgingHeap(object):
+    """Schedule expiry of table entries keyed by any hashable"""
+
+    def __init__(self, aging, last_seen):
+        """aging: seconds of inactivity, last_seen(key) -> timestamp or None"""
+        self.aging = aging
+        self.last_seen = last_seen
+        self.heap = []
+        self.scheduled = set()
+
+    def track(self, key, ts):
+        """Make sure key has a pending deadline (cheap if already tracked)"""
+        if key not in self.scheduled:
+            self.scheduled.add(key)
+            heapq.heappush(self.heap, (ts + self.aging, key))
+
+    def expired(self, now):
+        """Pop and return keys whose last activity is older than aging"""
+        heap = self.heap
+        out = []
+        while heap and heap[0][0] <= now:
+            _, key = heapq.heappop(heap)
+            ts = self.last_seen(key)
+            if ts is None:
+                # Removed from the table by someone else
+                self.scheduled.discard(key)
+            elif ts + self.aging <= now:
+                self.scheduled.discard(key)
+                out.append(key)
+            else:
+                heapq.heappush(heap, (ts + self.aging, key))
+        return out
+
+    def next_deadline(self):
+        return self.heap[0][0] if self.heap else None
+
+    def __len__(self):
+        return len(self.scheduled)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Non-blocking controller log
+─────────────────────────────────────────────────────────────
+• Levels + per-category token-bucket rate limits and 1-in-N sampling,
+  checked before anything is formatted
+• Records go to a bounded deque; a green writer (run(), spawned on the
+  hub by the app) formats them in batches of up to 1024 lines and
+  writes each batch in one call, between events rather than on the
+  PacketIn path, with no lock to contend with
+• The write itself goes through write_with(fn, data) (e.g. eventlet
+  tpool.execute), so a slow file or terminal blocks a worker, not the hub
+• Colored console lines (the old print() look) or JSON lines
+• Full queue -> record dropped and counted, never a blocking put
+"""
+
+import json
+import sys
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+NOTICE = 25
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'NOTICE': NOTICE,
+          'WARNING': WARNING, 'ERROR': ERROR, 'OFF': OFF}
+_NAMES = {v: k for k, v in LEVELS.items()}
+
+_COLORS = {
+    DEBUG: '\033[90m',
+    INFO: '\033[94m',
+    NOTICE: '\033[92m',
+    WARNING: '\033[93m',
+    ERROR: '\033[91m',
+}
+_ENDC = '\033[0m'
+
+
+def _call(fn, *args):
+    return fn(*args)
+
+
+class _Limit(object):
+    __slots__ = ('rate', 'burst', 'tokens', 'last', 'sample', 'seen', 'suppressed', 'total')
+
+    def __init__(self, rate=None, burst=None, sample=1):
+        self.rate = rate
+        self.burst = burst if burst is not None else (rate or 0)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.sample = max(1, sample)
+        self.seen = 0
+        self.suppressed = 0     # since the last record let through
+        self.total = 0          # ever, never reset
+
+    def allow(self):
+        self.seen += 1
+        if self.seen % self.sample:
+            self.suppressed += 1
+            self.total += 1
+            return False
+        if self.rate is None:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1:
+            self.suppressed += 1
+            self.total += 1
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Logger(object):
+    """Leveled, rate-limited logger; records are written by run() or flush()"""
+
+    def __init__(self, level=INFO, json_lines=False, stream=None, path=None,
+                 limits=None, queue_size=10000, interval=0.005, batch=1024, write_with=_call):
+        """limits: category -> {'rate': msgs/s, 'burst': n, 'sample': 1-in-N}"""
+        self.level = LEVELS.get(level, level) if isinstance(level, str) else level
+        self.json_lines = json_lines
+        self.limits = {cat: _Limit(**cfg) for cat, cfg in (limits or {}).items()}
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.interval = interval
+        self.batch = batch
+        self.write_with = write_with
+        self.stamp = (None, '')     # (whole second, 'HH:MM:SS') of the last line
+        self.dropped = 0
+        self.written = 0
+
+        if path:
+            self.stream = open(path, 'a', buffering=1)
+            self.color = False
+        else:
+            self.stream = stream or sys.stdout
+            self.color = not json_lines and getattr(self.stream, 'isatty', lambda: False)()
+
+    def log(self, level, category, fmt, *args, **fields):
+        """Queue a record; fmt % args is only evaluated by the writer"""
+        if level < self.level:
+            return
+        limit = self.limits.get(category)
+        suppressed = 0
+        if limit is not None:
+            if not limit.allow():
+                return
+            suppressed, limit.suppressed = limit.suppressed, 0
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append((time.time(), level, category, fmt, args, fields, suppressed))
+
+    def debug(self, category, fmt, *args, **fields):
+        self.log(DEBUG, category, fmt, *args, **fields)
+
+    def info(self, category, fmt, *args, **fields):
+        self.log(INFO, category, fmt, *args, **fields)
+
+    def notice(self, category, fmt, *args, **fields):
+        self.log(NOTICE, category, fmt, *args, **fields)
+
+    def warning(self, category, fmt, *args, **fields):
+        self.log(WARNING, category, fmt, *args, **fields)
+
+    def error(self, category, fmt, *args, **fields):
+        self.log(ERROR, category, fmt, *args, **fields)
+
+    def summary(self):
+        return {'written': self.written, 'dropped': self.dropped,
+                'queued': len(self.queue),
+                'suppressed': sum(l.total for l in self.limits.values())}
+
+    def flush(self):
+        """Write everything queued now"""
+        while self.drain():
+            pass
+
+    def run(self, sleep):
+        """Writer loop for a green thread: one batch, then yield to the hub"""
+        while True:
+            sleep(0 if self.drain() else self.interval)
+
+    def drain(self):
+        """Format and write up to one batch of queued records, returns how many"""
+        pending = self.queue
+        if not pending:
+            return 0
+        lines = [self._format(pending.popleft()) for _ in range(min(len(pending), self.batch))]
+        try:
+            self.write_with(self._write, '\n'.join(lines) + '\n')
+        except (OSError, ValueError):
+            pass
+        self.written += len(lines)
+        return len(lines)
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+    def _format(self, record):
+        when, level, category, fmt, args, fields, suppressed = record
+        try:
+            msg = fmt % args if args else fmt
+        except (TypeError, ValueError):
+            msg = f"{fmt} {args!r}"
+        if self.json_lines:
+            out = {'ts': round(when, 6), 'level': _NAMES.get(level, level),
+                   'cat': category, 'msg': msg}
+            out.update(fields)
+            if suppressed:
+                out['suppressed'] = suppressed
+            return json.dumps(out, default=str)
+
+        # strftime once per second, not per line
+        second = int(when)
+        if self.stamp[0] != second:
+            self.stamp = (second, time.strftime('%H:%M:%S', time.localtime(second)))
+        line = f"{self.stamp[1]}.{int((when - second) * 1000):03d} {msg}"
+        if fields:
+            line += ' ' + ' '.join(f"{k}={v}" for k, v in fields.items())
+        if suppressed:
+            line += f" (+{suppressed} suppressed)"
+        if self.color:
+            line = f"{_COLORS.get(level, '')}{line}{_ENDC}"
+        return line
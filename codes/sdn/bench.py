@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controller micro-benchmarks
+─────────────────────────────────────────────────────────────
+• parser : fast-path header classifier vs ryu packet.Packet
+• hosts  : HostTable vs per-switch dict-of-tuples memory/lookups
+• logging: PacketIn path with logging off / async / synchronous print()
+• lpm    : RouteTable longest-prefix match at 100k prefixes vs the old
+           startswith() VLAN classification
+• snapshot: host snapshot log size, append/compact and warm-restart
+           load times at 100k hosts, and the longest stretch each holds
+           the event loop with its file I/O in a worker
+• ports  : compiled fabric lookups (VLAN per port, trunk bitmap, flood
+           set) vs the nested port_config .get() chains
+• admission: cost of shedding a PacketIn (parse + token bucket) and
+           what a 10k pps ARP flood on one port leaves a quiet port
+
+Usage: python3 bench.py [name ...] [--seconds N]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+import admission
+import async_log
+import fabric_config
+import host_snapshot
+import host_table
+import packet_parser
+import route_table
+
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+RESET = "\033[0m"
+
+
+# ─── Frames (lab traffic as seen on s1/s3) ───────────────────
+def _h(s):
+    return bytes.fromhex(s.replace(' ', ''))
+
+FRAMES = {
+    # h1 -> broadcast, who-has 10.0.10.254 (access port, untagged)
+    'arp-request': _h('ffffffffffff 000000000001 0806'
+                      '0001 0800 06 04 0001 000000000001 0a000a0b'
+                      '000000000000 0a000afe') + bytes(18),
+    # h3 -> h1 ARP reply on the trunk (VLAN 20)
+    'arp-reply-tagged': _h('000000000001 000000000003 8100 0014 0806'
+                           '0001 0800 06 04 0002 000000000003 0a00140b'
+                           '000000000001 0a000a0b') + bytes(14),
+    # h1 -> gateway ICMP echo request, 56 bytes payload
+    'icmp-echo': _h('00000000010a 000000000001 0800'
+                    '4500 0054 1c46 4000 40 01 0000 0a000a0b 0a000afe'
+                    '0800 0000 0001 0001') + bytes(56),
+    # h1 -> h3 TCP SYN on the trunk (VLAN 10)
+    'tcp-syn-tagged': _h('00000000010a 000000000001 8100 000a 0800'
+                         '4500 003c 0000 4000 40 06 0000 0a000a0b 0a00140b'
+                         'c350 1389 00000000 00000000 a002 faf0 0000 0000')
+                      + bytes(20),
+    # s1 LLDP probe
+    'lldp': _h('0180c200000e 000000000001 88cc'
+               '0202 0731 0402 0734 0602 0078 0000'),
+}
+
+
+def _rate(fn, frames, seconds):
+    n = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for data in frames:
+            fn(data)
+        n += len(frames)
+    return n / seconds
+
+
+# ─── parser ──────────────────────────────────────────────────
+def bench_parser(seconds):
+    try:
+        from ryu.lib.packet import packet, ethernet, arp, vlan, ipv4
+    except ImportError:
+        packet = None
+
+    frames = list(FRAMES.values())
+
+    def fast(data):
+        packet_parser.parse(data)
+
+    def full(data):
+        pkt = packet.Packet(data)
+        pkt.get_protocol(ethernet.ethernet)
+        pkt.get_protocol(vlan.vlan)
+        pkt.get_protocol(arp.arp)
+        pkt.get_protocol(ipv4.ipv4)
+
+    fast_pps = _rate(fast, frames, seconds)
+    print(f"{GREEN}fast-path parse : {fast_pps:>12,.0f} pkt/s{RESET}")
+
+    if packet is None:
+        print(f"{YELLOW}ryu not installed, skipping packet.Packet baseline{RESET}")
+        return
+
+    full_pps = _rate(full, frames, seconds)
+    print(f"{GREEN}packet.Packet   : {full_pps:>12,.0f} pkt/s{RESET}")
+    print(f"{GREEN}speedup         : {fast_pps / full_pps:>12.1f}x{RESET}")
+
+
+# ─── hosts ───────────────────────────────────────────────────
+def _synthetic_hosts(n):
+    macs = ['02:00:%02x:%02x:%02x:%02x' % ((i >> 24) & 0xff, (i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+            for i in range(n)]
+    ips = ['10.%d.%d.%d' % ((i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff) for i in range(n)]
+    return macs, ips
+
+
+def _build_dicts(macs, ips, dpids, now):
+    mac_table = defaultdict(dict)
+    arp_table = defaultdict(dict)
+    for i, (mac, ip) in enumerate(zip(macs, ips)):
+        vlan = 10 + (i & 1) * 10
+        for dpid in dpids:
+            mac_table[dpid][mac] = (1 + i % 4, vlan, now)
+            arp_table[dpid][ip] = (mac, 1 + i % 4, vlan, now)
+    return mac_table, arp_table
+
+
+def _build_hosts(macs, ips, dpids, now):
+    hosts = host_table.HostTable()
+    for i, (mac, ip) in enumerate(zip(macs, ips)):
+        vlan = 10 + (i & 1) * 10
+        for dpid in dpids:
+            hosts.learn_ip(dpid, ip, mac, 1 + i % 4, vlan, now)
+    return hosts
+
+
+def _measure(build, *args):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build(*args)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, size
+
+
+def bench_hosts(seconds):
+    dpids = (1, 2, 3)
+    now = time.time()
+    for n in (10000, 100000):
+        macs, ips = _synthetic_hosts(n)
+        (mac_table, arp_table), old_size = _measure(_build_dicts, macs, ips, dpids, now)
+        hosts, new_size = _measure(_build_hosts, macs, ips, dpids, now)
+        print(f"{GREEN}{n:>7,} hosts x {len(dpids)} switches: "
+              f"dicts {old_size / n:6.0f} B/host, HostTable {new_size / n:6.0f} B/host "
+              f"({old_size / new_size:.1f}x smaller){RESET}")
+
+        # The PacketIn path probes by_ip and reads the host's port; ip_location adds the tuple scan
+        probe = ips[:1000]
+        old_rate = _rate(lambda ip: arp_table[2].get(ip), probe, seconds / 6)
+        by_ip_rate = _rate(lambda ip: hosts.by_ip.get(ip), probe, seconds / 6)
+        new_rate = _rate(lambda ip: hosts.ip_location(2, ip), probe, seconds / 6)
+        print(f"{GREEN}          ip lookup: dicts {old_rate:>12,.0f}/s, HostTable by_ip {by_ip_rate:>12,.0f}/s, "
+              f"ip_location {new_rate:>12,.0f}/s{RESET}")
+        del mac_table, arp_table, hosts
+
+
+# ─── logging ─────────────────────────────────────────────────
+def bench_logging(seconds):
+    frames = list(FRAMES.values())
+    fd, path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+
+    def handler(log, writer=None):
+        # Parse + one per-packet log line, as packet_in_handler does; the green
+        # writer gets the hub every 64 events, so its batches are timed too
+        def fn(data):
+            hdr = packet_parser.parse(data)
+            log(hdr)
+            if writer is not None and len(writer.queue) >= 64:
+                writer.drain()
+        return fn
+
+    off = async_log.Logger(level='OFF')
+    on = async_log.Logger(path=path)
+    limited = async_log.Logger(path=path, limits={'route': {'rate': 20, 'burst': 50}})
+    with open(path, 'a') as out:
+        def sync_print(hdr):
+            print(f"\033[94m{datetime.now().strftime('%H:%M:%S.%f')[:-3]} "
+                  f"Route: {hdr.eth_src} -> {hdr.eth_dst}\033[0m", file=out)
+
+        cases = [
+            ('logging off', lambda hdr: off.info('route', "Route: %s -> %s", hdr.eth_src, hdr.eth_dst), off),
+            ('async', lambda hdr: on.info('route', "Route: %s -> %s", hdr.eth_src, hdr.eth_dst), on),
+            ('async limited', lambda hdr: limited.info('route', "Route: %s -> %s", hdr.eth_src, hdr.eth_dst),
+             limited),
+            ('sync print()', sync_print, None),
+        ]
+        for label, log, writer in cases:
+            pps = _rate(handler(log, writer), frames, seconds)
+            print(f"{GREEN}{label:<14}: {pps:>12,.0f} pkt/s{RESET}")
+
+    on.flush()
+    s = on.summary()
+    print(f"{GREEN}async writer   : {s['written']:,} written, {s['dropped']:,} dropped at the full queue{RESET}")
+    os.unlink(path)
+
+
+# ─── lpm ─────────────────────────────────────────────────────
+def _synthetic_prefixes(n, rng):
+    """Internet-like length mix: mostly /24, then /16-/23, some /32 host routes"""
+    lengths = [24] * 60 + list(range(16, 24)) * 4 + [32] * 8
+    prefixes = set()
+    while len(prefixes) < n:
+        plen = rng.choice(lengths)
+        net = rng.getrandbits(32) & route_table.MASKS[plen]
+        prefixes.add((net, plen))
+    return [f"{route_table.int_to_ip(net)}/{plen}" for net, plen in prefixes]
+
+
+def bench_lpm(seconds):
+    rng = random.Random(1)
+    for n in (1000, 100000):
+        prefixes = _synthetic_prefixes(n, rng)
+        start = time.perf_counter()
+        table, size = _measure(lambda: _build_routes(prefixes))
+        build = time.perf_counter() - start
+        probe = [route_table.int_to_ip(rng.getrandbits(32)) for _ in range(500)]
+        probe += [route_table.int_to_ip(route_table.parse_prefix(p)[0] | 1) for p in prefixes[:500]]
+        rate = _rate(lambda ip: table.lookup_int(route_table.ip_to_int(ip)), probe, seconds / 2)
+        cached = _rate(table.lookup, probe, seconds / 2)
+        print(f"{GREEN}{n:>7,} prefixes: built in {build:.2f}s, {size / n:5.0f} B/prefix, "
+              f"{rate:>12,.0f} lookups/s, {cached:>12,.0f}/s cached{RESET}")
+
+    # The lab's table vs the string checks it replaces
+    lab = route_table.RouteTable()
+    for prefix, vlan in (('10.0.10.0/24', 10), ('10.0.20.0/24', 20),
+                         ('10.10.10.0/24', 10), ('10.20.20.0/24', 20)):
+        lab.add(prefix, vlan=vlan)
+
+    def startswith(ip):
+        if ip.startswith('10.0.10.'):
+            return 10
+        elif ip.startswith('10.0.20.'):
+            return 20
+        return None
+
+    probe = ['10.0.10.11', '10.0.20.12', '10.10.10.11', '192.168.100.1']
+    print(f"{GREEN}lab, 4 prefixes: startswith {_rate(startswith, probe, seconds / 2):>12,.0f}/s, "
+          f"RouteTable {_rate(lab.lookup, probe, seconds / 2):>12,.0f}/s{RESET}")
+
+
+def _build_routes(prefixes):
+    table = route_table.RouteTable()
+    for i, prefix in enumerate(prefixes):
+        table.add(prefix, vlan=10 + i % 2 * 10)
+    return table
+
+
+# ─── ports ───────────────────────────────────────────────────
+def bench_ports(seconds):
+    fabric = fabric_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fabric_lab.yaml'))
+    port_config = fabric.port_config
+    gateway_macs = fabric.gateway_macs
+    probe = [(dpid, port) for dpid, ports in port_config.items() for port in ports] + [(1, 9), (7, 1)]
+
+    def nested(key):
+        dpid, port = key
+        cfg = port_config.get(dpid, {}).get(port, {'type': 'access', 'vlan': 1})
+        cfg.get('vlan', 1)
+        port_config.get(dpid, {}).get(port, {}).get('type') == 'trunk'
+        '00:00:00:00:01:14' in gateway_macs.values()
+
+    def compiled(key):
+        dpid, port = key
+        sw = fabric.switch(dpid)
+        sw.vlan_of.get(port, 1)
+        sw.is_trunk(port)
+        '00:00:00:00:01:14' in fabric.gateway_mac_set
+
+    def nested_flood(key):
+        return [port for port, cfg in port_config.get(key[0], {}).items()
+                if cfg['type'] == 'trunk' or cfg.get('vlan') == 10]
+
+    def compiled_flood(key):
+        return fabric.switch(key[0]).flood.get(10, ())
+
+    for label, fn in (('per packet, nested .get', nested), ('per packet, compiled', compiled),
+                      ('flood set, nested', nested_flood), ('flood set, compiled', compiled_flood)):
+        print(f"{GREEN}{label:<24}: {_rate(fn, probe, seconds / 4):>12,.0f} lookups/s{RESET}")
+
+
+# ─── snapshot ────────────────────────────────────────────────
+def bench_snapshot(seconds):
+    n = 100000
+    now = time.time()
+    hosts = host_table.HostTable()
+    for i in range(n):
+        mac = '02:00:%02x:%02x:%02x:%02x' % (i >> 24, (i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+        ip = f"10.{i >> 16}.{(i >> 8) & 0xff}.{i & 0xff}"
+        hosts.learn_ip(1 + i % 3, ip, mac, 1 + i % 48, 10 + i % 2 * 10, now)
+        hosts.learn_mac(2, mac, 4, 10 + i % 2 * 10, now)
+
+    # The controller runs file I/O in tpool and yields at pause(): time both apart
+    # to get the longest stretch the event loop is held
+    class Hub(object):
+        def __init__(self):
+            self.mark = time.perf_counter()
+            self.io = self.held = 0.0
+
+        def pause(self):
+            now = time.perf_counter()
+            self.held = max(self.held, now - self.mark)
+            self.mark = now
+
+        def run(self, fn, *args):
+            self.pause()
+            result = fn(*args)
+            now = time.perf_counter()
+            self.io += now - self.mark
+            self.mark = now
+            return result
+
+        def reset(self):
+            self.__init__()
+
+    hub = Hub()
+    path = os.path.join(tempfile.mkdtemp(), 'hosts.log')
+    log = host_snapshot.HostSnapshot(path, run=hub.run, pause=hub.pause)
+    start = time.perf_counter()
+    log.append(hosts, *hosts.take_dirty())
+    hub.pause()
+    full = time.perf_counter() - start
+    print(f"{GREEN}{n:,} hosts: full append {full * 1000:6.0f} ms ({hub.io * 1000:.0f} ms I/O), "
+          f"loop held <= {hub.held * 1000:.1f} ms, {log.size / n:5.1f} B/host (MAC + ARP records){RESET}")
+
+    # Steady state: 1% of the hosts refreshed per snapshot interval
+    macs = list(hosts.by_mac)
+    hub.reset()
+    start = time.perf_counter()
+    for _ in range(20):
+        for mac in macs[:n // 100]:
+            hosts.learn_mac(1, mac, 1, hosts.by_mac[mac].vlan, time.time())
+        hub.mark = time.perf_counter()
+        log.append(hosts, *hosts.take_dirty())
+        hub.pause()
+    print(f"{GREEN}1% refreshed   : {(time.perf_counter() - start) / 20 * 1000:6.1f} ms per append, "
+          f"loop held <= {hub.held * 1000:.1f} ms, {log.compactions} compactions, "
+          f"log {log.size / 1e6:.1f} MB{RESET}")
+
+    hub.reset()
+    start = time.perf_counter()
+    log.compact(hosts)
+    hub.pause()
+    print(f"{GREEN}compaction     : {(time.perf_counter() - start) * 1000:6.0f} ms "
+          f"({hub.io * 1000:.0f} ms I/O incl. fsync), loop held <= {hub.held * 1000:.1f} ms{RESET}")
+
+    hub.reset()
+    start = time.perf_counter()
+    restored = host_table.HostTable()
+    macs, ips = host_snapshot.HostSnapshot(path, run=hub.run, pause=hub.pause).load(restored)
+    hub.pause()
+    print(f"{GREEN}warm load      : {(time.perf_counter() - start) * 1000:6.0f} ms for {macs:,} hosts / "
+          f"{ips:,} bindings ({hub.io * 1000:.0f} ms read + decode in the worker), "
+          f"loop held <= {hub.held * 1000:.1f} ms{RESET}")
+    os.unlink(path)
+
+
+# ─── admission ───────────────────────────────────────────────
+def bench_admission(seconds):
+    gate = admission.Admission(rate=300, burst=600, block_after=100)
+    arp = FRAMES['arp-request']
+    clock = [0.0]
+
+    def shed_path(data):
+        hdr = packet_parser.parse(data)
+        clock[0] += 1e-6
+        if not gate.admit((1, 1), clock[0]):
+            gate.shed(1, 1, hdr.eth_src, 'arp')
+
+    print(f"{GREEN}parse + admit   : {_rate(shed_path, [arp] * 64, seconds):>12,.0f} PacketIns/s{RESET}")
+
+    # 10 simulated seconds: port 1 floods at 10k pps, port 2 sends 50 pps
+    gate = admission.Admission(rate=300, burst=600, block_after=100)
+    admitted = defaultdict(int)
+    blocked_at = None
+    for i in range(100000):
+        now = i / 10000
+        if gate.admit((1, 1), now):
+            admitted[1] += 1
+        elif gate.shed(1, 1, 'flood', 'arp'):
+            gate.block(1, 1, 'flood', now + 10)
+            blocked_at = now
+        if i % 200 == 0:
+            admitted[2] += gate.admit((1, 2), now)
+        if i % 10000 == 9999:
+            gate.tick(now)
+    print(f"{GREEN}10k pps flood   : {admitted[1]:>6,} of 100,000 admitted, drop flow at "
+          f"{blocked_at * 1000:.0f} ms; quiet port {admitted[2]} of 500 admitted{RESET}")
+
+
+BENCHMARKS = {
+    'admission': bench_admission,
+    'parser': bench_parser,
+    'hosts': bench_hosts,
+    'logging': bench_logging,
+    'lpm': bench_lpm,
+    'ports': bench_ports,
+    'snapshot': bench_snapshot,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controller micro-benchmarks")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"Benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all)")
+    parser.add_argument("--seconds", type=float, default=2.0,
+                        help="Run time per measurement")
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"{YELLOW}── {name} ──{RESET}")
+        BENCHMARKS[name](args.seconds)
+
+if __name__ == "__main__":
+    main()
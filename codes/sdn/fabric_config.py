@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Declarative fabric configuration
+─────────────────────────────────────────────────────────────
+• One YAML or JSON file in the topogen.py --config schema: port_config,
+  gateway_ips, gateway_macs, link_params, and optionally
+  connected_subnets / static_routes; a gateway IP may carry its
+  subnet length ("10.0.10.254/24", /24 if absent); a port may carry
+  punt: {miss|arp|gateway: pps} to override its PacketIn meter rates
+• Compiled at load into per-switch lookups: VLAN per port, a trunk
+  bitmap (bit n = port n) and the flood set of every VLAN, plus the
+  gateway MAC/IP sets the PacketIn path tests against
+• diff(old, new) names the ports, flood sets, gateways, links and
+  routes a reload changed, so only those are reprogrammed
+"""
+
+import json
+
+PORT_TYPES = ('access', 'trunk')
+PUNT_CLASSES = ('miss', 'arp', 'gateway')
+DEFAULT_GATEWAY_PLEN = 24
+
+
+def load(path):
+    """FabricConfig from a .yaml/.yml (needs PyYAML) or .json file"""
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            doc = yaml.safe_load(f)
+        else:
+            doc = json.load(f)
+    return FabricConfig(doc or {}, name=path)
+
+
+class SwitchPorts(object):
+    """Precomputed port lookups of one switch"""
+    __slots__ = ('config', 'vlan_of', 'trunks', 'vlans', 'flood')
+
+    def __init__(self, config, gateway_vlans):
+        self.config = config
+        self.vlan_of = {}    # port -> VLAN of untagged frames
+        self.trunks = 0      # bitmap of trunk ports
+        vlans = set()
+        for port, cfg in config.items():
+            self.vlan_of[port] = cfg.get('vlan', 1)
+            if cfg['type'] == 'trunk':
+                self.trunks |= 1 << port
+                vlans.update(gateway_vlans)
+            else:
+                vlans.add(cfg.get('vlan', 1))
+        self.vlans = tuple(sorted(vlans))
+        # VLAN -> its access ports and every trunk
+        self.flood = {vlan: tuple(port for port, cfg in sorted(config.items())
+                                  if cfg['type'] == 'trunk' or cfg.get('vlan') == vlan)
+                      for vlan in self.vlans}
+
+    def is_trunk(self, port):
+        return self.trunks >> port & 1 == 1
+
+    def port_vlans(self, port):
+        """VLANs a port carries"""
+        if self.is_trunk(port):
+            return self.vlans
+        return (self.vlan_of[port],) if port in self.vlan_of else ()
+
+
+class FabricConfig(object):
+    """Validated fabric description and its compiled lookups"""
+
+    def __init__(self, doc, name=None):
+        self.name = doc.get('name', name)
+        self.port_config = {}
+        for dpid, ports in (doc.get('port_config') or {}).items():
+            self.port_config[int(dpid)] = {int(port): self._port(dpid, port, cfg)
+                                           for port, cfg in (ports or {}).items()}
+        self.gateway_ips = {}
+        self.gateway_plens = {}    # VLAN -> prefix length of the gateway's subnet
+        for vlan, ip in (doc.get('gateway_ips') or {}).items():
+            ip, _, plen = str(ip).partition('/')
+            plen = int(plen) if plen else DEFAULT_GATEWAY_PLEN
+            if not 0 < plen <= 32:
+                raise ValueError(f"{self.name}: gateway_ips[{vlan}] prefix length must be 1-32")
+            self.gateway_ips[int(vlan)] = ip
+            self.gateway_plens[int(vlan)] = plen
+        self.gateway_macs = {int(v): mac for v, mac in (doc.get('gateway_macs') or {}).items()}
+        self.link_params = {(int(l['dpid']), int(l['port'])): {'bw': l['bw'], 'delay': l['delay']}
+                            for l in doc.get('link_params') or ()}
+        self.connected_subnets = {int(v): list(prefixes)
+                                  for v, prefixes in (doc.get('connected_subnets') or {}).items()}
+        self.static_routes = dict(doc.get('static_routes') or {})
+        for vlan, mac in self.gateway_macs.items():
+            if not isinstance(mac, str) or mac.count(':') != 5:
+                # YAML reads an unquoted 00:00:00:00:01:14 as a base-60 integer
+                raise ValueError(f"{self.name}: gateway_macs[{vlan}] must be a quoted MAC string")
+        if set(self.gateway_ips) != set(self.gateway_macs):
+            raise ValueError(f"{self.name}: gateway_ips and gateway_macs must list the same VLANs")
+        self.compile()
+
+    @staticmethod
+    def _port(dpid, port, cfg):
+        if cfg.get('type') not in PORT_TYPES:
+            raise ValueError(f"switch {dpid} port {port}: type must be one of {PORT_TYPES}")
+        if cfg['type'] == 'access' and not isinstance(cfg.get('vlan'), int):
+            raise ValueError(f"switch {dpid} port {port}: access port needs an integer vlan")
+        for kind, rate in (cfg.get('punt') or {}).items():
+            if kind not in PUNT_CLASSES or not isinstance(rate, int) or rate <= 0:
+                raise ValueError(f"switch {dpid} port {port}: punt rates are positive integer pps "
+                                 f"for {PUNT_CLASSES}")
+        return dict(cfg)
+
+    def compile(self):
+        self.gateway_mac_set = frozenset(self.gateway_macs.values())
+        self.gateway_ip_set = frozenset(self.gateway_ips.values())
+        self.switches = {dpid: SwitchPorts(ports, self.gateway_ips)
+                         for dpid, ports in self.port_config.items()}
+
+    def compile_switch(self, dpid):
+        """Recompile one switch after its port_config was edited in place"""
+        self.switches[dpid] = SwitchPorts(self.port_config.get(dpid, {}), self.gateway_ips)
+
+    def switch(self, dpid):
+        return self.switches.get(dpid, NO_PORTS)
+
+    def _port_state(self, dpid, port):
+        """What the ingress, responder and punt flows of a port are built from"""
+        sw = self.switch(dpid)
+        cfg = sw.config.get(port)
+        if cfg is None:
+            return None
+        vlans = sw.port_vlans(port)
+        return (cfg['type'], vlans, tuple(self.gateway_macs.get(v) for v in vlans),
+                sorted((cfg.get('punt') or {}).items()))
+
+
+NO_PORTS = SwitchPorts({}, ())
+
+
+class FabricDiff(object):
+    """What changed between two FabricConfigs"""
+
+    def __init__(self, old, new):
+        # Responders answer for every gateway IP, so a new IP touches every port
+        all_ports = old.gateway_ip_set != new.gateway_ip_set
+        self.ports = {}      # dpid -> {port} whose ingress/responder flows change
+        self.flood = set()   # dpids whose flood groups change
+        for dpid in set(old.switches) | set(new.switches):
+            a, b = old.switch(dpid), new.switch(dpid)
+            changed = {port for port in set(a.config) | set(b.config)
+                       if all_ports or old._port_state(dpid, port) != new._port_state(dpid, port)}
+            if changed:
+                self.ports[dpid] = changed
+            if a.flood != b.flood:
+                self.flood.add(dpid)
+        self.gateway_ips = {v: (old.gateway_ips.get(v), new.gateway_ips.get(v))
+                            for v in set(old.gateway_ips) | set(new.gateway_ips)
+                            if old.gateway_ips.get(v) != new.gateway_ips.get(v)}
+        self.gateway_macs = {v: (old.gateway_macs.get(v), new.gateway_macs.get(v))
+                             for v in set(old.gateway_macs) | set(new.gateway_macs)
+                             if old.gateway_macs.get(v) != new.gateway_macs.get(v)}
+        self.links = {key for key in set(old.link_params) | set(new.link_params)
+                      if old.link_params.get(key) != new.link_params.get(key)}
+        self.routes = (bool(self.gateway_ips) or old.gateway_plens != new.gateway_plens
+                       or old.connected_subnets != new.connected_subnets
+                       or old.static_routes != new.static_routes)
+
+    def __bool__(self):
+        return bool(self.ports or self.flood or self.gateway_ips or self.gateway_macs
+                    or self.links or self.routes)
+
+    def __str__(self):
+        return (f"ports {sum(len(p) for p in self.ports.values())} on {sorted(self.ports)}, "
+                f"flood {sorted(self.flood)}, gateways {sorted(self.gateway_ips)}, "
+                f"gateway MACs {sorted(self.gateway_macs)}, "
+                f"links {len(self.links)}, routes {'yes' if self.routes else 'no'}")
+
+
+def diff(old, new):
+    return FabricDiff(old, new)
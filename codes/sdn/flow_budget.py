@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flow-table budget and route aggregation
+─────────────────────────────────────────────────────────────
+• FlowTable: the host/route flows a switch holds, in LRU order, kept
+  in sync by installs, flow stats (byte counters) and FlowRemoved
+• Above evict_at of the budget, entries are evicted down to evict_to:
+  the least-traffic ones among the least recently used candidates
+• RouteAggregator: /32 routes with the same next hop are merged with
+  their complete sibling into the parent prefix, recursively; a prefix
+  is split again when one of its addresses gets a different next hop,
+  so forwarding for every known address is unchanged
+"""
+
+from collections import OrderedDict
+
+from route_table import prefix_mask
+
+
+class FlowEntry(object):
+    __slots__ = ('table', 'priority', 'match', 'installed', 'last_used', 'bytes', 'rate')
+
+    def __init__(self, table, priority, match, now):
+        self.table = table
+        self.priority = priority
+        self.match = match
+        self.installed = now
+        self.last_used = now
+        self.bytes = 0
+        self.rate = 0.0
+
+
+class FlowTable(object):
+    """Evictable flows of one switch, least recently used first"""
+
+    def __init__(self, capacity, evict_at=0.95, evict_to=0.9, candidates=4):
+        self.capacity = capacity
+        self.evict_at = evict_at
+        self.evict_to = evict_to
+        self.candidates = candidates
+        self.entries = OrderedDict()   # key -> FlowEntry
+        self.evicted = 0
+
+    def add(self, key, table, priority, match, now):
+        """Record an installed flow, returns True if it is a new entry"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.match = match
+            entry.last_used = now
+            self.entries.move_to_end(key)
+            return False
+        self.entries[key] = FlowEntry(table, priority, match, now)
+        return True
+
+    def update(self, key, byte_count, now):
+        """Byte counter from flow stats; traffic counts as use"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        if byte_count > entry.bytes:
+            if now > entry.last_used:
+                entry.rate = (byte_count - entry.bytes) / (now - entry.last_used)
+            entry.last_used = now
+            self.entries.move_to_end(key)
+        else:
+            entry.rate = 0.0
+        entry.bytes = byte_count
+
+    def remove(self, key):
+        return self.entries.pop(key, None)
+
+    def full(self):
+        return len(self.entries) >= self.capacity * self.evict_at
+
+    def evict(self):
+        """Pop entries down to evict_to once full, returns [(key, FlowEntry)]"""
+        if not self.full():
+            return []
+        n = len(self.entries) - int(self.capacity * self.evict_to)
+        # Among the oldest n*candidates, the least traffic goes first
+        pool = []
+        for key, entry in self.entries.items():
+            pool.append((entry.rate, entry.last_used, key))
+            if len(pool) >= n * self.candidates:
+                break
+        out = []
+        for _, _, key in sorted(pool)[:n]:
+            out.append((key, self.entries.pop(key)))
+        self.evicted += len(out)
+        return out
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FlowBudget(object):
+    """Per-datapath FlowTables sharing one capacity setting"""
+
+    def __init__(self, capacity=2000, evict_at=0.95, evict_to=0.9):
+        self.capacity = capacity
+        self.evict_at = evict_at
+        self.evict_to = evict_to
+        self.tables = {}
+
+    def table(self, dpid):
+        table = self.tables.get(dpid)
+        if table is None:
+            table = self.tables[dpid] = FlowTable(self.capacity, self.evict_at, self.evict_to)
+        return table
+
+    def forget(self, dpid):
+        self.tables.pop(dpid, None)
+
+    def summary(self):
+        return {'entries': sum(len(t) for t in self.tables.values()),
+                'max_fill': max((len(t) / t.capacity for t in self.tables.values()), default=0.0),
+                'evicted': sum(t.evicted for t in self.tables.values())}
+
+
+# ─── Route aggregation ───────────────────────────────────────
+class RouteAggregator(object):
+    """Lossless aggregation of host routes that share an action"""
+
+    def __init__(self, min_plen=16):
+        self.min_plen = min_plen
+        self.prefixes = {}   # (net, plen) -> action
+
+    def covering(self, ip):
+        """(net, plen) of the prefix holding ip, or None"""
+        for plen in range(32, self.min_plen - 1, -1):
+            key = (ip & prefix_mask(plen), plen)
+            if key in self.prefixes:
+                return key
+        return None
+
+    def add(self, ip, action):
+        """Route ip -> action; returns (installs, removes) as [(net, plen, action)]"""
+        installs = {}
+        removes = {}
+
+        def put(key, act):
+            if removes.get(key) == act:
+                del removes[key]
+            else:
+                installs[key] = act
+            self.prefixes[key] = act
+
+        def drop(key):
+            act = self.prefixes.pop(key)
+            if key in installs:
+                del installs[key]
+            else:
+                removes[key] = act
+
+        cover = self.covering(ip)
+        if cover is not None:
+            if self.prefixes[cover] == action:
+                # Already routed this way: refresh the covering flow
+                return [(cover[0], cover[1], action)], []
+            # Split: everything in the prefix except ip keeps the old action
+            old = self.prefixes[cover]
+            drop(cover)
+            for plen in range(cover[1] + 1, 33):
+                sibling = (ip & prefix_mask(plen)) ^ (1 << (32 - plen))
+                put((sibling, plen), old)
+
+        key = (ip, 32)
+        put(key, action)
+
+        # Merge with complete siblings while they share the action
+        while key[1] > self.min_plen:
+            net, plen = key
+            sibling = (net ^ (1 << (32 - plen)), plen)
+            if self.prefixes.get(sibling) != action:
+                break
+            drop(key)
+            drop(sibling)
+            key = (net & prefix_mask(plen - 1), plen - 1)
+            put(key, action)
+
+        return ([(n, p, a) for (n, p), a in installs.items()],
+                [(n, p, a) for (n, p), a in removes.items()])
+
+    def remove(self, net, plen):
+        """Forget a prefix whose flow is gone (idle timeout, eviction)"""
+        return self.prefixes.pop((net, plen), None)
+
+    def __len__(self):
+        return len(self.prefixes)
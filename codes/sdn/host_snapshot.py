@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only binary log of host/ARP state for warm restarts
+─────────────────────────────────────────────────────────────
+• Record = type, body length, CRC32, body (struct-packed):
+    MAC  mac, vlan, last seen, [(dpid, port)]
+    IP   ip, mac, last seen, [dpid]
+    DEL_MAC mac / DEL_IP ip
+• append() writes the current state of the MACs/IPs changed since the
+  previous call, so a snapshot costs O(changes), not O(table); appends
+  are not fsynced (they survive a controller crash, not a host crash)
+• Once the log outgrows compact_ratio x its size after the last
+  compaction it is rewritten from the live table (temp file, fsync,
+  rename)
+• load() replays the log, stopping at a torn or corrupt tail record;
+  the last record of a key wins; a file without MAGIC is replaced
+• File I/O goes through run(fn, *args) (e.g. eventlet tpool.execute) and
+  pause() is called every chunk records encoded or restored, so the
+  caller's event loop is never held for a whole table
+"""
+
+import itertools
+import os
+import socket
+import struct
+import zlib
+
+MAGIC = b'SDNHOST1'
+
+MAC = 1
+IP = 2
+DEL_MAC = 3
+DEL_IP = 4
+
+_record = struct.Struct('!BHI')      # type, body length, crc32(body)
+_mac = struct.Struct('!6sHdB')       # mac, vlan, ts, port count
+_mac_port = struct.Struct('!QI')     # dpid, port
+_ip = struct.Struct('!4s6sdB')       # ip, mac, ts, dpid count
+_dpid = struct.Struct('!Q')
+
+
+def mac_bytes(mac):
+    return bytes.fromhex(mac.replace(':', ''))
+
+
+def _frame(kind, body):
+    return _record.pack(kind, len(body), zlib.crc32(body)) + body
+
+
+def encode_mac(host):
+    body = _mac.pack(mac_bytes(host.mac), host.vlan, host.ts, len(host.dpids))
+    body += b''.join(_mac_port.pack(dpid, port) for dpid, port in zip(host.dpids, host.ports))
+    return _frame(MAC, body)
+
+
+def encode_ip(ip, host):
+    body = _ip.pack(socket.inet_aton(ip), mac_bytes(host.mac), host.ip_ts, len(host.ip_dpids))
+    body += b''.join(_dpid.pack(dpid) for dpid in host.ip_dpids)
+    return _frame(IP, body)
+
+
+def decode(data):
+    """Replay records -> ({mac: (vlan, ts, dpids, ports)}, {ip: (mac, ts, dpids)}, bytes used)"""
+    macs = {}    # keyed by raw address until the last record of each is known
+    ips = {}
+    if data[:len(MAGIC)] != MAGIC:
+        return macs, ips, 0
+    pos = len(MAGIC)
+    end = len(data)
+    header = _record.size
+    while pos + header <= end:
+        kind, length, crc = _record.unpack_from(data, pos)
+        start = pos + header
+        body = data[start:start + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            break
+        pos = start + length
+        if kind == MAC:
+            macs[body[:6]] = body
+        elif kind == IP:
+            ips[body[:4]] = body
+        elif kind == DEL_MAC:
+            macs.pop(body, None)
+        elif kind == DEL_IP:
+            ips.pop(body, None)
+
+    hosts = {}
+    for mac, body in macs.items():
+        _, vlan, ts, _ = _mac.unpack_from(body)
+        pairs = list(_mac_port.iter_unpack(body[_mac.size:]))
+        hosts[mac.hex(':')] = (vlan, ts, [d for d, _ in pairs], [p for _, p in pairs])
+    bindings = {}
+    for ip, body in ips.items():
+        _, mac, ts, _ = _ip.unpack_from(body)
+        bindings[socket.inet_ntoa(ip)] = (mac.hex(':'), ts, [d for d, in _dpid.iter_unpack(body[_ip.size:])])
+    return hosts, bindings, pos
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _append(path, parts):
+    with open(path, 'ab') as f:
+        f.writelines(parts)
+
+
+def _replace(path, parts):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.writelines(parts)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _call(fn, *args):
+    return fn(*args)
+
+
+class HostSnapshot(object):
+    """Host table persisted as an append-only log with compaction"""
+
+    def __init__(self, path, compact_min=1 << 20, compact_ratio=4.0,
+                 run=_call, pause=None, chunk=1000):
+        self.path = path
+        self.compact_min = compact_min
+        self.compact_ratio = compact_ratio
+        self.run = run
+        self.pause = pause
+        self.chunk = chunk
+        self.size = 0
+        self.base_size = 0     # size right after the last compaction
+        self.records = 0
+        self.compactions = 0
+
+    def _chunks(self, items):
+        """items, with a pause() between every chunk of them"""
+        for i, item in enumerate(items):
+            if i and i % self.chunk == 0 and self.pause is not None:
+                self.pause()
+            yield item
+
+    def _drain(self, table):
+        """Items popped from a dict in chunks, freeing them as it goes"""
+        return self._chunks(table.popitem() for _ in range(len(table)))
+
+    def _join(self, records):
+        """([bytes per chunk], count) of records, joined a chunk at a time"""
+        parts, batch, count = [], [], 0
+        for record in self._chunks(records):
+            batch.append(record)
+            if len(batch) == self.chunk:
+                parts.append(b''.join(batch))
+                count += len(batch)
+                batch = []
+        parts.append(b''.join(batch))
+        return parts, count + len(batch)
+
+    def load(self, hosts, mac_aging=0, arp_aging=0, now=None):
+        """Restore hosts (HostTable) from the log, skipping entries already aged out
+
+        Entries learned while the log is replayed are newer and kept.
+        Returns (macs, ips) restored.
+        """
+        data = self.run(_read, self.path)
+        if data is None:
+            return 0, 0
+        macs, ips, used = self.run(decode, data)
+        restored_macs = restored_ips = 0
+        for mac, (vlan, ts, dpids, ports) in self._drain(macs):
+            if (not mac_aging or now is None or ts + mac_aging > now) and mac not in hosts.by_mac:
+                hosts.restore(mac, vlan, ts, dpids, ports)
+                restored_macs += 1
+        for ip, (mac, ts, dpids) in self._drain(ips):
+            if (not arp_aging or now is None or ts + arp_aging > now) and hosts.restore_ip(ip, mac, ts, dpids):
+                restored_ips += 1
+        if used < len(MAGIC):
+            # Empty or foreign file: start a fresh log
+            self.compact(hosts)
+        else:
+            if used < len(data):
+                # Torn tail from a crash mid-append
+                self.run(os.truncate, self.path, used)
+            self.size = self.base_size = used
+        return restored_macs, restored_ips
+
+    def append(self, hosts, macs, ips):
+        """Log the current state of changed MACs/IPs; returns records written"""
+        by_mac, by_ip = hosts.by_mac, hosts.by_ip
+        parts, records = self._join(itertools.chain(
+            (encode_mac(by_mac[mac]) if mac in by_mac else _frame(DEL_MAC, mac_bytes(mac))
+              for mac in macs),
+             (encode_ip(ip, by_ip[ip]) if ip in by_ip else _frame(DEL_IP, socket.inet_aton(ip))
+              for ip in ips)))
+        if not records:
+            return 0
+        if self.size == 0:
+            parts.insert(0, MAGIC)
+        self.run(_append, self.path, parts)
+        self.size += sum(map(len, parts))
+        self.records += records
+        if self.size > max(self.compact_min, self.compact_ratio * self.base_size):
+            self.compact(hosts)
+        return records
+
+    def compact(self, hosts):
+        """Rewrite the log as one record per live MAC and IP
+
+        Hosts changed while it is encoded are still dirty, their next
+        append() lands in the new log.
+        """
+        by_mac, by_ip = hosts.by_mac, hosts.by_ip
+        parts, _ = self._join(itertools.chain(
+            [MAGIC],
+            (encode_mac(by_mac[mac]) for mac in list(by_mac) if mac in by_mac),
+            (encode_ip(ip, by_ip[ip]) for ip in list(by_ip) if ip in by_ip)))
+        self.run(_replace, self.path, parts)
+        self.size = self.base_size = sum(map(len, parts))
+        self.compactions += 1
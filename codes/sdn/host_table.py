@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Host table: one slotted entry per host, indexed by MAC and IP
+─────────────────────────────────────────────────────────────
+• Replaces the per-switch mac_table/arp_table dicts of tuples
+• by_mac / by_ip give the host in a single hash probe; the PacketIn
+  path uses them directly. mac_location / ip_location add a scan of
+  the host's per-switch tuples and run ~3x slower than a flat dict
+  probe, the price of storing a host once instead of once per switch
+• Per-switch ports are two parallel (dpids, ports) tuples, far
+  smaller than a dict for the handful of switches a host is seen on
+• MACs/IPs changed since the last take_dirty() are kept for the
+  incremental snapshot log (host_snapshot.py), unless stop_tracking()
+  was called because no snapshot is kept
+"""
+
+
+class Host(object):
+    __slots__ = ('mac', 'vlan', 'ts', 'dpids', 'ports', 'ip', 'ip_ts', 'ip_dpids')
+
+    def __init__(self, mac, vlan, ts):
+        self.mac = mac
+        self.vlan = vlan
+        self.ts = ts
+        self.dpids = ()
+        self.ports = ()
+        self.ip = None
+        self.ip_ts = 0.0
+        self.ip_dpids = ()
+
+    def port_on(self, dpid):
+        """Port the host was learned on at a switch, or None"""
+        dpids = self.dpids
+        if dpid in dpids:
+            return self.ports[dpids.index(dpid)]
+        return None
+
+    def set_port(self, dpid, port):
+        """Record the port on a switch, returns True if it changed"""
+        dpids = self.dpids
+        if dpid in dpids:
+            i = dpids.index(dpid)
+            if self.ports[i] == port:
+                return False
+            self.ports = self.ports[:i] + (port,) + self.ports[i + 1:]
+            return True
+        self.dpids = dpids + (dpid,)
+        self.ports = self.ports + (port,)
+        return True
+
+    def drop_port(self, dpid):
+        dpids = self.dpids
+        if dpid in dpids:
+            i = dpids.index(dpid)
+            self.dpids = dpids[:i] + dpids[i + 1:]
+            self.ports = self.ports[:i] + self.ports[i + 1:]
+        if dpid in self.ip_dpids:
+            self.ip_dpids = tuple(d for d in self.ip_dpids if d != dpid)
+
+
+class _Untracked(object):
+    """Stands in for the dirty sets when changes are not tracked"""
+    __slots__ = ()
+
+    def add(self, key):
+        pass
+
+
+class HostTable(object):
+    """Learned hosts, their per-switch ports and ARP bindings"""
+
+    def __init__(self):
+        self.by_mac = {}
+        self.by_ip = {}
+        self.dirty_macs = set()
+        self.dirty_ips = set()
+
+    def take_dirty(self):
+        """(macs, ips) changed since the last call"""
+        if isinstance(self.dirty_macs, _Untracked):
+            return set(), set()
+        macs, ips = self.dirty_macs, self.dirty_ips
+        self.dirty_macs, self.dirty_ips = set(), set()
+        return macs, ips
+
+    def stop_tracking(self):
+        """Stop collecting dirty keys (no snapshot log to feed)"""
+        self.dirty_macs = self.dirty_ips = _Untracked()
+
+    def restore(self, mac, vlan, ts, dpids, ports):
+        """Put back a host from a snapshot (not marked dirty)"""
+        host = self.by_mac[mac] = Host(mac, vlan, ts)
+        host.dpids = tuple(dpids)
+        host.ports = tuple(ports)
+        return host
+
+    def restore_ip(self, ip, mac, ts, dpids):
+        """Put back an ARP binding of a restored host, unless either side is bound already"""
+        host = self.by_mac.get(mac)
+        if host is None or host.ip is not None or ip in self.by_ip:
+            return None
+        host.ip = ip
+        host.ip_ts = ts
+        host.ip_dpids = tuple(dpids)
+        self.by_ip[ip] = host
+        return host
+
+    def learn_mac(self, dpid, mac, port, vlan, now):
+        """Refresh/learn a MAC on a switch, returns True if new or moved there"""
+        self.dirty_macs.add(mac)
+        host = self.by_mac.get(mac)
+        if host is None:
+            host = self.by_mac[mac] = Host(mac, vlan, now)
+            host.set_port(dpid, port)
+            return True
+        host.ts = now
+        moved = host.vlan != vlan
+        host.vlan = vlan
+        return host.set_port(dpid, port) or moved
+
+    def learn_ip(self, dpid, ip, mac, port, vlan, now):
+        """Refresh/learn an ARP binding, returns True if new or changed on this switch"""
+        self.learn_mac(dpid, mac, port, vlan, now)
+        self.dirty_ips.add(ip)
+        host = self.by_mac[mac]
+        if host.ip != ip:
+            old = self.by_ip.get(ip)
+            if old is not None and old is not host:
+                old.ip = None
+                old.ip_dpids = ()
+            if host.ip is not None:
+                self.dirty_ips.add(host.ip)
+                self.by_ip.pop(host.ip, None)
+            host.ip = ip
+            host.ip_dpids = ()
+            self.by_ip[ip] = host
+        host.ip_ts = now
+        if dpid in host.ip_dpids:
+            return False
+        host.ip_dpids += (dpid,)
+        return True
+
+    def mac_location(self, dpid, mac):
+        """(port, vlan) of a MAC on a switch, or None"""
+        host = self.by_mac.get(mac)
+        if host is None or dpid not in host.dpids:
+            return None
+        return host.ports[host.dpids.index(dpid)], host.vlan
+
+    def ip_location(self, dpid, ip):
+        """(mac, port, vlan) of an IP on a switch, or None"""
+        host = self.by_ip.get(ip)
+        if host is None or dpid not in host.dpids:
+            return None
+        return host.mac, host.ports[host.dpids.index(dpid)], host.vlan
+
+    def macs_on(self, dpid):
+        """(mac, port, vlan) of every host known on a switch"""
+        for host in self.by_mac.values():
+            port = host.port_on(dpid)
+            if port is not None:
+                yield host.mac, port, host.vlan
+
+    def ips_on(self, dpid):
+        """(ip, mac, port, vlan) of every ARP binding usable on a switch"""
+        for ip, host in self.by_ip.items():
+            port = host.port_on(dpid)
+            if port is not None:
+                yield ip, host.mac, port, host.vlan
+
+    def mac_last_seen(self, mac):
+        host = self.by_mac.get(mac)
+        return host.ts if host else None
+
+    def ip_last_seen(self, ip):
+        host = self.by_ip.get(ip)
+        return host.ip_ts if host else None
+
+    def remove_mac(self, mac):
+        """Forget a host everywhere"""
+        host = self.by_mac.pop(mac, None)
+        self.dirty_macs.add(mac)
+        if host is not None and host.ip is not None:
+            self.by_ip.pop(host.ip, None)
+            self.dirty_ips.add(host.ip)
+        return host
+
+    def remove_ip(self, ip):
+        """Forget an ARP binding, the MAC stays"""
+        host = self.by_ip.pop(ip, None)
+        self.dirty_ips.add(ip)
+        if host is not None:
+            host.ip = None
+            host.ip_dpids = ()
+        return host
+
+    def remove_port(self, dpid, mac):
+        """Forget a host on one switch, and everywhere once no switch is left"""
+        host = self.by_mac.get(mac)
+        if host is None:
+            return None
+        host.drop_port(dpid)
+        self.dirty_macs.add(mac)
+        if host.ip is not None:
+            self.dirty_ips.add(host.ip)
+        if not host.dpids:
+            self.remove_mac(mac)
+        return host
+
+    def __len__(self):
+        return len(self.by_mac)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ICMP echo replies from cached header templates
+─────────────────────────────────────────────────────────────
+• One pre-serialized Ethernet + IPv4 header per (host, gateway,
+  length): addresses, TTL and IP checksum are computed once
+• The ICMP part is the request's own bytes (id, seq, payload) with
+  the type set to 0 and the checksum patched incrementally (RFC 1624),
+  so the payload is never summed again
+"""
+
+import struct
+
+ETH_TYPE_IP = b'\x08\x00'
+IPPROTO_ICMP = 1
+ICMP_ECHO_REQUEST = 8
+REPLY_TTL = 64
+
+_ip_header = struct.Struct('!BBHHHBBH4s4s')
+
+
+def checksum(data):
+    """Internet checksum of a byte string"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def echo_reply_checksum(request_csum):
+    """Checksum after type 8 -> 0: HC' = ~(~HC + ~m + m') with m = 0x0800, m' = 0"""
+    total = (~request_csum & 0xffff) + (~0x0800 & 0xffff)
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+class EchoReplies(object):
+    """Echo replies for gateway addresses built from cached headers"""
+
+    def __init__(self, max_templates=1024):
+        self.max_templates = max_templates
+        self.templates = {}   # (host mac, host ip, gateway ip, gateway mac, icmp len) -> bytes
+        self.hits = 0
+        self.misses = 0
+
+    def reply(self, data, l3_offset, gateway_mac):
+        """Untagged echo reply to the request in data, or None if it is not one"""
+        ihl = (data[l3_offset] & 0x0f) * 4
+        l4 = l3_offset + ihl
+        if len(data) < l4 + 8 or data[l4] != ICMP_ECHO_REQUEST:
+            return None
+        total_len, = struct.unpack_from('!H', data, l3_offset + 2)
+        icmp = bytearray(data[l4:l3_offset + total_len])
+
+        key = (bytes(data[6:12]), bytes(data[l3_offset + 12:l3_offset + 16]),
+               bytes(data[l3_offset + 16:l3_offset + 20]), gateway_mac, len(icmp))
+        header = self.templates.get(key)
+        if header is None:
+            self.misses += 1
+            header = self._template(*key)
+            if len(self.templates) >= self.max_templates:
+                self.templates.clear()
+            self.templates[key] = header
+        else:
+            self.hits += 1
+
+        icmp[0] = 0
+        csum, = struct.unpack_from('!H', icmp, 2)
+        struct.pack_into('!H', icmp, 2, echo_reply_checksum(csum))
+        return header + icmp
+
+    def _template(self, host_mac, host_ip, gateway_ip, gateway_mac, icmp_len):
+        ip = _ip_header.pack(0x45, 0, 20 + icmp_len, 0, 0, REPLY_TTL, IPPROTO_ICMP, 0,
+                             gateway_ip, host_ip)
+        ip = ip[:10] + struct.pack('!H', checksum(ip)) + ip[12:]
+        return host_mac + gateway_mac + ETH_TYPE_IP + ip
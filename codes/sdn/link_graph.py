@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Switch link graph from LLDP, shortest paths and flood tree
+─────────────────────────────────────────────────────────────
+• Directed links (dpid, port) -> (dpid, port), refreshed by LLDP and
+  expired when probes stop arriving
+• Link cost = delay_ms + REF_BW / bw_mbps (OSPF-style reference bw)
+• One shortest-path tree per source switch, computed on first use:
+  - link added / cheaper: relax from the new link's head only
+  - link removed: recompute only the trees that used it
+• Multipath: loop-free next hops are the links whose far end is
+  strictly closer to the destination (downstream criterion)
+• Flood tree: minimum spanning tree over the undirected links, every
+  switch port not on it is blocked for flooding
+"""
+
+import heapq
+
+INF = float('inf')
+REF_BW = 1000.0  # Mbps
+
+
+def link_cost(bw=REF_BW, delay=1.0):
+    """Cost of a link from its TCLink bandwidth (Mbps) and delay (ms)"""
+    return delay + REF_BW / bw
+
+
+class Link(object):
+    __slots__ = ('src', 'src_port', 'dst', 'dst_port', 'cost', 'seen')
+
+    def __init__(self, src, src_port, dst, dst_port, cost, seen):
+        self.src = src
+        self.src_port = src_port
+        self.dst = dst
+        self.dst_port = dst_port
+        self.cost = cost
+        self.seen = seen
+
+
+class _Tree(object):
+    __slots__ = ('src', 'dist', 'parent', 'first')
+
+    def __init__(self, src):
+        self.src = src
+        self.dist = {src: 0.0}
+        self.parent = {}     # dpid -> (previous dpid, its out port)
+        self.first = {}      # dpid -> out port at src
+
+
+class LinkGraph(object):
+    """Discovered inter-switch links with incremental shortest paths"""
+
+    def __init__(self, cost_fn=None, timeout=35.0):
+        """cost_fn(dpid, port) -> cost of the link leaving that port"""
+        self.cost_fn = cost_fn or (lambda dpid, port: link_cost())
+        self.timeout = timeout
+        self.links = {}           # (src, src_port) -> Link
+        self.adj = {}             # src -> {dst: Link}, cheapest parallel link
+        self.trees = {}           # src -> _Tree
+        self.blocked = {}         # dpid -> {port} not on the flood tree
+        self.recomputes = 0
+        self.relaxations = 0
+
+    # ─── Updates ─────────────────────────────────────────────
+    def add_link(self, src, src_port, dst, dst_port, now):
+        """Record an LLDP-seen link, returns the source dpids whose paths changed"""
+        key = (src, src_port)
+        link = self.links.get(key)
+        if link is not None and link.dst == dst and link.dst_port == dst_port:
+            link.seen = now
+            return set()
+
+        changed = set()
+        if link is not None:
+            # Port now leads somewhere else: drop the old link first
+            changed |= self._remove(link)
+        link = self.links[key] = Link(src, src_port, dst, dst_port, self.cost_fn(src, src_port), now)
+
+        best = self.adj.setdefault(src, {}).get(dst)
+        if best is None or link.cost < best.cost:
+            self.adj[src][dst] = link
+            changed |= self._relax_edge(link)
+        self._rebuild_flood_tree()
+        return changed
+
+    def remove_port(self, dpid, port):
+        """Drop the links on a port (both directions), returns changed sources"""
+        changed = set()
+        for link in [l for l in self.links.values()
+                     if (l.src, l.src_port) == (dpid, port) or (l.dst, l.dst_port) == (dpid, port)]:
+            changed |= self._remove(link)
+        if changed:
+            self._rebuild_flood_tree()
+        return changed
+
+    def remove_switch(self, dpid):
+        changed = set()
+        for link in [l for l in self.links.values() if dpid in (l.src, l.dst)]:
+            changed |= self._remove(link)
+        self.trees.pop(dpid, None)
+        self.adj.pop(dpid, None)
+        changed.discard(dpid)
+        self._rebuild_flood_tree()
+        return changed
+
+    def expire(self, now):
+        """Drop links whose LLDP stopped, returns changed sources"""
+        changed = set()
+        for link in [l for l in self.links.values() if now - l.seen > self.timeout]:
+            changed |= self._remove(link)
+        if changed:
+            self._rebuild_flood_tree()
+        return changed
+
+    def _remove(self, link):
+        del self.links[(link.src, link.src_port)]
+        nbrs = self.adj.get(link.src, {})
+        if nbrs.get(link.dst) is not link:
+            # A cheaper parallel link is in use, no path changes
+            return {link.src}
+        # Fall back to the next cheapest parallel link, if any
+        others = [l for l in self.links.values() if l.src == link.src and l.dst == link.dst]
+        if others:
+            nbrs[link.dst] = min(others, key=lambda l: (l.cost, l.src_port))
+        else:
+            del nbrs[link.dst]
+
+        changed = {link.src}
+        for src, tree in list(self.trees.items()):
+            if tree.parent.get(link.dst, (None, None)) == (link.src, link.src_port):
+                self.trees[src] = self._compute(src)
+                changed.add(src)
+        return changed
+
+    def _relax_edge(self, link):
+        """Edge insertion: update only trees where the new edge is shorter"""
+        changed = {link.src}
+        for src, tree in self.trees.items():
+            du = tree.dist.get(link.src)
+            if du is None or du + link.cost >= tree.dist.get(link.dst, INF):
+                continue
+            self._set(tree, link.dst, du + link.cost, link)
+            self._relax(tree, [(tree.dist[link.dst], link.dst)])
+            changed.add(src)
+        return changed
+
+    # ─── Shortest paths ──────────────────────────────────────
+    def _set(self, tree, node, dist, link):
+        tree.dist[node] = dist
+        tree.parent[node] = (link.src, link.src_port)
+        tree.first[node] = link.src_port if link.src == tree.src else tree.first[link.src]
+
+    def _relax(self, tree, heap):
+        heapq.heapify(heap)
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > tree.dist.get(node, INF):
+                continue
+            for nbr, link in self.adj.get(node, {}).items():
+                nd = d + link.cost
+                if nd < tree.dist.get(nbr, INF):
+                    self.relaxations += 1
+                    self._set(tree, nbr, nd, link)
+                    heapq.heappush(heap, (nd, nbr))
+
+    def _compute(self, src):
+        self.recomputes += 1
+        tree = _Tree(src)
+        self._relax(tree, [(0.0, src)])
+        return tree
+
+    def _tree(self, src):
+        tree = self.trees.get(src)
+        if tree is None:
+            tree = self.trees[src] = self._compute(src)
+        return tree
+
+    def next_port(self, src, dst):
+        """Out port at src on the shortest path to dst, or None"""
+        if src == dst:
+            return None
+        return self._tree(src).first.get(dst)
+
+    def path(self, src, dst):
+        """[(dpid, out port), ...] from src up to (not including) dst, or None"""
+        tree = self._tree(src)
+        if dst not in tree.dist:
+            return None
+        hops = []
+        node = dst
+        while node != src:
+            prev, port = tree.parent[node]
+            hops.append((prev, port))
+            node = prev
+        hops.reverse()
+        return hops
+
+    def distance(self, src, dst):
+        return self._tree(src).dist.get(dst, INF)
+
+    def downstream(self, src, dst):
+        """[(out port, neighbor)] at src whose neighbor is closer to dst, incl. parallel links"""
+        here = self.distance(src, dst)
+        if src == dst or here == INF:
+            return []
+        return sorted((link.src_port, link.dst) for link in self.links.values()
+                      if link.src == src and self.distance(link.dst, dst) < here)
+
+    # ─── Flood tree ──────────────────────────────────────────
+    def is_link_port(self, dpid, port):
+        return (dpid, port) in self.links
+
+    def _rebuild_flood_tree(self):
+        """Kruskal over undirected links; non-tree link ports are blocked"""
+        pairs = {}
+        for link in self.links.values():
+            a, b = sorted(((link.src, link.src_port), (link.dst, link.dst_port)))
+            pairs.setdefault((a, b), link.cost)
+
+        root = {}
+
+        def find(x):
+            while root.get(x, x) != x:
+                root[x] = root.get(root[x], root[x])
+                x = root[x]
+            return x
+
+        on_tree = set()
+        for pair, cost in sorted(pairs.items(), key=lambda kv: (kv[1], kv[0])):
+            ra, rb = find(pair[0][0]), find(pair[1][0])
+            if ra != rb:
+                root[ra] = rb
+                on_tree.add(pair)
+
+        # By the port's own link: while a port is rewired, a stale link from
+        # its old peer may still name it
+        blocked = {}
+        for key, link in self.links.items():
+            if tuple(sorted((key, (link.dst, link.dst_port)))) not in on_tree:
+                blocked.setdefault(key[0], set()).add(key[1])
+        self.blocked = blocked
+
+    def flood_blocked(self, dpid):
+        """Ports of a switch that must not flood (link ports off the tree)"""
+        return self.blocked.get(dpid, ())
+
+    def __len__(self):
+        return len(self.links)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus-style metrics for the controller
+─────────────────────────────────────────────────────────────
+• Histogram: fixed log-spaced buckets, observe() is a bisect + two adds
+• Registry renders counters, gauges and histograms in the text
+  exposition format (version 0.0.4)
+• handle_http(): minimal HTTP/1.0 responder for GET /metrics on a
+  plain stream socket (the app serves it from a hub StreamServer)
+"""
+
+from bisect import bisect_left
+
+# 10 us .. ~1 s, 3 buckets per decade
+LATENCY_BUCKETS = (1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3,
+                   1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0)
+
+
+class Histogram(object):
+    """Cumulative-on-render histogram with per-bucket counts"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def _num(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry(object):
+    """Named metric families, each a list of (labels, value) samples"""
+
+    def __init__(self, prefix='sdn'):
+        self.prefix = prefix
+        self.histograms = {}      # (name, labels tuple) -> Histogram
+        self.help = {}
+
+    def histogram(self, name, help_text='', **labels):
+        """Get or create the histogram for one label set"""
+        key = (name, tuple(sorted(labels.items())))
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+            self.help.setdefault(name, help_text)
+        return hist
+
+    def render(self, counters=(), gauges=()):
+        """Text exposition; counters/gauges: (name, help, [(labels, value)])"""
+        p = self.prefix
+        out = []
+        for kind, families in (('counter', counters), ('gauge', gauges)):
+            for name, help_text, samples in families:
+                out.append(f'# HELP {p}_{name} {help_text}')
+                out.append(f'# TYPE {p}_{name} {kind}')
+                for labels, value in samples:
+                    out.append(f'{p}_{name}{_labels(labels)} {_num(value)}')
+
+        by_name = {}
+        for (name, labels), hist in sorted(self.histograms.items()):
+            by_name.setdefault(name, []).append((dict(labels), hist))
+        for name, series in by_name.items():
+            out.append(f'# HELP {p}_{name} {self.help.get(name, "")}')
+            out.append(f'# TYPE {p}_{name} histogram')
+            for labels, hist in series:
+                cumulative = 0
+                for bound, n in zip(hist.buckets + (float('inf'),), hist.counts):
+                    cumulative += n
+                    le = dict(labels, le=_num(bound))
+                    out.append(f'{p}_{name}_bucket{_labels(le)} {cumulative}')
+                out.append(f'{p}_{name}_sum{_labels(labels)} {_num(hist.sum)}')
+                out.append(f'{p}_{name}_count{_labels(labels)} {hist.count}')
+        return '\n'.join(out) + '\n'
+
+
+def handle_http(sock, render):
+    """Answer one HTTP request on sock: GET /metrics -> render()"""
+    try:
+        request = sock.recv(4096).split(b'\r\n', 1)[0].split()
+        if len(request) >= 2 and request[0] == b'GET' and request[1].split(b'?')[0] == b'/metrics':
+            body = render().encode()
+            head = (b'HTTP/1.0 200 OK\r\n'
+                    b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n')
+        else:
+            body = b'not found\n'
+            head = b'HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n'
+        sock.sendall(head + b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    finally:
+        sock.close()
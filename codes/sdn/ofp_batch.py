@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batched OpenFlow sender
+─────────────────────────────────────────────────────────────
+• Per-datapath outbound queue for FlowMod / GroupMod / PacketOut
+• Messages queued within a short window go out as one socket write
+• Optional trailing barrier to confirm a batch, with round-trip timing
+"""
+
+import time
+from collections import defaultdict, Counter
+
+
+class BatchSender(object):
+    """Coalesce OpenFlow messages per datapath into batched writes"""
+
+    def __init__(self, window=0.001, max_batch=64, spawn_after=None):
+        """spawn_after(seconds, fn, *args) runs the window timers (default hub.spawn_after)"""
+        if spawn_after is None:
+            from ryu.lib import hub
+            spawn_after = hub.spawn_after
+        self.window = window
+        self.max_batch = max_batch
+        self.spawn_after = spawn_after
+
+        # dpid -> [msg], dpid -> enqueue time of the oldest msg
+        self.queues = defaultdict(list)
+        self.first_enqueued = {}
+        self.datapaths = {}
+        self.scheduled = set()
+        self.want_barrier = set()
+
+        # (dpid, xid) -> time the barrier was written
+        self.barriers = {}
+
+        self.counters = Counter()
+        self.max_depth = Counter()
+        # (dpid, message class name) -> messages sent, for per-datapath rates
+        self.by_type = Counter()
+
+    def send(self, dp, msg, barrier=False):
+        """Queue a message, flushing when the batch is full"""
+        queue = self.queues[dp.id]
+        if not queue:
+            self.first_enqueued[dp.id] = time.time()
+        queue.append(msg)
+        self.datapaths[dp.id] = dp
+        self.counters['queued'] += 1
+        self.by_type[(dp.id, type(msg).__name__)] += 1
+        if len(queue) > self.max_depth[dp.id]:
+            self.max_depth[dp.id] = len(queue)
+        if barrier:
+            self.want_barrier.add(dp.id)
+
+        if len(queue) >= self.max_batch:
+            self.flush(dp.id)
+        elif dp.id not in self.scheduled:
+            self.scheduled.add(dp.id)
+            self.spawn_after(self.window, self._flush_scheduled, dp.id)
+
+    def request_barrier(self, dp):
+        """End the current batch of a datapath with a barrier request"""
+        if self.queues.get(dp.id):
+            self.want_barrier.add(dp.id)
+
+    def _flush_scheduled(self, dpid):
+        self.scheduled.discard(dpid)
+        self.flush(dpid)
+
+    def flush(self, dpid):
+        """Write every queued message of a datapath in one send"""
+        queue = self.queues.pop(dpid, None)
+        dp = self.datapaths.get(dpid)
+        if not queue or dp is None:
+            return
+
+        if dpid in self.want_barrier:
+            self.want_barrier.discard(dpid)
+            barrier = dp.ofproto_parser.OFPBarrierRequest(dp)
+            queue.append(barrier)
+        else:
+            barrier = None
+
+        bufs = []
+        for msg in queue:
+            if msg.xid is None:
+                dp.set_xid(msg)
+            msg.serialize()
+            bufs.append(msg.buf)
+        dp.send(b''.join(bufs))
+
+        now = time.time()
+        wait = now - self.first_enqueued.pop(dpid, now)
+        self.counters['batches'] += 1
+        self.counters['flushed'] += len(queue)
+        self.counters['flush_wait_us'] += int(wait * 1e6)
+        if barrier is not None:
+            self.barriers[(dpid, barrier.xid)] = now
+            self.counters['barriers'] += 1
+
+    def flush_all(self):
+        for dpid in list(self.queues):
+            self.flush(dpid)
+
+    def barrier_reply(self, dpid, xid):
+        """Record the round trip of a confirmed batch, returns seconds or None"""
+        sent = self.barriers.pop((dpid, xid), None)
+        if sent is None:
+            return None
+        rtt = time.time() - sent
+        self.counters['barrier_replies'] += 1
+        self.counters['barrier_rtt_us'] += int(rtt * 1e6)
+        return rtt
+
+    def forget(self, dpid):
+        """Drop queued state of a disconnected datapath"""
+        self.queues.pop(dpid, None)
+        self.first_enqueued.pop(dpid, None)
+        self.datapaths.pop(dpid, None)
+        self.want_barrier.discard(dpid)
+        self.scheduled.discard(dpid)
+        self.max_depth.pop(dpid, None)
+        for key in [k for k in self.barriers if k[0] == dpid]:
+            del self.barriers[key]
+
+    def depth(self, dpid=None):
+        """Messages currently queued (for one datapath or all)"""
+        if dpid is not None:
+            return len(self.queues.get(dpid, ()))
+        return sum(len(q) for q in self.queues.values())
+
+    def summary(self):
+        """Counters plus average flush wait / barrier RTT in microseconds"""
+        c = self.counters
+        return {
+            'queued': c['queued'],
+            'flushed': c['flushed'],
+            'batches': c['batches'],
+            'depth': self.depth(),
+            'max_depth': max(self.max_depth.values(), default=0),
+            'avg_batch': c['flushed'] / c['batches'] if c['batches'] else 0.0,
+            'avg_flush_wait_us': c['flush_wait_us'] / c['batches'] if c['batches'] else 0.0,
+            'barriers': c['barriers'],
+            'avg_barrier_rtt_us': (c['barrier_rtt_us'] / c['barrier_replies']
+                                   if c['barrier_replies'] else 0.0),
+        }
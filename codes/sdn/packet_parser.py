@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fast-path header classifier for PacketIn frames
+─────────────────────────────────────────────────────────────
+• Fixed-offset struct/memoryview decoding, no protocol objects
+• Ethernet + single 802.1Q tag + ARP + IPv4 (+ ICMP type)
+• Ryu's packet.Packet is only needed when a reply must be built
+"""
+
+import socket
+import struct
+
+ETH_TYPE_8021Q = 0x8100
+ETH_TYPE_ARP = 0x0806
+ETH_TYPE_IP = 0x0800
+IPPROTO_ICMP = 1
+
+_ETH_HDR_LEN = 14
+_VLAN_HDR_LEN = 4
+_ARP_LEN = 28
+_IPV4_MIN_LEN = 20
+
+_unpack_ethertype = struct.Struct('!H').unpack_from
+_unpack_arp_op = struct.Struct('!H').unpack_from
+_unpack_ip_fixed = struct.Struct('!B7xBB').unpack_from
+
+_inet_ntoa = socket.inet_ntoa
+
+
+class Headers(object):
+    """Decoded L2/L3 header fields of one frame"""
+    __slots__ = ('eth_dst', 'eth_src', 'ethertype', 'vlan_id',
+                 'arp_op', 'arp_src_mac', 'arp_src_ip', 'arp_dst_mac', 'arp_dst_ip',
+                 'ip_src', 'ip_dst', 'ip_proto', 'ip_ttl', 'icmp_type',
+                 'l3_offset')
+
+    def __init__(self):
+        self.vlan_id = None
+        self.arp_op = None
+        self.arp_src_mac = self.arp_src_ip = None
+        self.arp_dst_mac = self.arp_dst_ip = None
+        self.ip_src = self.ip_dst = None
+        self.ip_proto = self.ip_ttl = None
+        self.icmp_type = None
+
+
+def parse(data):
+    """Classify a raw frame, returns Headers or None if it is truncated"""
+    n = len(data)
+    if n < _ETH_HDR_LEN:
+        return None
+
+    mv = memoryview(data)
+    hdr = Headers()
+    hdr.eth_dst = mv[0:6].hex(':')
+    hdr.eth_src = mv[6:12].hex(':')
+
+    ethertype, = _unpack_ethertype(mv, 12)
+    off = _ETH_HDR_LEN
+    if ethertype == ETH_TYPE_8021Q:
+        if n < off + _VLAN_HDR_LEN:
+            return None
+        tci, ethertype = struct.unpack_from('!HH', mv, off)
+        hdr.vlan_id = tci & 0x0fff
+        off += _VLAN_HDR_LEN
+
+    hdr.ethertype = ethertype
+    hdr.l3_offset = off
+
+    if ethertype == ETH_TYPE_ARP:
+        if n >= off + _ARP_LEN:
+            hdr.arp_op, = _unpack_arp_op(mv, off + 6)
+            hdr.arp_src_mac = mv[off + 8:off + 14].hex(':')
+            hdr.arp_src_ip = _inet_ntoa(mv[off + 14:off + 18])
+            hdr.arp_dst_mac = mv[off + 18:off + 24].hex(':')
+            hdr.arp_dst_ip = _inet_ntoa(mv[off + 24:off + 28])
+
+    elif ethertype == ETH_TYPE_IP:
+        if n >= off + _IPV4_MIN_LEN:
+            ver_ihl, ttl, proto = _unpack_ip_fixed(mv, off)
+            hdr.ip_ttl = ttl
+            hdr.ip_proto = proto
+            hdr.ip_src = _inet_ntoa(mv[off + 12:off + 16])
+            hdr.ip_dst = _inet_ntoa(mv[off + 16:off + 20])
+            l4 = off + (ver_ihl & 0x0f) * 4
+            if proto == IPPROTO_ICMP and n > l4:
+                hdr.icmp_type = mv[l4]
+
+    return hdr
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pending-packet buffer for unresolved next hops
+─────────────────────────────────────────────────────────────
+• One bounded queue per (dpid, next-hop IP) while ARP is outstanding
+• The first packet for a target asks for an ARP request, later ones don't
+• Whole targets expire after a TTL; released as soon as ARP resolves
+"""
+
+import time
+from collections import OrderedDict, Counter
+
+
+class _Target(object):
+    __slots__ = ('created', 'items')
+
+    def __init__(self, created):
+        self.created = created
+        self.items = []
+
+
+class PendingQueue(object):
+    """Hold packets waiting for a next hop's MAC"""
+
+    def __init__(self, ttl=3.0, max_per_target=16, max_targets=1024):
+        self.ttl = ttl
+        self.max_per_target = max_per_target
+        self.max_targets = max_targets
+
+        # (dpid, ip) -> _Target, in creation order so expiry pops from the front
+        self.targets = OrderedDict()
+        self.counters = Counter()
+
+    def add(self, key, item, now=None):
+        """Queue an item, returns True when the caller should send an ARP request"""
+        now = time.time() if now is None else now
+        self.expire(now)
+
+        target = self.targets.get(key)
+        need_arp = target is None
+        if need_arp:
+            if len(self.targets) >= self.max_targets:
+                self.counters['dropped'] += 1
+                return False
+            target = self.targets[key] = _Target(now)
+            self.counters['arp_requests'] += 1
+        else:
+            self.counters['arp_suppressed'] += 1
+
+        if len(target.items) >= self.max_per_target:
+            self.counters['dropped'] += 1
+        else:
+            target.items.append(item)
+            self.counters['queued'] += 1
+        return need_arp
+
+    def release(self, key):
+        """Pop every item waiting on a now-resolved target"""
+        target = self.targets.pop(key, None)
+        if target is None:
+            return []
+        self.counters['released'] += len(target.items)
+        return target.items
+
+    def expire(self, now=None):
+        """Drop targets whose ARP went unanswered, returns packets dropped"""
+        now = time.time() if now is None else now
+        deadline = now - self.ttl
+        expired = 0
+        while self.targets:
+            key, target = next(iter(self.targets.items()))
+            if target.created > deadline:
+                break
+            del self.targets[key]
+            expired += len(target.items)
+        self.counters['expired'] += expired
+        return expired
+
+    def forget(self, dpid):
+        """Drop everything queued for a disconnected datapath"""
+        for key in [k for k in self.targets if k[0] == dpid]:
+            del self.targets[key]
+
+    def __len__(self):
+        return sum(len(t.items) for t in self.targets.values())
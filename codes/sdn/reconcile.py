@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Switch reconnect reconciliation
+─────────────────────────────────────────────────────────────
+• A (re)connecting switch keeps its flows and groups: they are dumped
+  (flow stats + group desc, and meter config when meters are in use)
+  instead of wiped with OFPFC_DELETE
+• The desired pipeline is captured by running the normal install code
+  against a Recorder in place of the BatchSender
+• Flows are compared by (table, priority, match) and their serialized
+  instructions, groups by type and serialized buckets; only missing or
+  different entries are sent, stale ones deleted
+"""
+
+import time
+
+
+def match_key(match):
+    """Hashable form of an OFPMatch (user-form field values)"""
+    return tuple(sorted(match.items()))
+
+
+def flow_id(table_id, priority, match):
+    return table_id, priority, match_key(match)
+
+
+def serialized(parts):
+    """Wire bytes of instructions or buckets, for comparing desired vs dumped"""
+    buf = bytearray()
+    for part in parts:
+        part.serialize(buf, len(buf))
+    return bytes(buf)
+
+
+class Recorder(object):
+    """Stands in for BatchSender while the desired pipeline of a switch is built
+
+    FlowMod ADDs and GroupMod ADD/MODIFYs are kept (a later one with the
+    same flow id / group id replaces an earlier one); everything else goes
+    straight to the real sender.
+    """
+
+    def __init__(self, sender):
+        self.sender = sender
+        self.flows = {}    # flow id -> OFPFlowMod
+        self.groups = {}   # group id -> OFPGroupMod
+
+    def send(self, dp, msg, barrier=False):
+        ofp = dp.ofproto
+        name = type(msg).__name__
+        if name == 'OFPFlowMod' and msg.command == ofp.OFPFC_ADD:
+            self.flows[flow_id(msg.table_id, msg.priority, msg.match)] = msg
+        elif name == 'OFPGroupMod' and msg.command in (ofp.OFPGC_ADD, ofp.OFPGC_MODIFY):
+            self.groups[msg.group_id] = msg
+        else:
+            self.sender.send(dp, msg, barrier)
+
+    def request_barrier(self, dp):
+        pass
+
+    def depth(self, dpid=None):
+        return len(self.flows) + len(self.groups)
+
+
+class Reconciliation(object):
+    """Dump in progress for one switch"""
+
+    def __init__(self, flow_xid, group_xid, meter_xid=None):
+        self.started = time.time()
+        self.flow_xid = flow_xid
+        self.group_xid = group_xid
+        self.meter_xid = meter_xid
+        self.flows = []       # OFPFlowStats
+        self.groups = []      # OFPGroupDescStats
+        self.meters = []      # OFPMeterConfigStats
+        self.waiting = {flow_xid, group_xid}
+        if meter_xid is not None:
+            self.waiting.add(meter_xid)
+
+    def add_reply(self, xid, body, more):
+        """Collect one multipart reply; True once every dump is complete"""
+        if xid == self.flow_xid:
+            self.flows.extend(body)
+        elif xid == self.group_xid:
+            self.groups.extend(body)
+        elif xid == self.meter_xid:
+            self.meters.extend(body)
+        if not more:
+            self.waiting.discard(xid)
+        return not self.waiting
+
+
+def diff_flows(desired, dumped, keep):
+    """(to_add, to_delete, kept) between recorded FlowMods and dumped flow stats
+
+    keep(stat) says whether a dumped flow outside the desired set stays
+    (learned host/route state) instead of being deleted.
+    """
+    to_add = dict(desired)
+    to_delete = []
+    kept = 0
+    for stat in dumped:
+        key = flow_id(stat.table_id, stat.priority, stat.match)
+        mod = to_add.get(key)
+        if mod is not None:
+            if serialized(mod.instructions) == serialized(stat.instructions):
+                del to_add[key]
+                kept += 1
+            # else: the ADD replaces it in place
+        elif keep(stat):
+            kept += 1
+        else:
+            to_delete.append(stat)
+    return list(to_add.values()), to_delete, kept
+
+
+def diff_groups(desired, dumped, keep):
+    """(to_add, to_modify, to_delete ids, kept) between recorded GroupMods and dumped groups"""
+    existing = {g.group_id: g for g in dumped}
+    to_add, to_modify = [], []
+    kept = 0
+    for group_id, mod in desired.items():
+        have = existing.pop(group_id, None)
+        if have is None:
+            to_add.append(mod)
+        elif have.type == mod.type and serialized(have.buckets) == serialized(mod.buckets):
+            kept += 1
+        else:
+            to_modify.append(mod)
+    to_delete = []
+    for group_id, group in existing.items():
+        if keep(group):
+            kept += 1
+        else:
+            to_delete.append(group_id)
+    return to_add, to_modify, to_delete, kept
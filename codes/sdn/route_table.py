@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Longest-prefix-match routing table
+─────────────────────────────────────────────────────────────
+• One hash table per prefix length, keyed by the integer network;
+  a lookup masks the address once per length present, longest first
+  (a handful of probes for real tables, at most 33)
+• Chosen over a binary trie on purpose: walking the address bits in
+  Python ran at 230k-350k lookups/s against 500k-730k/s for this
+  design (bench.py lpm, 1k and 100k prefixes)
+• lookup() remembers the result per address string (cache_size
+  entries, dropped on any change): the PacketIn path asks about the
+  same few hosts over and over, and the string -> int conversion alone
+  costs more than the old startswith() checks
+• Connected routes carry the VLAN they are reached on, static routes
+  a next-hop IP that resolves through a connected route
+• changed_prefixes() compares two tables for a config reload: a static
+  route whose next hop moved counts as changed too
+"""
+
+import socket
+import struct
+
+_MISS = object()
+
+
+def ip_to_int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+
+def int_to_ip(n):
+    return socket.inet_ntoa(struct.pack('!I', n))
+
+
+def prefix_mask(plen):
+    return (0xffffffff << (32 - plen)) & 0xffffffff
+
+
+MASKS = [prefix_mask(plen) for plen in range(33)]
+
+
+def parse_prefix(prefix):
+    """'a.b.c.d/n' (or a bare address = /32) -> (network int, length)"""
+    ip, _, plen = prefix.partition('/')
+    plen = int(plen) if plen else 32
+    return ip_to_int(ip) & MASKS[plen], plen
+
+
+def overlaps(net_a, plen_a, net_b, plen_b):
+    """Whether two prefixes share any address (one holds the other)"""
+    mask = MASKS[min(plen_a, plen_b)]
+    return net_a & mask == net_b & mask
+
+
+def changed_prefixes(old, new):
+    """{(net, plen)} of the routes added, removed or resolving elsewhere between two tables"""
+    def targets(table):
+        return {(route.net, route.plen): (route.vlan, None) if route.vlan is not None
+                else table.resolve(route.next_hop) for route in table}
+    a, b = targets(old), targets(new)
+    return {key for key in set(a) | set(b) if a.get(key, _MISS) != b.get(key, _MISS)}
+
+
+class Route(object):
+    __slots__ = ('net', 'plen', 'vlan', 'next_hop')
+
+    def __init__(self, net, plen, vlan=None, next_hop=None):
+        self.net = net
+        self.plen = plen
+        self.vlan = vlan
+        self.next_hop = next_hop
+
+    @property
+    def prefix(self):
+        return f"{int_to_ip(self.net)}/{self.plen}"
+
+    def __repr__(self):
+        via = f"vlan {self.vlan}" if self.vlan is not None else f"via {self.next_hop}"
+        return f"Route({self.prefix} {via})"
+
+
+class RouteTable(object):
+    """Connected and static IPv4 routes with longest-prefix lookup"""
+
+    def __init__(self, cache_size=4096):
+        self.by_len = {}     # prefix length -> {network: Route}
+        self._search = ()    # ((mask, table), ...) longest prefix first
+        self.cache_size = cache_size
+        self._cache = {}     # address string -> Route or None
+
+    def add(self, prefix, vlan=None, next_hop=None):
+        """Connected route (vlan) or static route (next_hop); replaces an equal prefix"""
+        if (vlan is None) == (next_hop is None):
+            raise ValueError(f"{prefix}: give exactly one of vlan / next_hop")
+        net, plen = parse_prefix(prefix)
+        route = Route(net, plen, vlan, next_hop)
+        table = self.by_len.get(plen)
+        if table is None:
+            # _search holds the table itself, only a new length needs reindexing
+            table = self.by_len[plen] = {}
+            self._reindex()
+        table[net] = route
+        self._cache.clear()
+        return route
+
+    def remove(self, prefix):
+        net, plen = parse_prefix(prefix)
+        table = self.by_len.get(plen, {})
+        route = table.pop(net, None)
+        self._cache.clear()
+        if not table and plen in self.by_len:
+            del self.by_len[plen]
+            self._reindex()
+        return route
+
+    def _reindex(self):
+        self._search = tuple((MASKS[plen], self.by_len[plen]) for plen in sorted(self.by_len, reverse=True))
+
+    def lookup_int(self, n):
+        for mask, table in self._search:
+            route = table.get(n & mask)
+            if route is not None:
+                return route
+        return None
+
+    def lookup(self, ip):
+        """Most specific route covering ip, or None"""
+        route = self._cache.get(ip, _MISS)
+        if route is _MISS:
+            route = self.lookup_int(ip_to_int(ip))
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[ip] = route
+        return route
+
+    def resolve(self, ip, max_depth=4):
+        """(vlan, next-hop ip) to send ip to, following static next hops; None if unroutable"""
+        next_hop = ip
+        for _ in range(max_depth):
+            route = self.lookup(next_hop)
+            if route is None:
+                return None
+            if route.vlan is not None:
+                return route.vlan, next_hop
+            next_hop = route.next_hop
+        return None
+
+    def __iter__(self):
+        for plen in sorted(self.by_len, reverse=True):
+            yield from self.by_len[plen].values()
+
+    def __len__(self):
+        return sum(len(table) for table in self.by_len.values())
@@ -13,29 +13,46 @@
 ╚═══════════════════════════════════════════════════════════════════════════════╝
 """
 
+import os
+import struct
 import time
-from datetime import datetime
-from collections import defaultdict, Counter
+from collections import defaultdict, deque, Counter
 
 from ryu.base import app_manager
 from ryu.controller import ofp_event
-from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, set_ev_cls
+from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, DEAD_DISPATCHER, set_ev_cls
 from ryu.ofproto import ofproto_v1_3, ether, inet
-from ryu.lib.packet import packet, ethernet, arp, vlan, lldp, ipv4, icmp
+from ryu.lib.packet import packet, ethernet, arp, lldp, ipv4, icmp
 from ryu.lib import hub
+from eventlet import tpool
 
-# Colors for logging
-class Colors:
-    HEADER = '\033[95m'
-    OKBLUE = '\033[94m'
-    OKGREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
+import admission
+import aging
+import async_log
+import fabric_config
+import flow_budget
+import host_snapshot
+import host_table
+import icmp_echo
+import link_graph
+import metrics
+import ofp_batch
+import packet_parser
+import pending_queue
+import reconcile
+import route_table
+import sharding
+import traffic_stats
 
-def ts():
-    return datetime.now().strftime('%H:%M:%S.%f')[:-3]
+BROADCAST_MAC = 'ff:ff:ff:ff:ff:ff'
+
+# Pipeline: ingress VLAN classify -> L3 (router MACs only) -> L2 (vlan, eth_dst)
+TABLE_INGRESS = 0
+TABLE_L3 = 1
+TABLE_L2 = 2
+
+# Multipath select groups: one per (switch, destination switch)
+MULTIPATH_GROUP_BASE = 1 << 24
 
 class SimpleHybridSwitch(app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
@@ -43,192 +60,820 @@ class SimpleHybridSwitch(app_manager.RyuApp):
     def __init__(self, *args, **kwargs):
         super(SimpleHybridSwitch, self).__init__(*args, **kwargs)
 
-        # MAC Table: dpid -> {mac: (port, vlan, timestamp)}
-        self.mac_table = defaultdict(dict)
-        
-        # ARP Table: dpid -> {ip: (mac, port, vlan, timestamp)}
-        self.arp_table = defaultdict(dict)
+        # Logging: formatted in batches by a green writer between events, written from a
+        # tpool thread; per-packet categories are rate limited (msgs/s) so a storm can't
+        # flood the log
+        self.log = async_log.Logger(
+            level=os.environ.get('SDN_LOG_LEVEL', 'INFO'),
+            json_lines=os.environ.get('SDN_LOG_JSON') == '1',
+            path=os.environ.get('SDN_LOG_FILE'),
+            write_with=tpool.execute,
+            limits={
+                'arp': {'rate': 20, 'burst': 50},
+                'icmp': {'rate': 20, 'burst': 50},
+                'route': {'rate': 20, 'burst': 50},
+                'ttl': {'rate': 5, 'burst': 10},
+                'pending': {'rate': 20, 'burst': 50},
+                'flow': {'rate': 50, 'burst': 100},
+                'error': {'rate': 10, 'burst': 20},
+                'admission': {'rate': 5, 'burst': 10},
+            })
+
+        # Host table: one entry per MAC with per-switch ports and ARP binding,
+        # indexed by MAC (hosts.by_mac) and IP (hosts.by_ip)
+        self.hosts = host_table.HostTable()
         
         # Datapaths
         self.datapaths = {}
         
-        # Gateway IPs and MACs
-        self.gateway_ips = {
-            10: '10.0.10.254',
-            20: '10.0.20.254'
-        }
-        self.gateway_macs = {
-            10: '00:00:00:00:01:0a',
-            20: '00:00:00:00:01:14'
-        }
-        
-        # Port configuration
-        self.port_config = {
-            1: {  # Switch 1 (VLAN 10)
-                1: {'type': 'access', 'vlan': 10},
-                2: {'type': 'access', 'vlan': 10},
-                3: {'type': 'access', 'vlan': 10},
-                4: {'type': 'trunk'},
-                5: {'type': 'trunk'}
-            },
-            2: {  # Switch 2 (Core)
-                1: {'type': 'trunk'},
-                2: {'type': 'trunk'},
-                3: {'type': 'trunk'},
-                4: {'type': 'trunk'}
-            },
-            3: {  # Switch 3 (VLAN 20)
-                1: {'type': 'access', 'vlan': 20},
-                2: {'type': 'access', 'vlan': 20},
-                3: {'type': 'access', 'vlan': 20},
-                4: {'type': 'trunk'},
-                5: {'type': 'trunk'}
-            }
-        }
+        # Flood groups: dpid -> {group_id}, ports reported down: dpid -> {port}
+        self.flood_groups = defaultdict(set)
+        self.down_ports = defaultdict(set)
+        
+        # Fabric: ports, gateways, links and routes from a YAML/JSON file (fabric_lab.yaml,
+        # or SDN_FABRIC, e.g. a mininet/topogen.py --config), compiled into per-switch
+        # lookups; every CONFIG_POLL seconds a changed file is diffed and only what
+        # differs is pushed to the switches
+        self.FABRIC_PATH = os.environ.get(
+            'SDN_FABRIC', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fabric_lab.yaml'))
+        self.CONFIG_POLL = 2
+        self.fabric_mtime = os.stat(self.FABRIC_PATH).st_mtime
+        self._use_fabric(fabric_config.load(self.FABRIC_PATH))
+        
+        # LLDP-discovered links: shortest paths for host flows, spanning tree for flooding
+        self.graph = link_graph.LinkGraph(
+            lambda dpid, port: link_graph.link_cost(**self.link_params.get((dpid, port), {})),
+            timeout=35.0)
+        self.flood_pruned = {}  # dpid -> blocked ports the flood groups were built with
+        
+        # Multipath: host flows towards another switch use an OFPGT_SELECT group over
+        # every loop-free next hop, weighted by path capacity minus measured load
+        self.MULTIPATH = True
+        self.mp_groups = defaultdict(dict)  # dpid -> {dst dpid: ((port, weight), ...)}
+        
+        # Stats polling: port/flow counters every STATS_INTERVAL; a link above
+        # CONGESTION_HIGH has its heaviest host flows pinned to a next hop that stays
+        # under CONGESTION_LOW, and a pin is held at least MIGRATION_HOLD seconds
+        self.STATS_INTERVAL = 5
+        self.CONGESTION_HIGH = 0.8
+        self.CONGESTION_LOW = 0.5
+        self.MIGRATION_HOLD = 30
+        self.port_meter = traffic_stats.RateMeter()   # (dpid, port) -> tx bytes/s
+        self.flow_meter = traffic_stats.RateMeter()   # (dpid, mac) -> bytes/s
+        self.flow_out = {}                            # (dpid, mac) -> ('port'|'group', id)
+        self.link_util = {}                           # (dpid, port) -> 0..1
+        self.pinned = {}                              # (dpid, mac) -> (port, since)
+        self.migration_events = deque(maxlen=100)
+        
+        # Flow-table budget: host/route flows per switch are tracked (installs, flow
+        # stats, FlowRemoved); above FLOW_EVICT_AT of FLOW_BUDGET the least used are
+        # deleted down to FLOW_EVICT_TO. Host routes sharing a next hop are merged
+        # into prefixes no shorter than ROUTE_AGGREGATE_TO (32 = no aggregation)
+        self.FLOW_BUDGET = 2000
+        self.FLOW_EVICT_AT = 0.95
+        self.FLOW_EVICT_TO = 0.9
+        self.ROUTE_AGGREGATE_TO = 24
+        self.flow_budget = flow_budget.FlowBudget(self.FLOW_BUDGET, self.FLOW_EVICT_AT, self.FLOW_EVICT_TO)
+        self.route_agg = defaultdict(lambda: flow_budget.RouteAggregator(self.ROUTE_AGGREGATE_TO))
         
         # Timers
         self.MAC_AGING = 300
         self.ARP_AGING = 240
+        self.AGING_TICK = 1
+        
+        # Aging: 'timer' pops due entries from a lazy heap each tick,
+        # 'flow_removed' follows idle-timeout removal of host/route flows (PROACTIVE only)
+        self.AGING_MODE = 'timer'
+        self.mac_aging = aging.AgingHeap(self.MAC_AGING, self.hosts.mac_last_seen)
+        self.arp_aging = aging.AgingHeap(self.ARP_AGING, self.hosts.ip_last_seen)
+        
+        # Proactive mode: push host/route flows before traffic needs them
+        self.PROACTIVE = True
+        
+        # ARP suppression: 'off' floods host-to-host requests, 'controller' answers
+        # them from bindings refreshed within ARP_FRESH seconds and absorbs repeated
+        # gratuitous ARPs, 'flows' also installs a responder flow (OVS reg-move
+        # actions) on the asking access port so repeats never reach the controller
+        self.ARP_SUPPRESSION = os.environ.get('SDN_ARP_SUPPRESSION', 'controller')
+        self.ARP_FRESH = 60
+        self.arp_responders = defaultdict(set)  # ip -> {(dpid, port)} with a responder flow
+        
+        # Gateway pings: 'flows' answers them in the switch (OVS reg-move actions, one
+        # flow per port/VLAN/gateway) and the controller from cached reply headers for
+        # any that still arrive, 'template' only the latter, 'controller' builds every
+        # reply with Ryu's packet classes
+        self.ICMP_RESPONDER = os.environ.get('SDN_ICMP_RESPONDER', 'flows')
+        self.echo_replies = icmp_echo.EchoReplies()
+        
+        # PacketIn admission: controller-bound flows (table-miss, ARP, gateway IP) of each
+        # configured port pass an OpenFlow meter per class, PUNT_RATES pps with PUNT_BURST
+        # seconds of burst (a port's 'punt' entry in the fabric overrides the rates);
+        # SDN_PUNT_METERS=0 leaves them unmetered. PacketIns beyond ADMIT_RATE/s per switch
+        # port are shed, and a source shed BLOCK_AFTER times within one aging tick gets a
+        # drop flow for BLOCK_SECONDS
+        self.PUNT_METERS = os.environ.get('SDN_PUNT_METERS', '1') == '1'
+        self.PUNT_RATES = {'miss': 200, 'arp': 100, 'gateway': 100}
+        self.PUNT_BURST = 1.0
+        self.ADMIT_RATE = 300
+        self.ADMIT_BURST = 600
+        self.BLOCK_AFTER = 100
+        self.BLOCK_SECONDS = 10
+        self.admission = admission.Admission(self.ADMIT_RATE, self.ADMIT_BURST, self.BLOCK_AFTER)
+        self.meters = defaultdict(set)   # dpid -> meter ids installed
+        self.meter_drops = {}            # (dpid, meter id) -> packets dropped by its band
         
         # Statistics
         self.stats = Counter()
         
-        # Start aging thread
+        # Outbound FlowMod/PacketOut batching per datapath
+        self.sender = ofp_batch.BatchSender(window=0.001, max_batch=64)
+        
+        # Reconnect: 'reconcile' dumps a (re)connecting switch's flows and groups, adopts
+        # the surviving host/route flows and sends only what differs from the desired
+        # pipeline; 'clear' wipes the switch and reinstalls it. A dump not answered
+        # within RECONCILE_TIMEOUT seconds falls back to clear
+        self.RECONNECT = os.environ.get('SDN_RECONNECT', 'reconcile')
+        self.RECONCILE_TIMEOUT = 5.0
+        self.reconciling = {}   # dpid -> reconcile.Reconciliation
+        
+        # Routed packets waiting for next-hop ARP: (dpid, ip) -> [(msg, hdr, dst_vlan)]
+        self.pending = pending_queue.PendingQueue(ttl=3.0, max_per_target=16)
+        
+        # Sharding: SDN_WORKERS processes split the datapaths, each MASTER for
+        # its own and SLAVE for the rest; state is shared via state_service.py
+        self.WORKER_ID = int(os.environ.get('SDN_WORKER_ID', 0))
+        self.WORKERS = int(os.environ.get('SDN_WORKERS', 1))
+        self.STATE_SOCKET = os.environ.get('SDN_STATE_SOCKET', '/tmp/sdn-state.sock')
+        self.DPID_ASSIGNMENT = {}  # dpid -> worker, overrides the hash
+        self.members = list(range(self.WORKERS))
+        self.role_generation = 0
+        self.owned = set()
+        self.state = None
+        if self.WORKERS > 1 or 'SDN_STATE_SOCKET' in os.environ:
+            self.state = sharding.StateClient(self.STATE_SOCKET, self.WORKER_ID,
+                                              self._on_members, self._on_remote_mac,
+                                              self._on_remote_ip)
+        
+        # Warm restart: hosts and ARP bindings changed since the last snapshot, with their
+        # aging timestamps, are appended to SNAPSHOT_PATH every SNAPSHOT_INTERVAL seconds
+        # (compacted as it grows) and replayed at start; SDN_SNAPSHOT='' turns it off.
+        # File I/O runs in the tpool threads, encoding yields every chunk of records
+        self.SNAPSHOT_PATH = os.environ.get('SDN_SNAPSHOT', f'/tmp/sdn-hosts-{self.WORKER_ID}.log')
+        self.SNAPSHOT_INTERVAL = 5
+        self.snapshot = None
+        self.snapshot_lock = hub.Semaphore()
+        if self.SNAPSHOT_PATH:
+            self.snapshot = host_snapshot.HostSnapshot(self.SNAPSHOT_PATH, run=tpool.execute,
+                                                       pause=lambda: hub.sleep(0))
+        else:
+            self.hosts.stop_tracking()
+        
+        # Metrics: text exposition on http://127.0.0.1:METRICS_PORT/metrics (0 = off)
+        self.METRICS_PORT = int(os.environ.get('SDN_METRICS_PORT', 9180 + self.WORKER_ID))
+        self.metrics = metrics.Registry()
+        self.packet_in_latency = {
+            kind: self.metrics.histogram('packet_in_seconds', 'PacketIn handling time by packet type',
+                                         type=kind)
+            for kind in ('arp', 'icmp', 'routed', 'l2', 'lldp', 'dropped', 'shed')}
+        self.aging_duration = self.metrics.histogram('aging_loop_seconds', 'Aging tick duration')
+        self.reconcile_duration = self.metrics.histogram('reconcile_seconds',
+                                                         'Switch connect to reconciled pipeline sent')
+        if self.METRICS_PORT:
+            hub.spawn(self._serve_metrics)
+        
+        # Start log writer and aging threads
+        hub.spawn(self.log.run, hub.sleep)
         hub.spawn(self._aging_loop)
+        hub.spawn(self._stats_loop)
+        hub.spawn(self._config_loop)
+        if self.snapshot is not None:
+            hub.spawn(self._snapshot_loop)
         
-        print(f"{Colors.OKGREEN}{ts()} SimpleHybridSwitch initialized{Colors.ENDC}")
+        self.log.notice('app', "SimpleHybridSwitch initialized")
+
+    def _restore_hosts(self):
+        """Load the host snapshot; restored entries age from their saved timestamps"""
+        start = time.perf_counter()
+        try:
+            macs, ips = self.snapshot.load(self.hosts, self.MAC_AGING, self.ARP_AGING, time.time())
+        except (OSError, ValueError, struct.error) as e:
+            self.log.error('app', "Host snapshot %s not loaded: %s", self.SNAPSHOT_PATH, e)
+            return
+        if self._timer_aging():
+            for i, (mac, host) in enumerate(list(self.hosts.by_mac.items())):
+                self.mac_aging.track(mac, host.ts)
+                if i % 1000 == 999:
+                    hub.sleep(0)
+            for i, (ip, host) in enumerate(list(self.hosts.by_ip.items())):
+                self.arp_aging.track(ip, host.ip_ts)
+                if i % 1000 == 999:
+                    hub.sleep(0)
+        self.stats['snapshot_restored_hosts'] = macs
+        self.stats['snapshot_restored_ips'] = ips
+        self.log.notice('app', "Host snapshot %s: %d hosts, %d ARP bindings restored in %.1f ms",
+                        self.SNAPSHOT_PATH, macs, ips, (time.perf_counter() - start) * 1000)
+
+    def _save_hosts(self):
+        """Append the hosts/bindings changed since the last snapshot"""
+        with self.snapshot_lock:
+            try:
+                written = self.snapshot.append(self.hosts, *self.hosts.take_dirty())
+            except OSError as e:
+                self.stats['snapshot_errors'] += 1
+                self.log.error('app', "Host snapshot %s not written: %s", self.SNAPSHOT_PATH, e)
+                return
+        self.stats['snapshot_records'] += written
+
+    def _snapshot_loop(self):
+        # Replayed in the background: hosts learned meanwhile are newer than their records
+        # and kept; a switch connecting before it is done learns the rest reactively
+        with self.snapshot_lock:
+            self._restore_hosts()
+        while True:
+            hub.sleep(self.SNAPSHOT_INTERVAL)
+            self._save_hosts()
+
+    def stop(self):
+        if self.snapshot is not None:
+            self._save_hosts()
+        self.log.flush()
+        super(SimpleHybridSwitch, self).stop()
+
+    def _use_fabric(self, fabric):
+        """Make a loaded FabricConfig the running one"""
+        self.fabric = fabric
+        self.port_config = fabric.port_config
+        self.gateway_ips = fabric.gateway_ips
+        self.gateway_macs = fabric.gateway_macs
+        self.link_params = fabric.link_params
+        self.connected_subnets = fabric.connected_subnets
+        self.static_routes = fabric.static_routes
+        self.routes = self._build_routes()
+        self.log.notice('app', "Fabric %s loaded: %d switches, VLANs %s", fabric.name,
+                        len(self.port_config), sorted(self.gateway_ips))
+
+    def _build_routes(self):
+        """RouteTable from the gateway subnets, connected_subnets and static_routes"""
+        routes = route_table.RouteTable()
+        for vlan_id, gw_ip in self.gateway_ips.items():
+            routes.add(f"{gw_ip}/{self.fabric.gateway_plens[vlan_id]}", vlan=vlan_id)
+            for prefix in self.connected_subnets.get(vlan_id, ()):
+                routes.add(prefix, vlan=vlan_id)
+        for prefix, next_hop in self.static_routes.items():
+            routes.add(prefix, next_hop=next_hop)
+        return routes
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
         dp = ev.msg.datapath
         self.datapaths[dp.id] = dp
         
-        # Clear flows
+        # Start LLDP sender (sends only while this worker owns the switch)
+        hub.spawn(self._lldp_sender, dp)
+        
+        if self.state is None:
+            self.owned.add(dp.id)
+            self._setup_switch(dp)
+        elif self._owns(dp.id):
+            self._take_ownership(dp)
+        else:
+            self._request_role(dp, False)
+            self.log.info('switch', "Switch %s connected as SLAVE", dp.id)
+
+    def _setup_switch(self, dp):
+        """Install the base pipeline on a switch this worker owns"""
+        if self.RECONNECT == 'reconcile':
+            self._start_reconcile(dp)
+            return
+        
+        # Clear flows and groups
         self._clear_flows(dp)
+        self._install_pipeline(dp)
+
+    def _install_pipeline(self, dp):
+        """Flood groups, base flows and known-host flows of a switch"""
+        # Install VLAN flood groups
+        self._install_flood_groups(dp)
         
-        # Install table-miss flow
-        self._add_flow(dp, 0, dp.ofproto_parser.OFPMatch(),
-                      [dp.ofproto_parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)],
-                      0, 0, "Table-Miss")
+        parser = dp.ofproto_parser
+        to_controller = [parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)]
+        
+        # Ingress: VLAN assign/validate per port, LLDP to controller
+        self._install_ingress(dp)
+        self._add_flow(dp, 300, parser.OFPMatch(eth_type=ether.ETH_TYPE_LLDP),
+                      to_controller, table=TABLE_INGRESS)
+        
+        # Table-miss in every table goes to the controller
+        for table in (TABLE_INGRESS, TABLE_L3, TABLE_L2):
+            self._add_flow(dp, 0, parser.OFPMatch(), to_controller, table=table)
         
         # Send ARP to controller
-        match = dp.ofproto_parser.OFPMatch(eth_type=ether.ETH_TYPE_ARP)
-        self._add_flow(dp, 100, match,
-                      [dp.ofproto_parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)],
-                      0, 0, "ARP")
+        match = parser.OFPMatch(eth_type=ether.ETH_TYPE_ARP)
+        self._add_flow(dp, 100, match, to_controller, table=TABLE_L3)
+        self._add_flow(dp, 100, match, to_controller, table=TABLE_L2)
         
-        # Send gateway IPs to controller
+        # Send gateway IPs to controller, answer their pings in the switch
         for gw_ip in self.gateway_ips.values():
-            match = dp.ofproto_parser.OFPMatch(eth_type=ether.ETH_TYPE_IP, ipv4_dst=gw_ip)
-            self._add_flow(dp, 60, match,
-                          [dp.ofproto_parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)],
-                          300, 0, f"GW-{gw_ip}")
-        
-        # Send ICMP to controller
-        match = dp.ofproto_parser.OFPMatch(eth_type=ether.ETH_TYPE_IP, ip_proto=inet.IPPROTO_ICMP)
-        self._add_flow(dp, 70, match,
-                      [dp.ofproto_parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)],
-                      180, 0, "ICMP")
-        
-        # Start LLDP sender
-        hub.spawn(self._lldp_sender, dp)
+            self._install_gateway_punt(dp, gw_ip)
+        self._install_icmp_responders(dp)
+        
+        # Metered per-port copies of the punts above
+        self._install_punt_flows(dp)
+        
+        # Broadcast flooding through the groups
+        self._install_flood_flows(dp)
+        
+        # Proactive known-host flows
+        if self.PROACTIVE:
+            self._install_proactive(dp)
+        
+        # Confirm the base pipeline with one barrier
+        self.sender.request_barrier(dp)
+        
+        self.log.info('switch', "Switch %s connected: %d messages queued", dp.id, self.sender.depth(dp.id))
+
+    @set_ev_cls(ofp_event.EventOFPStateChange, DEAD_DISPATCHER)
+    def state_change_handler(self, ev):
+        dp = ev.datapath
+        if dp.id is not None and self.datapaths.get(dp.id) is dp:
+            del self.datapaths[dp.id]
+            self.owned.discard(dp.id)
+            self.sender.forget(dp.id)
+            self.pending.forget(dp.id)
+            self.flood_pruned.pop(dp.id, None)
+            self.mp_groups.pop(dp.id, None)
+            self.reconciling.pop(dp.id, None)
+            self.admission.forget(dp.id)
+            self._forget_stats(dp.id)
+            self._topology_changed(self.graph.remove_switch(dp.id))
+            self.log.warning('switch', "Switch %s disconnected", dp.id)
+
+    def _start_reconcile(self, dp):
+        """Dump a switch's flows, groups and meters; the pipeline is diffed once all arrive"""
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        flows = parser.OFPFlowStatsRequest(dp, 0, ofp.OFPTT_ALL, ofp.OFPP_ANY, ofp.OFPG_ANY,
+                                           0, 0, parser.OFPMatch())
+        groups = parser.OFPGroupDescStatsRequest(dp, 0)
+        dp.set_xid(flows)
+        dp.set_xid(groups)
+        meters = None
+        if self.PUNT_METERS:
+            meters = parser.OFPMeterConfigStatsRequest(dp, 0, ofp.OFPM_ALL)
+            dp.set_xid(meters)
+        self.reconciling[dp.id] = reconcile.Reconciliation(flows.xid, groups.xid,
+                                                           meters.xid if meters else None)
+        self.sender.send(dp, flows)
+        self.sender.send(dp, groups)
+        if meters is not None:
+            self.sender.send(dp, meters)
+        hub.spawn_after(self.RECONCILE_TIMEOUT, self._reconcile_timeout, dp, flows.xid)
+
+    def _reconcile_timeout(self, dp, xid):
+        state = self.reconciling.get(dp.id)
+        if state is None or state.flow_xid != xid or self.datapaths.get(dp.id) is not dp:
+            return
+        del self.reconciling[dp.id]
+        self.stats['reconcile_timeouts'] += 1
+        self.log.warning('switch', "Switch %s: no flow dump within %.0fs, clearing it",
+                         dp.id, self.RECONCILE_TIMEOUT)
+        self._clear_flows(dp)
+        self._install_pipeline(dp)
+
+    @set_ev_cls(ofp_event.EventOFPGroupDescStatsReply, MAIN_DISPATCHER)
+    def group_desc_reply_handler(self, ev):
+        self._reconcile_reply(ev.msg)
+
+    @set_ev_cls(ofp_event.EventOFPMeterConfigStatsReply, MAIN_DISPATCHER)
+    def meter_config_reply_handler(self, ev):
+        self._reconcile_reply(ev.msg)
+
+    def _reconcile_reply(self, msg):
+        """Feed a dump reply to a pending reconciliation, True if it was one"""
+        dp = msg.datapath
+        state = self.reconciling.get(dp.id)
+        if state is None or msg.xid not in (state.flow_xid, state.group_xid, state.meter_xid):
+            return False
+        if state.add_reply(msg.xid, msg.body, msg.flags & dp.ofproto.OFPMPF_REPLY_MORE):
+            del self.reconciling[dp.id]
+            if dp.id in self.owned:
+                self._finish_reconcile(dp, state)
+        return True
+
+    def _finish_reconcile(self, dp, state):
+        """Adopt surviving host/route state, then send only what differs from the desired pipeline"""
+        ofp = dp.ofproto
+        self._forget_switch_flows(dp.id)
+        adopted = self._adopt_flows(dp, state.flows)
+        
+        # Existing groups: flood groups get MODIFY, multipath groups keep their buckets
+        for group in state.groups:
+            if group.group_id >= MULTIPATH_GROUP_BASE:
+                self.mp_groups[dp.id][group.group_id - MULTIPATH_GROUP_BASE] = tuple(
+                    (bucket.watch_port, bucket.weight) for bucket in group.buckets)
+            else:
+                self.flood_groups[dp.id].add(group.group_id)
         
-        print(f"{Colors.OKBLUE}{ts()} Switch {dp.id} connected{Colors.ENDC}")
+        # Existing punt meters get MODIFY; ones of ports no longer configured go
+        existing = {meter.meter_id for meter in state.meters}
+        self.meters[dp.id] = set(existing)
+        
+        # The desired pipeline is the normal install path, recorded instead of sent
+        sender = self.sender
+        self.sender = reconcile.Recorder(sender)
+        try:
+            self._install_pipeline(dp)
+        finally:
+            recorder, self.sender = self.sender, sender
+        
+        # Unwanted flood groups were already deleted by _install_flood_groups
+        groups_add, groups_modify, groups_delete, groups_kept = reconcile.diff_groups(
+            recorder.groups, state.groups, lambda group: True)
+        flows_add, flows_delete, flows_kept = reconcile.diff_flows(
+            recorder.flows, state.flows,
+            lambda stat: reconcile.flow_id(stat.table_id, stat.priority, stat.match) in adopted)
+        
+        # Groups before the flows that use them, group deletes after
+        for mod in groups_add:
+            mod.command = ofp.OFPGC_ADD
+            self.sender.send(dp, mod)
+        for mod in groups_modify:
+            mod.command = ofp.OFPGC_MODIFY
+            self.sender.send(dp, mod)
+        for stat in flows_delete:
+            self._delete_flows(dp, stat.table_id, stat.match, priority=stat.priority)
+        for mod in flows_add:
+            self.sender.send(dp, mod)
+        for group_id in groups_delete:
+            self.sender.send(dp, dp.ofproto_parser.OFPGroupMod(dp, ofp.OFPGC_DELETE, ofp.OFPGT_ALL, group_id))
+        for meter_id in existing - self._wanted_meters(dp.id):
+            self._delete_meter(dp, meter_id)
+        self.sender.request_barrier(dp)
+        
+        elapsed = time.time() - state.started
+        self.reconcile_duration.observe(elapsed)
+        self.stats['reconciles'] += 1
+        self.stats['reconcile_flows_kept'] += flows_kept
+        self.stats['reconcile_flows_added'] += len(flows_add)
+        self.stats['reconcile_flows_deleted'] += len(flows_delete)
+        self.stats['reconcile_groups_sent'] += len(groups_add) + len(groups_modify)
+        self.log.notice('switch', "Switch %s reconciled in %.0f ms: %d flows kept (%d adopted), "
+                        "%d added, %d deleted; groups %d kept, %d sent, %d deleted",
+                        dp.id, elapsed * 1000, flows_kept, len(adopted), len(flows_add),
+                        len(flows_delete), groups_kept, len(groups_add) + len(groups_modify),
+                        len(groups_delete))
+
+    def _adopt_flows(self, dp, dumped):
+        """Rebuild host, route and responder state from a switch's surviving flows
+
+        Returns the flow ids adopted; learned flows that no longer fit the
+        fabric config are left out, so the diff deletes them.
+        """
+        now = time.time()
+        sw = self.fabric.switch(dp.id)
+        flows = self.flow_budget.table(dp.id)
+        adopted = set()
+        routes = []
+        for stat in dumped:
+            key = self._flow_key(stat.table_id, stat.priority, stat.match)
+            if key is None:
+                continue
+            if key[0] == 'l2':
+                out = self._flow_output(stat)
+                if key[1] not in sw.vlans or out is None:
+                    continue
+                # Hosts are learned at access ports; trunk flows are re-learned from their edge
+                if out[0] == 'port' and out[1] in sw.config and not sw.is_trunk(out[1]):
+                    if key[1] not in sw.port_vlans(out[1]):
+                        continue
+                    self.hosts.learn_mac(dp.id, key[2], out[1], key[1], now)
+                    if self._timer_aging():
+                        self.mac_aging.track(key[2], now)
+            elif key[0] == 'l3':
+                fields = {a.key: a.value for inst in stat.instructions
+                          for a in getattr(inst, 'actions', ()) if hasattr(a, 'key')}
+                if 'eth_dst' not in fields or 'vlan_vid' not in fields:
+                    continue
+                action = (fields['eth_dst'], fields['vlan_vid'] & 0xfff)
+                self.route_agg[dp.id].prefixes[(key[1], key[2])] = action
+                if key[2] == 32:
+                    routes.append((route_table.int_to_ip(key[1]), action))
+            elif key[0] == 'arp':
+                if key[1] not in sw.config or sw.is_trunk(key[1]):
+                    continue
+                self.arp_responders[key[2]].add((dp.id, key[1]))
+            flows.add(key, stat.table_id, stat.priority, stat.match, now)
+            flows.update(key, stat.byte_count, now)
+            adopted.add(reconcile.flow_id(stat.table_id, stat.priority, stat.match))
+        
+        # ARP bindings from host routes, at the host's edge port
+        for ip, (mac, vlan_id) in routes:
+            host = self.hosts.by_mac.get(mac)
+            if host is None:
+                continue
+            for dpid, port in zip(host.dpids, host.ports):
+                if not self.fabric.switch(dpid).is_trunk(port):
+                    self.hosts.learn_ip(dpid, ip, mac, port, vlan_id, now)
+                    if self._timer_aging():
+                        self.arp_aging.track(ip, now)
+                    break
+        return adopted
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def barrier_reply_handler(self, ev):
+        msg = ev.msg
+        rtt = self.sender.barrier_reply(msg.datapath.id, msg.xid)
+        if rtt is not None:
+            self.log.debug('barrier', "Switch %s batch confirmed in %.1f ms", msg.datapath.id, rtt * 1000)
+
+    def get_stats(self):
+        """Controller counters plus the sender and pending-queue ones"""
+        stats = dict(self.stats)
+        stats['hosts'] = len(self.hosts)
+        stats['arp_bindings'] = len(self.hosts.by_ip)
+        if self.snapshot is not None:
+            stats['snapshot_bytes'] = self.snapshot.size
+            stats['snapshot_compactions'] = self.snapshot.compactions
+        stats.update({f'pending_{k}': v for k, v in self.pending.counters.items()})
+        stats.update({f'sender_{k}': v for k, v in self.sender.summary().items()})
+        stats['owned_switches'] = len(self.owned)
+        stats['links'] = len(self.graph)
+        stats['pinned_flows'] = len(self.pinned)
+        stats.update({f'link_util_{dpid}_{port}': round(u, 3)
+                      for (dpid, port), u in sorted(self.link_util.items())})
+        stats['path_recomputes'] = self.graph.recomputes
+        stats.update({f'flow_{k}': v for k, v in self.flow_budget.summary().items()})
+        stats['route_table_size'] = len(self.routes)
+        stats['route_prefixes'] = sum(len(agg) for agg in self.route_agg.values())
+        stats['arp_responders'] = sum(len(ports) for ports in self.arp_responders.values())
+        stats['icmp_template_hits'] = self.echo_replies.hits
+        stats['icmp_template_misses'] = self.echo_replies.misses
+        stats['packets_in_shed'] = sum(v for k, v in self.stats.items() if k.startswith('shed_'))
+        stats['blocked_sources'] = len(self.admission.blocked)
+        stats['punt_meter_dropped'] = sum(self.meter_drops.values())
+        stats.update({f'log_{k}': v for k, v in self.log.summary().items()})
+        for kind, hist in self.packet_in_latency.items():
+            if hist.count:
+                stats[f'packet_in_{kind}_p99_us'] = hist.quantile(0.99) * 1e6
+        if self.state is not None:
+            stats['state_dropped'] = self.state.dropped
+        return stats
+
+    def _owns(self, dpid):
+        """True if this worker should be MASTER for dpid"""
+        return sharding.owner_of(dpid, self.members, self.DPID_ASSIGNMENT) == self.WORKER_ID
+
+    def _request_role(self, dp, master):
+        """Send an OpenFlow role request for this worker"""
+        ofp = dp.ofproto
+        role = ofp.OFPCR_ROLE_MASTER if master else ofp.OFPCR_ROLE_SLAVE
+        self.sender.send(dp, dp.ofproto_parser.OFPRoleRequest(dp, role, self.role_generation))
+
+    def _take_ownership(self, dp):
+        """Become MASTER for a switch and (re)install its pipeline"""
+        self._request_role(dp, True)
+        self.owned.add(dp.id)
+        self._setup_switch(dp)
+
+    def _on_members(self, members, generation):
+        """Worker set changed: claim or release switches"""
+        self.members = sorted(members)
+        self.role_generation = generation
+        for dpid, dp in list(self.datapaths.items()):
+            owns = self._owns(dpid)
+            if owns and dpid not in self.owned:
+                self._take_ownership(dp)
+                self.log.notice('shard', "Took over switch %s", dpid)
+            elif not owns and dpid in self.owned:
+                self.owned.discard(dpid)
+                self.pending.forget(dpid)
+                self._request_role(dp, False)
+                self.log.warning('shard', "Handed over switch %s", dpid)
+            elif owns:
+                # Re-assert with the new generation so a stale master is refused
+                self._request_role(dp, True)
+        self.log.info('shard', "Workers %s: worker %s owns %s", self.members, self.WORKER_ID, sorted(self.owned))
+
+    def _on_remote_mac(self, msg):
+        """MAC learned by another worker"""
+        self.hosts.learn_mac(msg['dpid'], msg['mac'], msg['port'], msg['vlan'], msg['ts'])
+        if self._timer_aging():
+            self.mac_aging.track(msg['mac'], msg['ts'])
+
+    def _on_remote_ip(self, msg):
+        """ARP binding learned by another worker"""
+        self.hosts.learn_ip(msg['dpid'], msg['ip'], msg['mac'], msg['port'], msg['vlan'], msg['ts'])
+        if self._timer_aging():
+            self.mac_aging.track(msg['mac'], msg['ts'])
+            self.arp_aging.track(msg['ip'], msg['ts'])
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
+        start = time.perf_counter()
+        kind = None
         try:
             msg = ev.msg
             dp = msg.datapath
             in_port = msg.match['in_port']
-            pkt = packet.Packet(msg.data)
-            eth = pkt.get_protocol(ethernet.ethernet)
+            hdr = packet_parser.parse(msg.data)
             
-            if not eth:
+            if not hdr:
                 return
             
             self.stats['packets_in'] += 1
             
             # Handle LLDP
-            if eth.ethertype == ether.ETH_TYPE_LLDP:
-                self._handle_lldp(dp, pkt, in_port)
+            if hdr.ethertype == ether.ETH_TYPE_LLDP:
+                kind = 'lldp'
+                self._handle_lldp(dp, msg, in_port)
+                return
+            
+            # Admission: PacketIns beyond ADMIT_RATE per switch port are shed
+            now = time.time()
+            if not self.admission.admit((dp.id, in_port), now):
+                kind = 'shed'
+                self._shed(dp, hdr, in_port, now)
                 return
             
             # Get VLAN
-            vlan_id = self._get_vlan(dp, pkt, in_port)
+            vlan_id = self._get_vlan(dp, hdr, in_port)
             if vlan_id is None:
                 return
             
-            # Learn MAC
-            self.mac_table[dp.id][eth.src] = (in_port, vlan_id, time.time())
+            # Learn MAC (routed frames carry a gateway MAC as source)
+            if hdr.eth_src not in self.fabric.gateway_mac_set:
+                last = self.hosts.mac_last_seen(hdr.eth_src)
+                moved = self.hosts.learn_mac(dp.id, hdr.eth_src, in_port, vlan_id, now)
+                if self._timer_aging():
+                    self.mac_aging.track(hdr.eth_src, now)
+                # Other workers age their copy too: refresh it at half the aging time
+                if self.state is not None and (moved or now - last >= self.MAC_AGING / 2):
+                    self.state.publish_mac(dp.id, hdr.eth_src, in_port, vlan_id, now)
+                # Learned at its edge port: point every switch at it along its shortest path
+                if self.PROACTIVE and moved and not self.graph.is_link_port(dp.id, in_port):
+                    self._install_host_paths(self.hosts.by_mac[hdr.eth_src], proactive=True)
             
             # Handle ARP
-            arp_pkt = pkt.get_protocol(arp.arp)
-            if arp_pkt:
-                self._handle_arp(dp, arp_pkt, in_port, vlan_id, msg)
+            if hdr.arp_op is not None:
+                kind = 'arp'
+                self._handle_arp(dp, hdr, in_port, vlan_id, msg)
                 return
             
             # Handle IPv4
-            ip_pkt = pkt.get_protocol(ipv4.ipv4)
-            if ip_pkt:
-                self._handle_ipv4(dp, ip_pkt, eth, in_port, vlan_id, msg)
+            if hdr.ip_dst is not None:
+                kind = self._handle_ipv4(dp, hdr, in_port, vlan_id, msg)
                 return
             
             # L2 Forwarding
-            self._l2_forward(dp, eth, vlan_id, in_port, msg)
+            kind = 'l2'
+            self._l2_forward(dp, hdr, vlan_id, in_port, msg)
             
         except Exception as e:
-            print(f"{Colors.FAIL}{ts()} Error: {e}{Colors.ENDC}")
+            self.log.error('error', "Error: %s", e)
+        finally:
+            if kind is not None:
+                self.packet_in_latency[kind].observe(time.perf_counter() - start)
+
+    def _shed(self, dp, hdr, in_port, now):
+        """Count a shed PacketIn; a source that keeps flooding gets a temporary drop flow"""
+        if hdr.ethertype == ether.ETH_TYPE_ARP:
+            punt = 'arp'
+        elif hdr.ip_dst in self.fabric.gateway_ip_set:
+            punt = 'gateway'
+        else:
+            punt = 'miss'
+        self.stats[f'shed_{punt}'] += 1
+        if not self.admission.shed(dp.id, in_port, hdr.eth_src, punt):
+            return
+        if hdr.eth_src in self.fabric.gateway_mac_set:
+            return
+        self.admission.block(dp.id, in_port, hdr.eth_src, now + self.BLOCK_SECONDS)
+        match = dp.ofproto_parser.OFPMatch(in_port=in_port, eth_src=hdr.eth_src)
+        self._add_flow(dp, 400, match, [], hard=self.BLOCK_SECONDS, table=TABLE_INGRESS)
+        self.stats['sources_blocked'] += 1
+        self.log.warning('admission', "Switch %s port %s: %s dropped for %ds after %d shed PacketIns",
+                         dp.id, in_port, hdr.eth_src, self.BLOCK_SECONDS, self.BLOCK_AFTER)
 
-    def _handle_arp(self, dp, arp_pkt, in_port, vlan_id, msg):
+    def _handle_arp(self, dp, hdr, in_port, vlan_id, msg):
         """Handle ARP packets"""
+        changed = False
         # Learn ARP
-        if arp_pkt.opcode in (arp.ARP_REQUEST, arp.ARP_REPLY):
-            self.arp_table[dp.id][arp_pkt.src_ip] = (arp_pkt.src_mac, in_port, vlan_id, time.time())
+        if hdr.arp_op in (arp.ARP_REQUEST, arp.ARP_REPLY):
+            now = time.time()
+            last = self.hosts.ip_last_seen(hdr.arp_src_ip)
+            old = self.hosts.by_ip.get(hdr.arp_src_ip)
+            if old is not None and old.mac != hdr.arp_src_mac:
+                self._withdraw_arp_responders(hdr.arp_src_ip)
+            changed = self.hosts.learn_ip(dp.id, hdr.arp_src_ip, hdr.arp_src_mac, in_port, vlan_id, now)
+            if self._timer_aging():
+                self.mac_aging.track(hdr.arp_src_mac, now)
+                self.arp_aging.track(hdr.arp_src_ip, now)
+            if self.state is not None and (changed or now - last >= self.ARP_AGING / 2):
+                self.state.publish_ip(dp.id, hdr.arp_src_ip, hdr.arp_src_mac, in_port, vlan_id, now)
+            out_port = self._host_out_port(dp.id, self.hosts.by_mac[hdr.arp_src_mac])
+            if self.PROACTIVE and changed:
+                self._install_route_flows(dp, hdr.arp_src_ip, hdr.arp_src_mac, out_port, vlan_id,
+                                          proactive=True)
+            self._release_pending(hdr.arp_src_ip, vlan_id)
+        
+        # Gratuitous ARP: the refresh above is all it takes unless the binding is news here
+        if (self.ARP_SUPPRESSION != 'off' and hdr.arp_src_ip == hdr.arp_dst_ip
+                and not changed):
+            self.stats['garp_absorbed'] += 1
+            return
         
         # Proxy ARP
-        if self._proxy_arp(dp, arp_pkt, in_port, vlan_id, msg):
+        if self._proxy_arp(dp, hdr, in_port, vlan_id, msg):
             self.stats['arp_proxy'] += 1
             return
         
+        if self._suppress_arp(dp, hdr, in_port, vlan_id, msg):
+            self.stats['arp_suppressed'] += 1
+            return
+        
+        # Replies and unicast probes only go to their destination (ours end here)
+        if hdr.eth_dst in self.fabric.gateway_mac_set:
+            return
+        if hdr.eth_dst != BROADCAST_MAC:
+            self._l2_forward(dp, hdr, vlan_id, in_port, msg)
+            return
+        
         # Flood ARP
-        out_ports = self._get_flood_ports(dp.id, vlan_id, in_port)
-        if out_ports:
-            actions = []
-            for port in out_ports:
-                if self._is_trunk(dp.id, port):
-                    actions.append(dp.ofproto_parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q))
-                    actions.append(dp.ofproto_parser.OFPActionSetField(vlan_vid=0x1000 | vlan_id))
-                actions.append(dp.ofproto_parser.OFPActionOutput(port))
-            
-            self._packet_out(dp, msg, actions)
+        self.stats['arp_flooded'] += 1
+        self._packet_out(dp, msg, self._flood_actions(dp, vlan_id, hdr.vlan_id is not None))
 
-    def _proxy_arp(self, dp, arp_pkt, in_port, vlan_id, msg):
+    def _proxy_arp(self, dp, hdr, in_port, vlan_id, msg):
         """Proxy ARP for gateway"""
-        if arp_pkt.opcode != arp.ARP_REQUEST:
+        if hdr.arp_op != arp.ARP_REQUEST:
             return False
         
-        target_ip = arp_pkt.dst_ip
+        target_ip = hdr.arp_dst_ip
         
         # Gateway proxy
         if target_ip == self.gateway_ips.get(vlan_id):
-            self._send_arp_reply(dp, arp_pkt, self.gateway_macs[vlan_id], in_port, msg)
-            print(f"{Colors.OKGREEN}{ts()} ARP Proxy: {target_ip} -> {self.gateway_macs[vlan_id]}{Colors.ENDC}")
+            self._send_arp_reply(dp, hdr, self.gateway_macs[vlan_id], in_port, vlan_id, msg)
+            self.log.notice('arp', "ARP Proxy: %s -> %s", target_ip, self.gateway_macs[vlan_id])
             return True
         
         # Cross-VLAN proxy
         for dst_vlan, gw_ip in self.gateway_ips.items():
             if target_ip == gw_ip and dst_vlan != vlan_id:
-                self._send_arp_reply(dp, arp_pkt, self.gateway_macs[dst_vlan], in_port, msg)
-                print(f"{Colors.OKBLUE}{ts()} Cross-VLAN ARP: {target_ip} -> {self.gateway_macs[dst_vlan]}{Colors.ENDC}")
+                self._send_arp_reply(dp, hdr, self.gateway_macs[dst_vlan], in_port, vlan_id, msg)
+                self.log.info('arp', "Cross-VLAN ARP: %s -> %s", target_ip, self.gateway_macs[dst_vlan])
                 return True
         
         return False
 
-    def _send_arp_reply(self, dp, req, reply_mac, out_port, msg):
+    def _suppress_arp(self, dp, hdr, in_port, vlan_id, msg):
+        """Answer a host-to-host request from a fresh binding instead of flooding it"""
+        if self.ARP_SUPPRESSION == 'off' or hdr.arp_op != arp.ARP_REQUEST:
+            return False
+        host = self.hosts.by_ip.get(hdr.arp_dst_ip)
+        if (host is None or host.vlan != vlan_id or host.mac == hdr.arp_src_mac
+                or time.time() - host.ip_ts > self.ARP_FRESH):
+            return False
+        
+        self._send_arp_reply(dp, hdr, host.mac, in_port, vlan_id, msg)
+        if self.ARP_SUPPRESSION == 'flows' and not self._is_trunk(dp.id, in_port):
+            self._install_arp_responder(dp, in_port, host)
+        self.log.info('arp', "ARP suppressed: %s is-at %s", host.ip, host.mac)
+        return True
+
+    def _arp_responder_match(self, dp, port, ip):
+        return dp.ofproto_parser.OFPMatch(in_port=port, eth_type=ether.ETH_TYPE_ARP,
+                                          arp_op=arp.ARP_REQUEST, arp_tpa=ip)
+
+    def _install_arp_responder(self, dp, port, host):
+        """Reply to requests for host.ip on an access port in the switch (OVS NXM moves)"""
+        parser = dp.ofproto_parser
+        match = self._arp_responder_match(dp, port, host.ip)
+        actions = [parser.NXActionRegMove(src_field='eth_src', dst_field='eth_dst', n_bits=48),
+                   parser.OFPActionSetField(eth_src=host.mac),
+                   parser.OFPActionSetField(arp_op=arp.ARP_REPLY),
+                   parser.NXActionRegMove(src_field='arp_sha', dst_field='arp_tha', n_bits=48),
+                   parser.NXActionRegMove(src_field='arp_spa', dst_field='arp_tpa', n_bits=32),
+                   parser.OFPActionSetField(arp_sha=host.mac),
+                   parser.OFPActionSetField(arp_spa=host.ip),
+                   parser.OFPActionPopVlan(),
+                   parser.OFPActionOutput(dp.ofproto.OFPP_IN_PORT)]
+        # Hard timeout: the answer is only as good as the binding's freshness
+        self._add_tracked_flow(dp, ('arp', port, host.ip), TABLE_L2, 110, match, actions,
+                               hard=self.ARP_FRESH)
+        self.arp_responders[host.ip].add((dp.id, port))
+        self.stats['arp_responder_flows'] += 1
+
+    def _withdraw_arp_responders(self, ip):
+        """Delete responder flows of an IP whose binding moved to another MAC"""
+        for dpid, port in self.arp_responders.pop(ip, ()):
+            dp = self.datapaths.get(dpid)
+            self.flow_budget.table(dpid).remove(('arp', port, ip))
+            if dp is not None:
+                self._delete_flows(dp, TABLE_L2, self._arp_responder_match(dp, port, ip))
+
+    def _send_arp_reply(self, dp, req, reply_mac, out_port, vlan_id, msg):
         """Send ARP reply"""
         eth = ethernet.ethernet(
-            dst=req.src_mac,
+            dst=req.arp_src_mac,
             src=reply_mac,
             ethertype=ether.ETH_TYPE_ARP
         )
@@ -236,9 +881,9 @@ class SimpleHybridSwitch(app_manager.RyuApp):
         arp_reply = arp.arp(
             opcode=arp.ARP_REPLY,
             src_mac=reply_mac,
-            src_ip=req.dst_ip,
-            dst_mac=req.src_mac,
-            dst_ip=req.src_ip
+            src_ip=req.arp_dst_ip,
+            dst_mac=req.arp_src_mac,
+            dst_ip=req.arp_src_ip
         )
         
         pkt = packet.Packet()
@@ -246,44 +891,55 @@ class SimpleHybridSwitch(app_manager.RyuApp):
         pkt.add_protocol(arp_reply)
         pkt.serialize()
         
-        actions = [dp.ofproto_parser.OFPActionOutput(out_port)]
+        actions = self._output_actions(dp, out_port, vlan_id, False)
         self._packet_out(dp, msg, actions, pkt.data)
 
-    def _handle_ipv4(self, dp, ip_pkt, eth, in_port, vlan_id, msg):
-        """Handle IPv4 packets"""
+    def _handle_ipv4(self, dp, hdr, in_port, vlan_id, msg):
+        """Handle IPv4 packets, returns the metrics packet type"""
         # Check TTL
-        if ip_pkt.ttl <= 1:
-            print(f"{Colors.WARNING}{ts()} TTL expired: {ip_pkt.src} -> {ip_pkt.dst}{Colors.ENDC}")
-            return
+        if hdr.ip_ttl <= 1:
+            self.log.warning('ttl', "TTL expired: %s -> %s", hdr.ip_src, hdr.ip_dst)
+            return 'dropped'
         
-        # Handle ICMP Echo Request to gateway
-        icmp_pkt = msg.data.get_protocol(icmp.icmp) if hasattr(msg.data, 'get_protocol') else None
+        # Handle ICMP Echo Request to a gateway (any of the router's addresses)
+        if hdr.ip_dst in self.fabric.gateway_ip_set:
+            if hdr.icmp_type != icmp.ICMP_ECHO_REQUEST:
+                return 'dropped'
+            if self.ICMP_RESPONDER == 'controller':
+                # Only the echo reply needs the full protocol tree
+                icmp_pkt = packet.Packet(msg.data).get_protocol(icmp.icmp)
+                if icmp_pkt:
+                    self._send_icmp_reply(dp, hdr, icmp_pkt, in_port, vlan_id, msg)
+            else:
+                self._send_icmp_template_reply(dp, hdr, in_port, vlan_id, msg)
+            return 'icmp'
         
-        if icmp_pkt and icmp_pkt.type_ == icmp.ICMP_ECHO_REQUEST:
-            if ip_pkt.dst == self.gateway_ips.get(vlan_id):
-                self._send_icmp_reply(dp, ip_pkt, icmp_pkt, eth, in_port, vlan_id, msg)
-                return
-            
-            # Route to other VLAN
-            dst_vlan = self._get_ip_vlan(ip_pkt.dst)
-            if dst_vlan and dst_vlan != vlan_id:
-                self._route_packet(dp, ip_pkt, eth, in_port, vlan_id, dst_vlan, msg)
-                return
+        # Route frames sent to the router: other VLAN, or via a static next hop
+        if hdr.eth_dst in self.fabric.gateway_mac_set:
+            resolved = self.routes.resolve(hdr.ip_dst)
+            if resolved is None:
+                self.stats['unroutable'] += 1
+                return 'dropped'
+            dst_vlan, next_hop = resolved
+            if dst_vlan != vlan_id or next_hop != hdr.ip_dst:
+                self._route_packet(dp, hdr, in_port, vlan_id, dst_vlan, next_hop, msg)
+                return 'routed'
         
         # L2 forwarding
-        self._l2_forward(dp, eth, vlan_id, in_port, msg)
+        self._l2_forward(dp, hdr, vlan_id, in_port, msg)
+        return 'l2'
 
-    def _send_icmp_reply(self, dp, ip_pkt, icmp_pkt, eth, in_port, vlan_id, msg):
+    def _send_icmp_reply(self, dp, hdr, icmp_pkt, in_port, vlan_id, msg):
         """Send ICMP echo reply"""
         reply_eth = ethernet.ethernet(
-            dst=eth.src,
+            dst=hdr.eth_src,
             src=self.gateway_macs[vlan_id],
             ethertype=ether.ETH_TYPE_IP
         )
         
         reply_ip = ipv4.ipv4(
-            src=ip_pkt.dst,
-            dst=ip_pkt.src,
+            src=hdr.ip_dst,
+            dst=hdr.ip_src,
             proto=inet.IPPROTO_ICMP,
             ttl=64
         )
@@ -300,67 +956,110 @@ class SimpleHybridSwitch(app_manager.RyuApp):
         pkt.add_protocol(reply_icmp)
         pkt.serialize()
         
-        actions = [dp.ofproto_parser.OFPActionOutput(in_port)]
+        actions = self._output_actions(dp, in_port, vlan_id, False)
         self._packet_out(dp, msg, actions, pkt.data)
         
-        print(f"{Colors.OKGREEN}{ts()} ICMP Reply: {ip_pkt.dst} -> {ip_pkt.src}{Colors.ENDC}")
+        self.log.notice('icmp', "ICMP Reply: %s -> %s", hdr.ip_dst, hdr.ip_src)
         self.stats['icmp_replies'] += 1
 
-    def _route_packet(self, dp, ip_pkt, eth, in_port, src_vlan, dst_vlan, msg):
-        """Route packet between VLANs"""
-        # Find destination MAC
+    def _send_icmp_template_reply(self, dp, hdr, in_port, vlan_id, msg):
+        """Send ICMP echo reply from a cached header template"""
+        gw_mac = bytes.fromhex(self.gateway_macs[vlan_id].replace(':', ''))
+        data = self.echo_replies.reply(msg.data, hdr.l3_offset, gw_mac)
+        if data is None:
+            return
+        actions = self._output_actions(dp, in_port, vlan_id, False)
+        self._packet_out(dp, msg, actions, data)
+        self.log.notice('icmp', "ICMP Reply: %s -> %s", hdr.ip_dst, hdr.ip_src)
+        self.stats['icmp_replies'] += 1
+
+    def _install_icmp_responders(self, dp, only_port=None):
+        """Answer gateway echo requests in the switch: swap addresses, type 0, back out in_port"""
+        if self.ICMP_RESPONDER != 'flows':
+            return
+        parser = dp.ofproto_parser
+        for port, config in self.port_config.get(dp.id, {}).items():
+            if only_port is not None and port != only_port:
+                continue
+            trunk = config['type'] == 'trunk'
+            vlans = self._switch_vlans(dp.id) if trunk else [config.get('vlan', 1)]
+            for vlan_id in vlans:
+                gw_mac = self.gateway_macs.get(vlan_id)
+                if not gw_mac:
+                    continue
+                for gw_ip in self.gateway_ips.values():
+                    match = parser.OFPMatch(in_port=port, vlan_vid=0x1000 | vlan_id,
+                                            eth_type=ether.ETH_TYPE_IP, ip_proto=inet.IPPROTO_ICMP,
+                                            icmpv4_type=icmp.ICMP_ECHO_REQUEST, ipv4_dst=gw_ip)
+                    # OVS fixes the IP and ICMP checksums after the field rewrites
+                    actions = [parser.NXActionRegMove(src_field='eth_src', dst_field='eth_dst', n_bits=48),
+                               parser.OFPActionSetField(eth_src=gw_mac),
+                               parser.NXActionRegMove(src_field='ipv4_src', dst_field='ipv4_dst', n_bits=32),
+                               parser.OFPActionSetField(ipv4_src=gw_ip),
+                               parser.OFPActionSetField(icmpv4_type=icmp.ICMP_ECHO_REPLY),
+                               parser.OFPActionSetNwTtl(icmp_echo.REPLY_TTL)]
+                    if not trunk:
+                        actions.append(parser.OFPActionPopVlan())
+                    actions.append(parser.OFPActionOutput(dp.ofproto.OFPP_IN_PORT))
+                    self._add_flow(dp, 260, match, actions, table=TABLE_L3)
+
+    def _route_packet(self, dp, hdr, in_port, src_vlan, dst_vlan, next_hop, msg):
+        """Route packet to its next hop (the destination itself when connected)"""
+        # Find next-hop MAC
         dst_mac = None
         out_port = None
         
-        if ip_pkt.dst in self.arp_table[dp.id]:
-            dst_mac, out_port, vlan, _ = self.arp_table[dp.id][ip_pkt.dst]
-            if vlan != dst_vlan:
-                dst_mac = None
+        host = self.hosts.by_ip.get(next_hop)
+        if host is not None and host.vlan == dst_vlan:
+            out_port = self._host_out_port(dp.id, host)
+            if out_port is not None:
+                dst_mac = host.mac
         
         if not dst_mac:
-            # Send ARP request for destination
-            self._send_arp_request(dp, ip_pkt.dst, dst_vlan, msg)
+            # Hold the packet; only the first one for this next hop triggers ARP
+            if self.pending.add((dp.id, next_hop), (msg, hdr, dst_vlan)):
+                self._send_arp_request(dp, next_hop, dst_vlan)
             return
         
-        # Build routed packet
-        routed_eth = ethernet.ethernet(
-            dst=dst_mac,
-            src=self.gateway_macs[src_vlan],
-            ethertype=ether.ETH_TYPE_IP
-        )
-        
-        routed_ip = ipv4.ipv4(
-            src=ip_pkt.src,
-            dst=ip_pkt.dst,
-            proto=ip_pkt.proto,
-            ttl=ip_pkt.ttl - 1
-        )
-        
-        pkt = packet.Packet()
-        pkt.add_protocol(routed_eth)
-        pkt.add_protocol(routed_ip)
-        pkt.serialize()
-        
-        # Build actions
-        actions = []
-        if self._is_trunk(dp.id, out_port):
-            actions.append(dp.ofproto_parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q))
-            actions.append(dp.ofproto_parser.OFPActionSetField(vlan_vid=0x1000 | dst_vlan))
-        actions.append(dp.ofproto_parser.OFPActionOutput(out_port))
-        
-        # Install flow
-        match = dp.ofproto_parser.OFPMatch(
-            eth_type=ether.ETH_TYPE_IP,
-            ipv4_src=ip_pkt.src,
-            ipv4_dst=ip_pkt.dst
-        )
-        self._add_flow(dp, 100, match, actions, idle=60, desc=f"Route-{src_vlan}->{dst_vlan}")
+        # Install per-destination route, then the host flows on the rest of the path
+        self._install_route_flows(dp, hdr.ip_dst, dst_mac, out_port, dst_vlan)
+        self._install_path(dp.id, host, first=False)
         
-        self._packet_out(dp, msg, actions, pkt.data)
-        print(f"{Colors.OKBLUE}{ts()} Route: {ip_pkt.src} (VLAN {src_vlan}) -> {ip_pkt.dst} (VLAN {dst_vlan}){Colors.ENDC}")
+        # Forward the first packet with the same rewrite the flow applies
+        self._forward_routed(dp, msg, hdr, dst_mac, out_port, dst_vlan)
+        self.log.info('route', "Route: %s (VLAN %s) -> %s (VLAN %s)", hdr.ip_src, src_vlan, hdr.ip_dst, dst_vlan)
         self.stats['routes'] += 1
 
-    def _send_arp_request(self, dp, target_ip, vlan_id, msg):
+    def _forward_routed(self, dp, msg, hdr, dst_mac, out_port, dst_vlan):
+        """PacketOut a routed packet with the router rewrite"""
+        tagged = hdr.vlan_id is not None
+        actions = self._route_actions(dp, dst_mac, dst_vlan, tagged)
+        actions += self._output_actions(dp, out_port, dst_vlan, tagged)
+        self._packet_out(dp, msg, actions)
+
+    def _release_pending(self, ip, vlan_id):
+        """Forward packets that were waiting for ip, on whichever switch queued them"""
+        host = self.hosts.by_ip.get(ip)
+        if host is None:
+            return
+        
+        # The reply is punted by the switch it enters, not the one that routed
+        for dpid in [key[0] for key in self.pending.targets if key[1] == ip]:
+            waiting = [item for item in self.pending.release((dpid, ip)) if item[2] == vlan_id]
+            dp = self.datapaths.get(dpid)
+            out_port = self._host_out_port(dpid, host)
+            if not waiting or dp is None or out_port is None:
+                continue
+            
+            # Destinations behind a static next hop get their own routes
+            for dst_ip in {hdr.ip_dst for _, hdr, _ in waiting}:
+                self._install_route_flows(dp, dst_ip, host.mac, out_port, vlan_id)
+            self._install_path(dpid, host, first=False)
+            for msg, hdr, dst_vlan in waiting:
+                self._forward_routed(dp, msg, hdr, host.mac, out_port, dst_vlan)
+            self.log.info('pending', "Released %d pending packets for %s on switch %s", len(waiting), ip, dpid)
+
+    def _send_arp_request(self, dp, target_ip, vlan_id):
         """Send ARP request"""
         arp_req = arp.arp(
             opcode=arp.ARP_REQUEST,
@@ -382,113 +1081,762 @@ class SimpleHybridSwitch(app_manager.RyuApp):
         pkt.serialize()
         
         # Flood in target VLAN
-        flood_ports = self._get_flood_ports(dp.id, vlan_id, None)
-        actions = []
-        for port in flood_ports:
-            if self._is_trunk(dp.id, port):
-                actions.append(dp.ofproto_parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q))
-                actions.append(dp.ofproto_parser.OFPActionSetField(vlan_vid=0x1000 | vlan_id))
-            actions.append(dp.ofproto_parser.OFPActionOutput(port))
-        
-        self._packet_out(dp, msg, actions, pkt.data)
+        out = dp.ofproto_parser.OFPPacketOut(
+            datapath=dp,
+            buffer_id=dp.ofproto.OFP_NO_BUFFER,
+            in_port=dp.ofproto.OFPP_CONTROLLER,
+            actions=self._flood_actions(dp, vlan_id, False),
+            data=pkt.data
+        )
+        self.sender.send(dp, out)
 
-    def _l2_forward(self, dp, eth, vlan_id, in_port, msg):
+    def _l2_forward(self, dp, hdr, vlan_id, in_port, msg):
         """Layer 2 forwarding"""
         # Check if destination is known
-        if eth.dst in self.mac_table[dp.id]:
-            out_port, vlan, _ = self.mac_table[dp.id][eth.dst]
-            if vlan == vlan_id and out_port != in_port:
-                actions = []
-                if self._is_trunk(dp.id, out_port):
-                    actions.append(dp.ofproto_parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q))
-                    actions.append(dp.ofproto_parser.OFPActionSetField(vlan_vid=0x1000 | vlan_id))
-                actions.append(dp.ofproto_parser.OFPActionOutput(out_port))
-                
-                # Install flow
-                match = dp.ofproto_parser.OFPMatch(
-                    eth_dst=eth.dst,
-                    vlan_vid=(0x1000 | vlan_id) if vlan_id else None
-                )
-                self._add_flow(dp, 50, match, actions, idle=180, desc="L2-Unicast")
+        host = self.hosts.by_mac.get(hdr.eth_dst)
+        if host is not None and host.vlan == vlan_id:
+            out_port = self._host_out_port(dp.id, host)
+            if out_port is not None and out_port != in_port:
+                # Install flows along the path to the host
+                self._install_path(dp.id, host)
                 self.stats['flows'] += 1
                 
+                actions = self._output_actions(dp, out_port, vlan_id, hdr.vlan_id is not None)
                 self._packet_out(dp, msg, actions)
                 return
         
         # Flood
-        out_ports = self._get_flood_ports(dp.id, vlan_id, in_port)
-        if out_ports:
-            actions = []
-            for port in out_ports:
-                if self._is_trunk(dp.id, port):
-                    actions.append(dp.ofproto_parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q))
-                    actions.append(dp.ofproto_parser.OFPActionSetField(vlan_vid=0x1000 | vlan_id))
-                actions.append(dp.ofproto_parser.OFPActionOutput(port))
-            
-            self._packet_out(dp, msg, actions)
+        self._packet_out(dp, msg, self._flood_actions(dp, vlan_id, hdr.vlan_id is not None))
 
-    def _get_vlan(self, dp, pkt, in_port):
-        """Get VLAN ID for packet"""
-        vlan_tag = pkt.get_protocol(vlan.vlan)
-        port_cfg = self.port_config.get(dp.id, {}).get(in_port, {'type': 'access', 'vlan': 1})
+    def _install_proactive(self, dp):
+        """Install known-host flows at connect time"""
+        for host in list(self.hosts.by_mac.values()):
+            port = self._host_out_port(dp.id, host)
+            if port is not None:
+                self._install_host_flows(dp, host.mac, port, host.vlan, proactive=True)
         
-        if vlan_tag:
-            return vlan_tag.vid
+        for ip, mac, port, vlan_id in self.hosts.ips_on(dp.id):
+            port = self._host_out_port(dp.id, self.hosts.by_ip[ip])
+            self._install_route_flows(dp, ip, mac, port, vlan_id, proactive=True)
+
+    def _host_edge(self, host):
+        """(dpid, port) where a host attaches: a learned port that is not a switch link"""
+        for dpid, port in zip(host.dpids, host.ports):
+            if not self.graph.is_link_port(dpid, port):
+                return dpid, port
+        return None
+
+    def _host_out_port(self, dpid, host):
+        """Port towards a host on a switch: shortest path if known, else where it was learned"""
+        edge = self._host_edge(host)
+        if edge is not None:
+            if edge[0] == dpid:
+                return edge[1]
+            port = self.graph.next_port(dpid, edge[0])
+            if port is not None:
+                return port
+        return host.port_on(dpid)
+
+    def _install_path(self, dpid, host, first=True):
+        """Install a host's L2 flows on every switch from dpid to its edge"""
+        edge = self._host_edge(host)
+        hops = self.graph.path(dpid, edge[0]) if edge is not None else None
+        if hops is None:
+            hops = [(dpid, self._host_out_port(dpid, host))]
         else:
-            return port_cfg.get('vlan', 1)
+            hops.append(edge)
+        
+        for hop_dpid, port in hops[0 if first else 1:]:
+            hop_dp = self.datapaths.get(hop_dpid)
+            if port is not None and hop_dp is not None and hop_dpid in self.owned:
+                self._install_host_flows(hop_dp, host.mac, port, host.vlan)
 
-    def _get_flood_ports(self, dpid, vlan_id, in_port):
-        """Get ports for flooding"""
-        ports = []
+    def _install_host_paths(self, host, dpids=None, proactive=False):
+        """Point every owned switch (or just dpids) at a host"""
+        for dpid in (self.owned if dpids is None else dpids):
+            dp = self.datapaths.get(dpid)
+            port = self._host_out_port(dpid, host)
+            if dp is not None and port is not None:
+                self._install_host_flows(dp, host.mac, port, host.vlan, proactive)
+
+    def _topology_changed(self, changed):
+        """Re-point host flows on switches whose paths changed, re-prune flooding"""
+        changed = [dpid for dpid in changed if dpid in self.owned]
+        for key in [k for k in self.pinned if k[0] in changed]:
+            del self.pinned[key]
+        for dpid in changed:
+            for dst in list(self.mp_groups.get(dpid, {})):
+                self._install_multipath_group(self.datapaths[dpid], dst)
+        if changed:
+            for host in list(self.hosts.by_mac.values()):
+                self._install_host_paths(host, changed)
+        
+        for dpid in list(self.owned):
+            blocked = frozenset(self.graph.flood_blocked(dpid))
+            if self.flood_pruned.get(dpid) != blocked and dpid in self.datapaths:
+                self._install_flood_groups(self.datapaths[dpid])
         
-        for port, config in self.port_config.get(dpid, {}).items():
-            if port == in_port:
+        if changed:
+            self.stats['topology_changes'] += 1
+            self.log.info('topology', "Topology: %d links, paths changed on %s",
+                          len(self.graph), sorted(changed))
+
+    def _install_ingress(self, dp, only_port=None):
+        """Ingress table: tag access ports, validate trunk VLANs, split router-MAC traffic"""
+        parser = dp.ofproto_parser
+        for port, config in self.port_config.get(dp.id, {}).items():
+            if only_port is not None and port != only_port:
                 continue
             
-            if config['type'] == 'access' and config.get('vlan') == vlan_id:
-                ports.append(port)
-            elif config['type'] == 'trunk':
-                ports.append(port)
+            trunk = config['type'] == 'trunk'
+            vlans = self._switch_vlans(dp.id) if trunk else [config.get('vlan', 1)]
+            for vlan_id in vlans:
+                if trunk:
+                    fields = {'in_port': port, 'vlan_vid': 0x1000 | vlan_id}
+                    actions = []
+                else:
+                    fields = {'in_port': port, 'vlan_vid': ofproto_v1_3.OFPVID_NONE}
+                    actions = [parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q),
+                               parser.OFPActionSetField(vlan_vid=0x1000 | vlan_id)]
+                
+                gw_mac = self.gateway_macs.get(vlan_id)
+                if gw_mac:
+                    match = parser.OFPMatch(eth_dst=gw_mac, **fields)
+                    self._add_flow(dp, 200, match, actions, table=TABLE_INGRESS, goto=TABLE_L3)
+                self._add_flow(dp, 100, parser.OFPMatch(**fields), actions,
+                              table=TABLE_INGRESS, goto=TABLE_L2)
+            
+            # Anything else on a configured port is mis-tagged: drop
+            self._add_flow(dp, 1, parser.OFPMatch(in_port=port), [], table=TABLE_INGRESS)
+
+    def _install_gateway_punt(self, dp, gw_ip):
+        """Send IP traffic for a gateway address to the controller"""
+        match = dp.ofproto_parser.OFPMatch(eth_type=ether.ETH_TYPE_IP, ipv4_dst=gw_ip)
+        self._add_flow(dp, 250, match, [dp.ofproto_parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)],
+                       table=TABLE_L3)
+
+    def _meter_id(self, port, punt):
+        return (port << 2 | fabric_config.PUNT_CLASSES.index(punt)) + 1
+
+    def _wanted_meters(self, dpid):
+        """Punt meter ids of a switch's configured ports"""
+        if not self.PUNT_METERS:
+            return set()
+        return {self._meter_id(port, punt) for port in self.port_config.get(dpid, {})
+                for punt in fabric_config.PUNT_CLASSES}
+
+    def _install_meters(self, dp, port, config):
+        """Add or modify a port's punt meters; returns {class: meter id}"""
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        rates = dict(self.PUNT_RATES, **(config.get('punt') or {}))
+        installed = self.meters[dp.id]
+        meters = {}
+        for punt in fabric_config.PUNT_CLASSES:
+            meter_id = self._meter_id(port, punt)
+            band = parser.OFPMeterBandDrop(rate=rates[punt], burst_size=max(1, int(rates[punt] * self.PUNT_BURST)))
+            command = ofp.OFPMC_MODIFY if meter_id in installed else ofp.OFPMC_ADD
+            self.sender.send(dp, parser.OFPMeterMod(dp, command, ofp.OFPMF_PKTPS | ofp.OFPMF_BURST,
+                                                    meter_id, [band]))
+            installed.add(meter_id)
+            meters[punt] = meter_id
+        return meters
+
+    def _delete_meter(self, dp, meter_id):
+        """Delete a meter (the switch removes the flows using it too)"""
+        ofp = dp.ofproto
+        self.sender.send(dp, dp.ofproto_parser.OFPMeterMod(dp, ofp.OFPMC_DELETE, 0, meter_id))
+        self.meters[dp.id].discard(meter_id)
+
+    def _install_punt_flows(self, dp, only_port=None):
+        """Per-port table-miss, ARP and gateway-IP punts through the port's meters"""
+        if not self.PUNT_METERS:
+            return
+        parser = dp.ofproto_parser
+        ports = self.port_config.get(dp.id, {})
+        if only_port is not None and only_port not in ports:
+            for meter_id in [m for m in self.meters[dp.id] if (m - 1) >> 2 == only_port]:
+                self._delete_meter(dp, meter_id)
+            return
+        to_controller = [parser.OFPActionOutput(dp.ofproto.OFPP_CONTROLLER)]
+        for port, config in ports.items():
+            if only_port is not None and port != only_port:
+                continue
+            meters = self._install_meters(dp, port, config)
+            # Above the shared table-miss (0), ARP (100) and gateway (250) punts; L3 ARP
+            # clears the route priorities (101-132), L2 ARP stays under the responders (110)
+            arp = parser.OFPMatch(in_port=port, eth_type=ether.ETH_TYPE_ARP)
+            for table, arp_priority in ((TABLE_L3, 140), (TABLE_L2, 101)):
+                self._add_flow(dp, 1, parser.OFPMatch(in_port=port), to_controller,
+                               table=table, meter=meters['miss'])
+                self._add_flow(dp, arp_priority, arp, to_controller, table=table, meter=meters['arp'])
+            for gw_ip in self.gateway_ips.values():
+                match = parser.OFPMatch(in_port=port, eth_type=ether.ETH_TYPE_IP, ipv4_dst=gw_ip)
+                self._add_flow(dp, 251, match, to_controller, table=TABLE_L3, meter=meters['gateway'])
+
+    def _install_flood_flows(self, dp):
+        """Flood broadcast frames in the datapath through the VLAN groups"""
+        for vlan_id in self._switch_vlans(dp.id):
+            match = dp.ofproto_parser.OFPMatch(vlan_vid=0x1000 | vlan_id, eth_dst=BROADCAST_MAC)
+            self._add_flow(dp, 40, match, self._flood_actions(dp, vlan_id, True), table=TABLE_L2)
+
+    def _install_host_flows(self, dp, mac, out_port, vlan_id, proactive=False):
+        """Install the L2 flow towards a learned host: (vlan, eth_dst) -> port or multipath group
+
+        proactive: installed ahead of traffic (connect / learn time), not for a PacketIn
+        """
+        match = dp.ofproto_parser.OFPMatch(vlan_vid=0x1000 | vlan_id, eth_dst=mac)
+        pin = self.pinned.get((dp.id, mac))
+        if pin is not None:
+            # Migrated off a congested link: stay on the chosen port
+            out_port = pin[0]
+            actions = None
+        else:
+            actions = self._multipath_actions(dp, mac, out_port)
+        if actions is None:
+            actions = self._output_actions(dp, out_port, vlan_id, True)
+        self._add_tracked_flow(dp, ('l2', vlan_id, mac), TABLE_L2, 50, match, actions,
+                               idle=self.MAC_AGING)
+        self.stats['host_flows'] += 1
+        if proactive:
+            self.stats['proactive_flows'] += 1
+
+    def _install_route_flows(self, dp, ip, mac, out_port, dst_vlan, proactive=False):
+        """Install the L3 route to a host (merged with same-next-hop neighbours), then its L2 flow"""
+        installs, removes = self.route_agg[dp.id].add(route_table.ip_to_int(ip), (mac, dst_vlan))
+        for net, plen, _ in removes:
+            self._delete_route(dp, net, plen)
+        for net, plen, (next_hop, vlan) in installs:
+            self._install_route(dp, net, plen, next_hop, vlan, proactive)
+        self._install_host_flows(dp, mac, out_port, dst_vlan, proactive)
+
+    def _route_match(self, dp, net, plen):
+        ip = route_table.int_to_ip(net)
+        if plen < 32:
+            ip = (ip, route_table.int_to_ip(route_table.prefix_mask(plen)))
+        return dp.ofproto_parser.OFPMatch(eth_type=ether.ETH_TYPE_IP, ipv4_dst=ip)
+
+    def _install_route(self, dp, net, plen, mac, dst_vlan, proactive=False):
+        """L3 route for a prefix: rewrite, decrement TTL, retag, then L2 lookup"""
+        actions = self._route_actions(dp, mac, dst_vlan, True)
+        self._add_tracked_flow(dp, ('l3', net, plen), TABLE_L3, 100 + plen,
+                               self._route_match(dp, net, plen), actions,
+                               idle=self.ARP_AGING, goto=TABLE_L2)
+        self.stats['route_flows'] += 1
+        if proactive:
+            self.stats['proactive_flows'] += 1
+        if plen < 32:
+            self.stats['route_aggregates'] += 1
+            self.log.info('flow', "Switch %s: aggregated route %s/%s -> %s",
+                          dp.id, route_table.int_to_ip(net), plen, mac)
+
+    def _delete_route(self, dp, net, plen):
+        """Remove a route superseded by aggregation or a split"""
+        self.flow_budget.table(dp.id).remove(('l3', net, plen))
+        self._delete_flows(dp, TABLE_L3, self._route_match(dp, net, plen), priority=100 + plen)
+
+    def _add_tracked_flow(self, dp, key, table, priority, match, actions, idle=0, hard=0, goto=None):
+        """Add a host/route flow counted against the switch budget, evicting if over it"""
+        flows = self.flow_budget.table(dp.id)
+        flows.add(key, table, priority, match, time.time())
+        self._add_flow(dp, priority, match, actions, idle=idle, hard=hard, table=table, goto=goto,
+                       flags=dp.ofproto.OFPFF_SEND_FLOW_REM)
+        victims = flows.evict()
+        for victim, entry in victims:
+            self._delete_flows(dp, entry.table, entry.match, priority=entry.priority)
+            self._flow_gone(dp.id, victim)
+        if victims:
+            self.stats['flows_evicted'] += len(victims)
+            self.log.warning('flow', "Switch %s: %d/%d flows, evicted %d least used",
+                             dp.id, len(flows), flows.capacity, len(victims))
+
+    def _flow_gone(self, dpid, key):
+        """A tracked flow left the switch: drop its accounting and dependent state"""
+        self.flow_budget.table(dpid).remove(key)
+        if key[0] == 'l3':
+            self.route_agg[dpid].remove(key[1], key[2])
+        elif key[0] == 'arp' and key[2] in self.arp_responders:
+            self.arp_responders[key[2]].discard((dpid, key[1]))
+
+    def _flow_key(self, table_id, priority, match):
+        """Budget key of a host/route/responder flow from its table, priority and match, or None"""
+        if table_id == TABLE_L2 and priority == 50:
+            return ('l2', match.get('vlan_vid', 0) & 0xfff, match.get('eth_dst'))
+        if table_id == TABLE_L2 and priority == 110:
+            return ('arp', match.get('in_port'), match.get('arp_tpa'))
+        if table_id == TABLE_L3 and 100 < priority <= 132:
+            dst = match.get('ipv4_dst')
+            if isinstance(dst, tuple):
+                return ('l3', route_table.ip_to_int(dst[0]), priority - 100)
+            return ('l3', route_table.ip_to_int(dst), 32)
+        return None
+
+    def _route_actions(self, dp, dst_mac, dst_vlan, tagged):
+        """Router rewrite: decrement TTL, gateway/next-hop MACs, destination VLAN"""
+        parser = dp.ofproto_parser
+        actions = [parser.OFPActionDecNwTtl(),
+                   parser.OFPActionSetField(eth_src=self.gateway_macs[dst_vlan]),
+                   parser.OFPActionSetField(eth_dst=dst_mac)]
+        if tagged:
+            actions.append(parser.OFPActionSetField(vlan_vid=0x1000 | dst_vlan))
+        return actions
+
+    def _multipath_actions(self, dp, mac, out_port):
+        """Group action spreading a remote host's traffic over the next hops, or None"""
+        if not self.MULTIPATH or not self.graph.is_link_port(dp.id, out_port):
+            return None
+        host = self.hosts.by_mac.get(mac)
+        edge = self._host_edge(host) if host is not None else None
+        if edge is None or edge[0] == dp.id:
+            return None
+        group_id = self._install_multipath_group(dp, edge[0])
+        if group_id is None:
+            return None
+        return [dp.ofproto_parser.OFPActionGroup(group_id)]
+
+    def _multipath_buckets(self, dpid, dst):
+        """((port, weight), ...) over the loop-free next hops from dpid to dst"""
+        weights = []
+        for port, nbr in self.graph.downstream(dpid, dst):
+            hops = [(dpid, port)] + (self.graph.path(nbr, dst) or [])
+            capacity = min(self.link_params.get(hop, {}).get('bw', link_graph.REF_BW) for hop in hops)
+            load = self.port_meter.rate((dpid, port)) * 8 / 1e6
+            # Spare capacity, but never starve a path completely
+            weights.append((port, max(capacity * 0.1, capacity - load)))
+        if not weights:
+            return ()
+        top = max(w for _, w in weights)
+        return tuple((port, max(1, int(round(100 * w / top)))) for port, w in weights)
+
+    def _install_multipath_group(self, dp, dst):
+        """Add/refresh the select group towards dst, returns its id or None"""
+        group_id = MULTIPATH_GROUP_BASE + dst
+        installed = self.mp_groups[dp.id].get(dst)
+        buckets = self._multipath_buckets(dp.id, dst)
+        if not buckets or (installed is None and len(buckets) < 2):
+            # Single path: plain output, unless host flows already use the group
+            if installed is None:
+                return None
+            buckets = buckets or installed
+        
+        if installed is not None and not self._weights_moved(installed, buckets):
+            return group_id
+        
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        command = ofp.OFPGC_ADD if installed is None else ofp.OFPGC_MODIFY
+        group_buckets = [parser.OFPBucket(weight=weight, watch_port=port,
+                                          actions=[parser.OFPActionOutput(port)])
+                         for port, weight in buckets]
+        self.sender.send(dp, parser.OFPGroupMod(dp, command, ofp.OFPGT_SELECT, group_id, group_buckets))
+        self.mp_groups[dp.id][dst] = buckets
+        self.stats['multipath_updates'] += 1
+        self.log.info('multipath', "Switch %s -> %s: %s", dp.id, dst,
+                      ' '.join(f"port{port}:{weight}" for port, weight in buckets))
+        return group_id
+
+    def _weights_moved(self, old, new):
+        """True if the ports changed or a weight moved by more than 10%"""
+        if [p for p, _ in old] != [p for p, _ in new]:
+            return True
+        return any(abs(a - b) > 0.1 * max(a, b) for (_, a), (_, b) in zip(old, new))
+
+    def _stats_loop(self):
+        """Poll port counters and flow counters of every owned switch"""
+        while True:
+            hub.sleep(self.STATS_INTERVAL)
+            for dpid in list(self.owned):
+                dp = self.datapaths.get(dpid)
+                if dp is None:
+                    continue
+                ofp = dp.ofproto
+                parser = dp.ofproto_parser
+                self.sender.send(dp, parser.OFPFlowStatsRequest(
+                    dp, 0, ofp.OFPTT_ALL, ofp.OFPP_ANY, ofp.OFPG_ANY, 0, 0, parser.OFPMatch()))
+                self.sender.send(dp, parser.OFPPortStatsRequest(dp, 0, ofp.OFPP_ANY))
+                if self.PUNT_METERS:
+                    self.sender.send(dp, parser.OFPMeterStatsRequest(dp, 0, ofp.OFPM_ALL))
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_reply_handler(self, ev):
+        if self._reconcile_reply(ev.msg):
+            return
+        dp = ev.msg.datapath
+        now = time.time()
+        flows = self.flow_budget.table(dp.id)
+        for stat in ev.msg.body:
+            budget_key = self._flow_key(stat.table_id, stat.priority, stat.match)
+            if budget_key is None:
+                continue
+            flows.update(budget_key, stat.byte_count, now)
+            if budget_key[0] != 'l2':
+                continue
+            key = (dp.id, stat.match.get('eth_dst'))
+            self.flow_meter.update(key, stat.byte_count, now)
+            self.flow_out[key] = self._flow_output(stat)
+
+    def _flow_output(self, stat):
+        """('port', n) or ('group', id) a flow forwards to"""
+        for inst in stat.instructions:
+            for action in getattr(inst, 'actions', ()):
+                if hasattr(action, 'group_id'):
+                    return ('group', action.group_id)
+                if hasattr(action, 'port'):
+                    return ('port', action.port)
+        return None
+
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    def port_stats_reply_handler(self, ev):
+        dp = ev.msg.datapath
+        now = time.time()
+        for stat in ev.msg.body:
+            key = (dp.id, stat.port_no)
+            rate = self.port_meter.update(key, stat.tx_bytes, now)
+            if self.graph.is_link_port(dp.id, stat.port_no):
+                self.link_util[key] = rate * 8 / (self._link_bw(dp.id, stat.port_no) * 1e6)
+        
+        # Rebalance multipath weights from the new rates
+        for dst in list(self.mp_groups.get(dp.id, {})):
+            self._install_multipath_group(dp, dst)
         
-        return ports
+        self._reroute(dp)
+
+    @set_ev_cls(ofp_event.EventOFPMeterStatsReply, MAIN_DISPATCHER)
+    def meter_stats_reply_handler(self, ev):
+        dpid = ev.msg.datapath.id
+        for stat in ev.msg.body:
+            self.meter_drops[(dpid, stat.meter_id)] = sum(band.packet_band_count for band in stat.band_stats)
+
+    def _forget_stats(self, dpid):
+        """Drop counters and pins of a disconnected switch"""
+        self.flow_budget.forget(dpid)
+        self.port_meter.forget(lambda key: key[0] == dpid)
+        self.flow_meter.forget(lambda key: key[0] == dpid)
+        for table in (self.flow_out, self.link_util, self.pinned, self.meter_drops):
+            for key in [k for k in table if k[0] == dpid]:
+                del table[key]
+
+    def _link_bw(self, dpid, port):
+        """Capacity of the link leaving a port, Mbps"""
+        return self.link_params.get((dpid, port), {}).get('bw', link_graph.REF_BW)
+
+    def _reroute(self, dp):
+        """Move the heaviest host flows off congested links, release settled pins"""
+        now = time.time()
+        util = {port: u for (dpid, port), u in self.link_util.items() if dpid == dp.id}
+        
+        # Pins held long enough go back to the normal path once it has room again
+        for key, (port, since) in list(self.pinned.items()):
+            host = self.hosts.by_mac.get(key[1])
+            if key[0] != dp.id or now - since < self.MIGRATION_HOLD:
+                continue
+            normal = self._host_out_port(dp.id, host) if host is not None else None
+            if host is None or util.get(normal, 0.0) < self.CONGESTION_LOW:
+                del self.pinned[key]
+                if host is not None and normal is not None:
+                    self._install_host_flows(dp, host.mac, normal, host.vlan)
+        
+        if not any(u > self.CONGESTION_HIGH for u in util.values()):
+            return
+        
+        flows = []
+        for key, out in self.flow_out.items():
+            host = self.hosts.by_mac.get(key[1])
+            if key[0] != dp.id or out is None or host is None or key in self.pinned:
+                continue
+            edge = self._host_edge(host)
+            if edge is None or edge[0] == dp.id:
+                continue
+            if out[0] == 'group':
+                uses = {port for port, _ in self.mp_groups[dp.id].get(out[1] - MULTIPATH_GROUP_BASE, ())}
+            else:
+                uses = {out[1]}
+            candidates = [port for port, _ in self.graph.downstream(dp.id, edge[0])]
+            flows.append((key, self.flow_meter.rate(key) * 8, uses, candidates))
+        
+        capacity = {port: self._link_bw(dp.id, port) * 1e6 for port in util}
+        moves = traffic_stats.plan_migrations(util, capacity, flows,
+                                              self.CONGESTION_HIGH, self.CONGESTION_LOW)
+        for key, old_port, new_port in moves:
+            host = self.hosts.by_mac[key[1]]
+            self.pinned[key] = (new_port, now)
+            self._install_host_flows(dp, host.mac, new_port, host.vlan)
+            self.stats['migrations'] += 1
+            event = {'ts': now, 'dpid': dp.id, 'mac': host.mac, 'from_port': old_port,
+                     'to_port': new_port, 'bps': self.flow_meter.rate(key) * 8,
+                     'from_util': util[old_port]}
+            self.migration_events.append(event)
+            self.log.warning('reroute', "Switch %s: %s moved port %s -> %s (%.0f Mbps, link at %.0f%%)",
+                             dp.id, host.mac, old_port, new_port, event['bps'] / 1e6,
+                             event['from_util'] * 100)
+
+    def get_migrations(self):
+        """Recent flow migrations, oldest first"""
+        return list(self.migration_events)
+
+    def _switch_vlans(self, dpid):
+        """VLANs carried by a switch"""
+        return self.fabric.switch(dpid).vlans
+
+    def _output_actions(self, dp, out_port, vlan_id, tagged):
+        """Actions to send a frame of vlan_id out of one port"""
+        parser = dp.ofproto_parser
+        actions = []
+        if self._is_trunk(dp.id, out_port):
+            if not tagged:
+                actions.append(parser.OFPActionPushVlan(ether.ETH_TYPE_8021Q))
+                actions.append(parser.OFPActionSetField(vlan_vid=0x1000 | vlan_id))
+        elif tagged:
+            actions.append(parser.OFPActionPopVlan())
+        actions.append(parser.OFPActionOutput(out_port))
+        return actions
+
+    def _flood_actions(self, dp, vlan_id, tagged):
+        """Actions to flood a frame to every port of vlan_id"""
+        group_id = self._flood_group_id(vlan_id, tagged)
+        if group_id not in self.flood_groups.get(dp.id, ()):
+            return []
+        return [dp.ofproto_parser.OFPActionGroup(group_id)]
+
+    def _flood_group_id(self, vlan_id, tagged):
+        """Group ID of the flood group for a VLAN and ingress tagging"""
+        return (vlan_id << 1) | int(tagged)
+
+    def _install_flood_groups(self, dp):
+        """Install or rebuild the OFPGT_ALL flood groups of a switch"""
+        ofp = dp.ofproto
+        parser = dp.ofproto_parser
+        installed = self.flood_groups[dp.id]
+        wanted = set()
+        
+        for vlan_id in self._switch_vlans(dp.id):
+            ports = self._get_flood_ports(dp.id, vlan_id, None)
+            for tagged in (False, True):
+                group_id = self._flood_group_id(vlan_id, tagged)
+                buckets = [parser.OFPBucket(actions=self._output_actions(dp, port, vlan_id, tagged))
+                           for port in ports]
+                command = ofp.OFPGC_MODIFY if group_id in installed else ofp.OFPGC_ADD
+                self.sender.send(dp, parser.OFPGroupMod(dp, command, ofp.OFPGT_ALL, group_id, buckets))
+                wanted.add(group_id)
+        
+        for group_id in installed - wanted:
+            self.sender.send(dp, parser.OFPGroupMod(dp, ofp.OFPGC_DELETE, ofp.OFPGT_ALL, group_id))
+        
+        self.flood_groups[dp.id] = wanted
+        self.flood_pruned[dp.id] = frozenset(self.graph.flood_blocked(dp.id))
+        self.log.info('group', "Flood groups installed: %d on switch %s", len(wanted), dp.id)
+
+    def set_port_config(self, dpid, port_no, config):
+        """Change one port's configuration and rebuild the switch's flooding"""
+        if config is None:
+            self.port_config.get(dpid, {}).pop(port_no, None)
+        else:
+            self.port_config.setdefault(dpid, {})[port_no] = config
+        self.fabric.compile_switch(dpid)
+        
+        dp = self.datapaths.get(dpid)
+        if dp and dpid in self.owned:
+            self._reprogram_port(dp, port_no)
+            self._install_flood_groups(dp)
+            self._install_flood_flows(dp)
+
+    def _reprogram_port(self, dp, port_no):
+        """Replace a port's ingress, responder and punt flows, forget hosts left on a wrong VLAN"""
+        parser = dp.ofproto_parser
+        self._delete_flows(dp, TABLE_INGRESS, parser.OFPMatch(in_port=port_no))
+        self._install_ingress(dp, port_no)
+        self._delete_flows(dp, TABLE_L3, parser.OFPMatch(in_port=port_no))
+        self._install_icmp_responders(dp, port_no)
+        
+        # ARP responders on the port (host flows in the L2 table match no in_port)
+        self._delete_flows(dp, TABLE_L2, parser.OFPMatch(in_port=port_no))
+        for ip in [ip for ip, where in self.arp_responders.items() if (dp.id, port_no) in where]:
+            self._flow_gone(dp.id, ('arp', port_no, ip))
+        self._install_punt_flows(dp, port_no)
+        
+        vlans = self.fabric.switch(dp.id).port_vlans(port_no)
+        for host in [h for h in self.hosts.by_mac.values() if self._host_edge(h) == (dp.id, port_no)]:
+            if host.vlan in vlans:
+                continue
+            self.hosts.remove_mac(host.mac)
+            for dpid in list(self.owned):
+                owned_dp = self.datapaths.get(dpid)
+                if owned_dp is None:
+                    continue
+                match = owned_dp.ofproto_parser.OFPMatch(vlan_vid=0x1000 | host.vlan, eth_dst=host.mac)
+                self._delete_flows(owned_dp, TABLE_L2, match, priority=50)
+                self._flow_gone(dpid, ('l2', host.vlan, host.mac))
+
+    def _reprogram_routes(self, dp, changed_routes, gateway_macs):
+        """Withdraw route flows under a changed route, rewrite those behind a changed gateway MAC"""
+        agg = self.route_agg[dp.id]
+        for (net, plen), (mac, vlan) in sorted(agg.prefixes.items()):
+            if (vlan not in self.gateway_macs
+                    or any(route_table.overlaps(net, plen, *key) for key in changed_routes)):
+                # The next packet goes to the controller and is routed by the new table
+                self._delete_route(dp, net, plen)
+                agg.remove(net, plen)
+            elif vlan in gateway_macs:
+                self._install_route(dp, net, plen, mac, vlan)
+
+    def reload_fabric(self):
+        """Load the fabric file again and push only what differs from the running config"""
+        fabric = fabric_config.load(self.FABRIC_PATH)
+        changes = fabric_config.diff(self.fabric, fabric)
+        if not changes:
+            return changes
+        old_ips = self.fabric.gateway_ip_set
+        old_routes = self.routes
+        self._use_fabric(fabric)
+        changed_routes = route_table.changed_prefixes(old_routes, self.routes)
+        
+        for dpid in sorted(self.owned):
+            dp = self.datapaths.get(dpid)
+            if dp is None:
+                continue
+            for old_ip, new_ip in changes.gateway_ips.values():
+                if old_ip and old_ip not in self.fabric.gateway_ip_set:
+                    match = dp.ofproto_parser.OFPMatch(eth_type=ether.ETH_TYPE_IP, ipv4_dst=old_ip)
+                    self._delete_flows(dp, TABLE_L3, match, priority=250)
+                if new_ip and new_ip not in old_ips:
+                    self._install_gateway_punt(dp, new_ip)
+            for port_no in sorted(changes.ports.get(dpid, ())):
+                self._reprogram_port(dp, port_no)
+            if dpid in changes.flood:
+                # MODIFY keeps unchanged groups in place; deleting a VLAN's group drops its flood flow
+                self._install_flood_groups(dp)
+                self._install_flood_flows(dp)
+            if changed_routes or changes.gateway_macs:
+                self._reprogram_routes(dp, changed_routes, changes.gateway_macs)
+        
+        # Links with new bw/delay are dropped and re-learned by LLDP at their new cost
+        changed = set()
+        for dpid, port_no in changes.links:
+            changed.update(self.graph.remove_port(dpid, port_no))
+        if changed:
+            self._topology_changed(changed)
+        
+        self.stats['fabric_reloads'] += 1
+        self.log.notice('app', "Fabric %s reloaded: %s", self.fabric.name, changes)
+        return changes
+
+    def _config_loop(self):
+        """Reload the fabric file when it changes; a broken edit keeps the running config"""
+        while True:
+            hub.sleep(self.CONFIG_POLL)
+            try:
+                mtime = os.stat(self.FABRIC_PATH).st_mtime
+                if mtime != self.fabric_mtime:
+                    self.fabric_mtime = mtime
+                    self.reload_fabric()
+            except Exception as e:
+                self.stats['fabric_reload_errors'] += 1
+                self.log.error('app', "Fabric %s not reloaded: %s", self.FABRIC_PATH, e)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        msg = ev.msg
+        dp = msg.datapath
+        ofp = dp.ofproto
+        port_no = msg.desc.port_no
+        
+        if msg.reason == ofp.OFPPR_DELETE or msg.desc.state & ofp.OFPPS_LINK_DOWN:
+            self.down_ports[dp.id].add(port_no)
+            self._topology_changed(self.graph.remove_port(dp.id, port_no))
+        else:
+            self.down_ports[dp.id].discard(port_no)
+        
+        if port_no in self.port_config.get(dp.id, {}) and dp.id in self.owned:
+            self._install_flood_groups(dp)
+
+    def _get_vlan(self, dp, hdr, in_port):
+        """Get VLAN ID for packet"""
+        if hdr.vlan_id is not None:
+            return hdr.vlan_id
+        return self.fabric.switch(dp.id).vlan_of.get(in_port, 1)
+
+    def _get_flood_ports(self, dpid, vlan_id, in_port):
+        """Get ports for flooding"""
+        down = self.down_ports.get(dpid, ())
+        blocked = self.graph.flood_blocked(dpid)
+        return [port for port in self.fabric.switch(dpid).flood.get(vlan_id, ())
+                if port != in_port and port not in down and port not in blocked]
 
     def _is_trunk(self, dpid, port):
         """Check if port is trunk"""
-        return self.port_config.get(dpid, {}).get(port, {}).get('type') == 'trunk'
-
-    def _get_ip_vlan(self, ip):
-        """Get VLAN for IP"""
-        if ip.startswith('10.0.10.'):
-            return 10
-        elif ip.startswith('10.0.20.'):
-            return 20
-        return None
+        return self.fabric.switch(dpid).is_trunk(port)
 
-    def _add_flow(self, dp, priority, match, actions, idle=0, hard=0, desc=""):
+    def _add_flow(self, dp, priority, match, actions, idle=0, hard=0, desc="",
+                  table=TABLE_INGRESS, goto=None, flags=0, meter=None):
         """Add flow entry"""
-        inst = [dp.ofproto_parser.OFPInstructionActions(dp.ofproto.OFPIT_APPLY_ACTIONS, actions)]
+        inst = []
+        if meter is not None:
+            inst.append(dp.ofproto_parser.OFPInstructionMeter(meter, dp.ofproto.OFPIT_METER))
+        if actions:
+            inst.append(dp.ofproto_parser.OFPInstructionActions(dp.ofproto.OFPIT_APPLY_ACTIONS, actions))
+        if goto is not None:
+            inst.append(dp.ofproto_parser.OFPInstructionGotoTable(goto))
         mod = dp.ofproto_parser.OFPFlowMod(
             datapath=dp,
+            table_id=table,
             priority=priority,
             match=match,
             idle_timeout=idle,
             hard_timeout=hard,
+            flags=flags,
             instructions=inst
         )
-        dp.send_msg(mod)
+        self.sender.send(dp, mod)
         
         if desc:
-            print(f"{Colors.OKBLUE}{ts()} Flow installed: {desc} (prio={priority}){Colors.ENDC}")
+            self.log.debug('flow', "Flow installed: %s (prio=%s)", desc, priority)
+
+    def _delete_flows(self, dp, table, match, priority=None):
+        """Delete the flows of one table covered by match (exactly it, given a priority)"""
+        ofp = dp.ofproto
+        mod = dp.ofproto_parser.OFPFlowMod(
+            datapath=dp,
+            table_id=table,
+            command=ofp.OFPFC_DELETE if priority is None else ofp.OFPFC_DELETE_STRICT,
+            priority=ofp.OFP_DEFAULT_PRIORITY if priority is None else priority,
+            out_port=dp.ofproto.OFPP_ANY,
+            out_group=dp.ofproto.OFPG_ANY,
+            match=match
+        )
+        self.sender.send(dp, mod)
 
     def _clear_flows(self, dp):
-        """Clear all flows"""
+        """Clear all flows, groups and meters"""
         mod = dp.ofproto_parser.OFPFlowMod(
             datapath=dp,
+            table_id=dp.ofproto.OFPTT_ALL,
             command=dp.ofproto.OFPFC_DELETE,
             out_port=dp.ofproto.OFPP_ANY,
             out_group=dp.ofproto.OFPG_ANY
         )
-        dp.send_msg(mod)
+        self.sender.send(dp, mod)
+        
+        mod = dp.ofproto_parser.OFPGroupMod(
+            datapath=dp,
+            command=dp.ofproto.OFPGC_DELETE,
+            group_id=dp.ofproto.OFPG_ALL
+        )
+        self.sender.send(dp, mod)
+        
+        if self.PUNT_METERS:
+            self.sender.send(dp, dp.ofproto_parser.OFPMeterMod(
+                dp, dp.ofproto.OFPMC_DELETE, 0, dp.ofproto.OFPM_ALL))
+        self._forget_switch_flows(dp.id)
+
+    def _forget_switch_flows(self, dpid):
+        """Drop what the controller tracks about a switch's flows and groups"""
+        self.flood_groups.pop(dpid, None)
+        self.mp_groups.pop(dpid, None)
+        self.meters.pop(dpid, None)
+        self.flow_budget.forget(dpid)
+        self.route_agg.pop(dpid, None)
+        for ports in self.arp_responders.values():
+            ports.difference_update([k for k in ports if k[0] == dpid])
 
     def _packet_out(self, dp, msg, actions, data=None):
         """Send packet out"""
@@ -499,18 +1847,20 @@ class SimpleHybridSwitch(app_manager.RyuApp):
             actions=actions,
             data=data or (msg.data if msg.buffer_id == dp.ofproto.OFP_NO_BUFFER else None)
         )
-        dp.send_msg(out)
+        self.sender.send(dp, out)
 
     def _lldp_sender(self, dp):
         """Send LLDP packets"""
-        while dp.id in self.datapaths:
+        while self.datapaths.get(dp.id) is dp:
             try:
-                for port, config in self.port_config.get(dp.id, {}).items():
-                    if config['type'] == 'trunk':
-                        self._send_lldp(dp, port)
+                # A SLAVE may not send PacketOuts
+                if dp.id in self.owned:
+                    for port, config in self.port_config.get(dp.id, {}).items():
+                        if config['type'] == 'trunk':
+                            self._send_lldp(dp, port)
                 hub.sleep(10)
             except Exception as e:
-                print(f"{Colors.WARNING}{ts()} LLDP error on {dp.id}: {e}{Colors.ENDC}")
+                self.log.warning('lldp', "LLDP error on %s: %s", dp.id, e)
                 hub.sleep(10)
 
     def _send_lldp(self, dp, port_no):
@@ -550,44 +1900,147 @@ class SimpleHybridSwitch(app_manager.RyuApp):
                 actions=actions,
                 data=pkt.data
             )
-            dp.send_msg(out)
+            self.sender.send(dp, out)
             
         except Exception as e:
             # Silently ignore LLDP errors
             pass
 
-    def _handle_lldp(self, dp, pkt, in_port):
-        """Handle LLDP packets"""
-        # Just ignore LLDP for now
-        pass
+    def _handle_lldp(self, dp, msg, in_port):
+        """Record the link an LLDP probe from _send_lldp came over"""
+        probe = packet.Packet(msg.data).get_protocol(lldp.lldp)
+        if probe is None or len(probe.tlvs) < 2:
+            return
+        try:
+            src = int(probe.tlvs[0].chassis_id)
+            src_port = int(probe.tlvs[1].port_id)
+        except (AttributeError, ValueError):
+            return
+        
+        changed = self.graph.add_link(src, src_port, dp.id, in_port, time.time())
+        if changed:
+            self.log.info('topology', "Link s%s:%s -> s%s:%s", src, src_port, dp.id, in_port)
+            self._topology_changed(changed)
+
+    def _timer_aging(self):
+        """True unless aging follows flow removal"""
+        return self.AGING_MODE != 'flow_removed' or not self.PROACTIVE
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        msg = ev.msg
+        dp = msg.datapath
+        # Our own deletes are accounted when sent; a late report could
+        # otherwise drop a flow re-added since
+        if msg.reason == dp.ofproto.OFPRR_DELETE:
+            return
+        key = self._flow_key(msg.table_id, msg.priority, msg.match)
+        if key is None:
+            return
+        self._flow_gone(dp.id, key)
+        
+        if self._timer_aging() or msg.reason != dp.ofproto.OFPRR_IDLE_TIMEOUT:
+            return
+        if key[0] == 'l2':
+            if self.hosts.remove_port(dp.id, key[2]):
+                self.stats['mac_aged'] += 1
+        elif key[0] == 'l3':
+            # An idle prefix ages every binding it covered
+            for n in range(key[1], key[1] + (1 << (32 - key[2]))):
+                if self.hosts.remove_ip(route_table.int_to_ip(n)):
+                    self.stats['arp_aged'] += 1
 
     def _aging_loop(self):
-        """Age out old entries"""
+        """Age out old entries, O(due entries) per tick"""
         while True:
-            hub.sleep(60)
+            hub.sleep(self.AGING_TICK)
+            start = time.perf_counter()
             now = time.time()
             
+            # Drop pending packets whose ARP went unanswered
+            self.pending.expire(now)
+            
+            # Drop links whose LLDP stopped
+            changed = self.graph.expire(now)
+            if changed:
+                self._topology_changed(changed)
+            
+            # Report counters to the state service (scale test reads them)
+            if self.state is not None:
+                self.state.publish_stats({'packets_in': self.stats['packets_in'],
+                                          'owned': sorted(self.owned)})
+            
             # Age MAC entries
-            for dpid in list(self.mac_table.keys()):
-                to_remove = []
-                for mac, (port, vlan, ts) in self.mac_table[dpid].items():
-                    if now - ts > self.MAC_AGING:
-                        to_remove.append(mac)
-                
-                for mac in to_remove:
-                    del self.mac_table[dpid][mac]
-                    print(f"{Colors.WARNING}{ts()} MAC aged: {mac} on switch {dpid}{Colors.ENDC}")
+            aged_macs = self.mac_aging.expired(now)
+            for mac in aged_macs:
+                self.hosts.remove_mac(mac)
             
             # Age ARP entries
-            for dpid in list(self.arp_table.keys()):
-                to_remove = []
-                for ip, (mac, port, vlan, ts) in self.arp_table[dpid].items():
-                    if now - ts > self.ARP_AGING:
-                        to_remove.append(ip)
-                
-                for ip in to_remove:
-                    del self.arp_table[dpid][ip]
-                    print(f"{Colors.WARNING}{ts()} ARP aged: {ip} on switch {dpid}{Colors.ENDC}")
+            aged_ips = self.arp_aging.expired(now)
+            for ip in aged_ips:
+                self.hosts.remove_ip(ip)
+            
+            if aged_macs or aged_ips:
+                self.stats['mac_aged'] += len(aged_macs)
+                self.stats['arp_aged'] += len(aged_ips)
+                self.log.warning('aging', "Aged %d MAC / %d ARP entries", len(aged_macs), len(aged_ips))
+            
+            # Shed PacketIns are reported per port and class once a tick
+            shed = self.admission.tick(now)
+            if shed:
+                self.log.warning('admission', "PacketIns shed: %s",
+                                 ', '.join(f"s{dpid} port {port} {punt} {n}"
+                                           for (dpid, port, punt), n in sorted(shed.items())))
+            
+            self.aging_duration.observe(time.perf_counter() - start)
+
+    def _serve_metrics(self):
+        """Serve GET /metrics on the local metrics port"""
+        try:
+            server = hub.StreamServer(('127.0.0.1', self.METRICS_PORT),
+                                      lambda sock, addr: metrics.handle_http(sock, self._render_metrics))
+        except OSError as e:
+            self.log.error('metrics', "Metrics port %s unavailable: %s", self.METRICS_PORT, e)
+            return
+        self.log.info('metrics', "Metrics on http://127.0.0.1:%s/metrics", self.METRICS_PORT)
+        server.serve_forever()
+
+    def _render_metrics(self):
+        """Current counters, per-datapath message counts and table sizes"""
+        ofp_samples = [({'dpid': dpid, 'type': name}, n)
+                       for (dpid, name), n in sorted(self.sender.by_type.items())]
+        counters = [
+            ('events_total', 'Controller event counters',
+             [({'event': k}, v) for k, v in sorted(self.stats.items())]),
+            ('ofp_messages_total', 'OpenFlow messages sent per datapath and type', ofp_samples),
+            ('pending_total', 'Pending-queue counters',
+             [({'event': k}, v) for k, v in sorted(self.pending.counters.items())]),
+            ('log_records_total', 'Log records written/dropped',
+             [({'result': 'written'}, self.log.written), ({'result': 'dropped'}, self.log.dropped)]),
+        ]
+        gauges = [
+            ('hosts', 'Hosts in the MAC table', [({}, len(self.hosts))]),
+            ('arp_bindings', 'IP bindings in the ARP table', [({}, len(self.hosts.by_ip))]),
+            ('aging_tracked', 'Entries scheduled for aging',
+             [({'table': 'mac'}, len(self.mac_aging)), ({'table': 'arp'}, len(self.arp_aging))]),
+            ('pending_packets', 'Routed packets waiting for ARP', [({}, len(self.pending))]),
+            ('links', 'LLDP-discovered switch links', [({}, len(self.graph))]),
+            ('link_utilization', 'Measured tx utilization of switch links (0..1)',
+             [({'dpid': dpid, 'port': port}, u) for (dpid, port), u in sorted(self.link_util.items())]),
+            ('pinned_flows', 'Host flows migrated off congested links', [({}, len(self.pinned))]),
+            ('punt_meter_dropped', 'Controller-bound packets dropped by punt meters',
+             [({'dpid': dpid, 'meter': meter_id}, n) for (dpid, meter_id), n in sorted(self.meter_drops.items())]),
+            ('blocked_sources', 'Sources with a temporary drop flow', [({}, len(self.admission.blocked))]),
+            ('flow_entries', 'Host/route flows held per datapath',
+             [({'dpid': dpid}, len(t)) for dpid, t in sorted(self.flow_budget.tables.items())]),
+            ('route_prefixes', 'L3 route flows per datapath (after aggregation)',
+             [({'dpid': dpid}, len(agg)) for dpid, agg in sorted(self.route_agg.items())]),
+            ('sender_queue_depth', 'OpenFlow messages queued per datapath',
+             [({'dpid': dpid}, self.sender.depth(dpid)) for dpid in sorted(self.datapaths)]),
+            ('datapaths', 'Connected / owned datapaths',
+             [({'state': 'connected'}, len(self.datapaths)), ({'state': 'owned'}, len(self.owned))]),
+        ]
+        return self.metrics.render(counters, gauges)
 
 
 # Main
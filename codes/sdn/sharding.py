@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Datapath sharding across controller worker processes
+─────────────────────────────────────────────────────────────
+• owner_of(): dpid -> worker by explicit assignment, else by dpid hash
+  over the live workers (a dead worker's switches move to the others)
+• StateClient: a worker's link to state_service.py, learns published
+  asynchronously, remote learns and membership changes delivered as
+  callbacks on the hub loop
+• Losing the service keeps the current roles; failover needs it up
+"""
+
+import json
+import socket
+
+
+def owner_of(dpid, members, assignment=None):
+    """Worker that should be MASTER for a datapath, or None without workers"""
+    if not members:
+        return None
+    if assignment:
+        worker = assignment.get(dpid)
+        if worker in members:
+            return worker
+    # Knuth multiplicative hash: consecutive dpids spread across workers
+    return members[((dpid * 2654435761) & 0xffffffff) % len(members)]
+
+
+class StateClient(object):
+    """Connection to the shared state service"""
+
+    def __init__(self, path, worker, on_members, on_mac, on_ip, retry=1.0):
+        self.path = path
+        self.worker = worker
+        self.on_members = on_members
+        self.on_mac = on_mac
+        self.on_ip = on_ip
+        self.retry = retry
+        # Imported here so owner_of() has no Ryu dependency
+        from ryu.lib import hub
+        self.hub = hub
+        self.out = hub.Queue(maxsize=4096)
+        self.connected = False
+        self.dropped = 0
+        hub.spawn(self._run)
+
+    def publish_mac(self, dpid, mac, port, vlan, ts):
+        self._put({'op': 'mac', 'dpid': dpid, 'mac': mac, 'port': port,
+                   'vlan': vlan, 'ts': ts})
+
+    def publish_ip(self, dpid, ip, mac, port, vlan, ts):
+        self._put({'op': 'ip', 'dpid': dpid, 'ip': ip, 'mac': mac, 'port': port,
+                   'vlan': vlan, 'ts': ts})
+
+    def publish_stats(self, stats):
+        self._put({'op': 'stats', 'stats': stats})
+
+    def _put(self, msg):
+        """Never block the PacketIn path: drop when disconnected or backed up"""
+        if not self.connected or self.out.full():
+            self.dropped += 1
+            return
+        self.out.put(msg)
+
+    def _run(self):
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                # Learns queued for the old connection are stale, hello goes first
+                self.out = self.hub.Queue(maxsize=4096)
+                self.out.put({'op': 'hello', 'worker': self.worker})
+                writer = self.hub.spawn(self._writer, sock)
+                self.connected = True
+                self._reader(sock)
+            except OSError:
+                pass
+            finally:
+                if self.connected:
+                    self.connected = False
+                    self.hub.kill(writer)
+                    # Keep the current roles until the service is back
+                sock.close()
+            self.hub.sleep(self.retry)
+
+    def _writer(self, sock):
+        while True:
+            msg = self.out.get()
+            sock.sendall((json.dumps(msg) + '\n').encode())
+
+    def _reader(self, sock):
+        for line in sock.makefile('rb'):
+            msg = json.loads(line)
+            op = msg.get('op')
+            if op == 'members':
+                self.on_members(msg['workers'], msg['generation'])
+            elif op == 'mac':
+                self.on_mac(msg)
+            elif op == 'ip':
+                self.on_ip(msg)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared state service for sharded controller workers
+─────────────────────────────────────────────────────────────
+• Local Unix-socket hub, one JSON object per line
+• Workers publish MAC/ARP learns, the service fans them out to
+  every other worker and replays its snapshot to new workers
+• Each worker connection has its own outbound queue and writer thread,
+  so a slow worker never holds the service lock; one that falls
+  QUEUE_LINES behind is disconnected and gets a fresh snapshot on rejoin
+• Tracks live workers; every membership change bumps a generation
+  that workers use as the OpenFlow role generation_id
+• Collects per-worker stats for the scale test
+
+Usage: python3 state_service.py [--socket /tmp/sdn-state.sock]
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+import host_table
+
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+RESET = "\033[0m"
+
+
+class StateService(object):
+    """Membership, host state and stats shared by all workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = host_table.HostTable()
+        self.workers = {}        # worker id -> handler
+        self.stats = {}          # worker id -> last reported stats
+        # Seeded from the clock so a restarted service never goes backwards
+        self.generation = int(time.time())
+
+    def _broadcast(self, msg, skip=None):
+        line = (json.dumps(msg) + '\n').encode()
+        for worker, handler in list(self.workers.items()):
+            if worker != skip:
+                handler.send_line(line)
+
+    def _members(self):
+        return {'op': 'members', 'workers': sorted(self.workers),
+                'generation': self.generation}
+
+    def join(self, worker, handler):
+        with self.lock:
+            self.workers[worker] = handler
+            self.generation += 1
+            for line in self._snapshot():
+                handler.send_line(line)
+            self._broadcast(self._members())
+        print(f"{GREEN}Worker {worker} joined, members={sorted(self.workers)}{RESET}")
+
+    def leave(self, worker, handler):
+        with self.lock:
+            if self.workers.get(worker) is not handler:
+                return
+            del self.workers[worker]
+            self.stats.pop(worker, None)
+            self.generation += 1
+            self._broadcast(self._members())
+        print(f"{YELLOW}Worker {worker} left, members={sorted(self.workers)}{RESET}")
+
+    def _snapshot(self):
+        for host in list(self.hosts.by_mac.values()):
+            for dpid, port in zip(host.dpids, host.ports):
+                msg = {'op': 'mac', 'dpid': dpid, 'mac': host.mac, 'port': port,
+                       'vlan': host.vlan, 'ts': host.ts}
+                yield (json.dumps(msg) + '\n').encode()
+                if host.ip is not None and dpid in host.ip_dpids:
+                    msg = dict(msg, op='ip', ip=host.ip, ts=host.ip_ts)
+                    yield (json.dumps(msg) + '\n').encode()
+
+    def handle(self, worker, msg):
+        op = msg.get('op')
+        with self.lock:
+            if op == 'mac':
+                self.hosts.learn_mac(msg['dpid'], msg['mac'], msg['port'], msg['vlan'], msg['ts'])
+                self._broadcast(msg, skip=worker)
+            elif op == 'ip':
+                self.hosts.learn_ip(msg['dpid'], msg['ip'], msg['mac'], msg['port'],
+                                    msg['vlan'], msg['ts'])
+                self._broadcast(msg, skip=worker)
+            elif op == 'stats':
+                self.stats[worker] = msg['stats']
+            elif op == 'query_stats':
+                return {'op': 'stats', 'workers': self.stats,
+                        'members': sorted(self.workers), 'hosts': len(self.hosts)}
+        return None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    QUEUE_LINES = 65536
+
+    def setup(self):
+        super().setup()
+        self.out = queue.Queue(self.QUEUE_LINES)
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def send_line(self, line):
+        """Queue a line for this worker; never blocks the caller"""
+        try:
+            self.out.put_nowait(line)
+        except queue.Full:
+            # Too far behind to catch up: it rejoins and gets a snapshot
+            self._disconnect()
+
+    def _write_loop(self):
+        while True:
+            line = self.out.get()
+            if line is None:
+                return
+            try:
+                self.wfile.write(line)
+            except (OSError, ValueError):
+                self._disconnect()
+                return
+
+    def _disconnect(self):
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def finish(self):
+        try:
+            self.out.put_nowait(None)
+        except queue.Full:
+            self._disconnect()
+        self.writer.join(1.0)
+        super().finish()
+
+    def handle(self):
+        service = self.server.service
+        worker = None
+        try:
+            for raw in self.rfile:
+                msg = json.loads(raw)
+                if msg.get('op') == 'hello':
+                    worker = msg['worker']
+                    service.join(worker, self)
+                    continue
+                reply = service.handle(worker, msg)
+                if reply is not None:
+                    self.send_line((json.dumps(reply) + '\n').encode())
+        except (OSError, ValueError):
+            pass
+        finally:
+            if worker is not None:
+                service.leave(worker, self)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def query_stats(path):
+    """One-shot stats query, used by the scale test"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    with sock, sock.makefile('rwb') as f:
+        f.write(b'{"op": "query_stats"}\n')
+        f.flush()
+        return json.loads(f.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared state service for controller workers")
+    parser.add_argument("--socket", default="/tmp/sdn-state.sock", help="Unix socket path")
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+
+    server = _Server(args.socket, _Handler)
+    server.service = StateService()
+    print(f"{GREEN}State service listening on {args.socket}{RESET}")
+    try:
+        server.serve_forever()
+    finally:
+        os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The controller modules import each other as top-level modules (ryu-manager runs from codes/sdn)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,41 @@
+import admission
+
+SRC = '00:00:00:00:00:01'
+
+
+def test_burst_then_refill():
+    gate = admission.Admission(rate=10, burst=3, block_after=5)
+    assert [gate.admit((1, 1), 0.0) for _ in range(4)] == [True, True, True, False]
+    # Another port has its own bucket
+    assert gate.admit((1, 2), 0.0)
+    assert not gate.admit((1, 1), 0.05)
+    assert gate.admit((1, 1), 0.15)
+    # Idle time refills up to the burst only
+    assert [gate.admit((1, 1), 100.0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_shed_signals_block_once_per_tick():
+    gate = admission.Admission(rate=10, burst=3, block_after=3)
+    assert [gate.shed(1, 1, SRC, 'arp') for _ in range(5)] == [False, False, True, False, False]
+    gate.shed(1, 1, SRC, 'miss')
+    assert gate.tick(1.0) == {(1, 1, 'arp'): 5, (1, 1, 'miss'): 1}
+    assert gate.tick(2.0) == {}
+    # A new tick counts afresh, but a blocked source is not reported again
+    gate.block(1, 1, SRC, until=5.0)
+    assert not any(gate.shed(1, 1, SRC, 'arp') for _ in range(5))
+    gate.tick(5.0)
+    assert gate.blocked == {}
+    assert [gate.shed(1, 1, SRC, 'arp') for _ in range(3)] == [False, False, True]
+
+
+def test_forget_switch():
+    gate = admission.Admission(rate=10, burst=3, block_after=3)
+    for dpid in (1, 2):
+        gate.admit((dpid, 1), 0.0)
+        gate.shed(dpid, 1, SRC, 'arp')
+        gate.block(dpid, 1, SRC, until=9.0)
+    gate.forget(1)
+    assert list(gate.buckets) == [(2, 1)]
+    assert list(gate.shed_ports) == [(2, 1, 'arp')]
+    assert list(gate.shed_sources) == [(2, 1, SRC)]
+    assert list(gate.blocked) == [(2, 1, SRC)]
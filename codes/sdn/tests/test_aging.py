@@ -0,0 +1,50 @@
+import aging
+
+
+def _heap(table, seconds=10):
+    return aging.AgingHeap(seconds, table.get)
+
+
+def test_expires_in_deadline_order():
+    table = {'c': 3.0, 'a': 1.0, 'b': 2.0, 'd': 50.0}
+    heap = _heap(table)
+    for key, ts in table.items():
+        heap.track(key, ts)
+    assert heap.next_deadline() == 11.0
+    assert heap.expired(10.5) == []
+    assert heap.expired(13.0) == ['a', 'b', 'c']
+    assert len(heap) == 1 and heap.next_deadline() == 60.0
+
+
+def test_refresh_reschedules_without_stale_entries():
+    table = {'a': 0.0}
+    heap = _heap(table)
+    heap.track('a', 0.0)
+    # Refreshed in the table; tracking again is a no-op, not a second entry
+    table['a'] = 8.0
+    heap.track('a', 8.0)
+    assert len(heap.heap) == 1
+    assert heap.expired(10.0) == []
+    assert heap.heap == [(18.0, 'a')]
+    assert heap.expired(17.9) == []
+    assert heap.expired(18.0) == ['a']
+    assert heap.heap == [] and len(heap) == 0
+
+
+def test_removed_or_readded_key_drops_old_deadline():
+    table = {'a': 0.0, 'b': 0.0}
+    heap = _heap(table)
+    heap.track('a', 0.0)
+    heap.track('b', 0.0)
+    # Removed by someone else: its deadline passes silently
+    del table['a']
+    # Removed and learned again before its deadline: the new timestamp counts
+    del table['b']
+    table['b'] = 6.0
+    heap.track('b', 6.0)
+    assert heap.expired(10.0) == []
+    assert len(heap) == 1 and heap.heap == [(16.0, 'b')]
+    # Learned again after expiry: tracked afresh
+    table['a'] = 12.0
+    heap.track('a', 12.0)
+    assert heap.expired(30.0) == ['b', 'a']
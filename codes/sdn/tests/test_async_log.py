@@ -0,0 +1,69 @@
+import io
+import json
+
+import async_log
+
+
+def test_levels_and_drain():
+    out = io.StringIO()
+    log = async_log.Logger(level='INFO', stream=out)
+    log.debug('app', "hidden %s", 1)
+    log.info('app', "Switch %s connected", 7, dpid=7)
+    assert out.getvalue() == ''          # nothing is written on the calling path
+    assert log.drain() == 1
+    line = out.getvalue().rstrip('\n')
+    assert line.endswith("Switch 7 connected dpid=7")
+    assert line[2] == ':' and line[8] == '.'     # HH:MM:SS.mmm prefix
+    assert log.drain() == 0 and log.written == 1
+
+
+def test_batches_and_flush():
+    out = io.StringIO()
+    log = async_log.Logger(stream=out, batch=10)
+    for i in range(25):
+        log.info('app', "line %d", i)
+    assert log.drain() == 10
+    log.flush()
+    assert out.getvalue().count('\n') == 25 and log.summary()['queued'] == 0
+
+
+def test_rate_limit_and_full_queue():
+    out = io.StringIO()
+    log = async_log.Logger(stream=out, json_lines=True, queue_size=3,
+                           limits={'arp': {'rate': 0.001, 'burst': 2}})
+    for _ in range(5):
+        log.info('arp', "ARP")
+    assert len(log.queue) == 2 and log.summary()['suppressed'] == 3
+    log.info('app', "a")
+    log.info('app', "b")
+    assert log.dropped == 1
+    log.flush()
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r['msg'] for r in records] == ['ARP', 'ARP', 'a']
+    assert records[0]['level'] == 'INFO' and records[0]['cat'] == 'arp'
+
+
+def test_suppressed_total_only_grows():
+    log = async_log.Logger(stream=io.StringIO(), limits={'arp': {'sample': 3}})
+    for _ in range(6):
+        log.info('arp', "ARP")
+    assert log.summary()['suppressed'] == 4
+    # The record let through carries the count since the previous one
+    assert [r[-1] for r in log.queue] == [2, 2]
+    log.info('arp', "ARP")
+    assert log.summary()['suppressed'] == 5
+
+
+def test_writes_go_through_write_with():
+    out = io.StringIO()
+    calls = []
+
+    def write_with(fn, data):
+        calls.append(data.count('\n'))
+        return fn(data)
+
+    log = async_log.Logger(stream=out, batch=4, write_with=write_with)
+    for i in range(6):
+        log.info('app', "line %d", i)
+    log.flush()
+    assert calls == [4, 2] and out.getvalue().count('\n') == 6
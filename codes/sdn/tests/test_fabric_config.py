@@ -0,0 +1,110 @@
+import copy
+import os
+
+import pytest
+
+import fabric_config
+
+LAB = os.path.join(os.path.dirname(__file__), '..', 'fabric_lab.yaml')
+
+
+def _doc():
+    return {
+        'name': 'test',
+        'gateway_ips': {10: '10.0.10.254', 20: '10.0.20.254/23'},
+        'gateway_macs': {10: '00:00:00:00:01:0a', 20: '00:00:00:00:01:14'},
+        'port_config': {
+            1: {1: {'type': 'access', 'vlan': 10}, 2: {'type': 'access', 'vlan': 20},
+                3: {'type': 'trunk'}},
+            2: {1: {'type': 'trunk'}, 2: {'type': 'access', 'vlan': 10}},
+        },
+        'link_params': [{'dpid': 1, 'port': 3, 'bw': 100, 'delay': 1},
+                        {'dpid': 2, 'port': 1, 'bw': 100, 'delay': 1}],
+        'static_routes': {'192.168.0.0/16': '10.0.10.1'},
+    }
+
+
+def _diff(edit):
+    doc = _doc()
+    new = copy.deepcopy(doc)
+    edit(new)
+    return fabric_config.diff(fabric_config.FabricConfig(doc), fabric_config.FabricConfig(new))
+
+
+def test_lab_file_compiles():
+    fabric = fabric_config.load(LAB)
+    assert fabric.gateway_ips == {10: '10.0.10.254', 20: '10.0.20.254'}
+    assert fabric.gateway_plens == {10: 24, 20: 24}
+    s1 = fabric.switch(1)
+    assert s1.is_trunk(4) and not s1.is_trunk(1)
+    assert s1.flood[10] == (1, 2, 3, 4, 5)
+    assert s1.port_vlans(5) == (10, 20) and s1.port_vlans(1) == (10,)
+    assert fabric.switch(99).port_vlans(1) == ()
+
+
+def test_gateway_prefix_length():
+    fabric = fabric_config.FabricConfig(_doc())
+    assert fabric.gateway_plens == {10: 24, 20: 23}
+    assert fabric.gateway_ip_set == {'10.0.10.254', '10.0.20.254'}
+    doc = _doc()
+    doc['gateway_ips'][10] = '10.0.10.254/33'
+    with pytest.raises(ValueError):
+        fabric_config.FabricConfig(doc)
+
+
+@pytest.mark.parametrize('edit', [
+    lambda d: d['port_config'][1].update({4: {'type': 'access'}}),
+    lambda d: d['port_config'][1].update({4: {'type': 'tunnel'}}),
+    lambda d: d['port_config'][1][1].update({'punt': {'miss': 0}}),
+    lambda d: d['port_config'][1][1].update({'punt': {'flood': 10}}),
+    lambda d: d['gateway_macs'].update({10: 10 * 60 ** 5}),   # unquoted in YAML
+    lambda d: d['gateway_macs'].pop(20),
+])
+def test_rejects_bad_config(edit):
+    doc = _doc()
+    edit(doc)
+    with pytest.raises(ValueError):
+        fabric_config.FabricConfig(doc)
+
+
+def test_no_change():
+    change = _diff(lambda d: None)
+    assert not change and str(change).endswith('routes no')
+
+
+def test_port_vlan_change():
+    change = _diff(lambda d: d['port_config'][1][2].update({'vlan': 10}))
+    assert change.ports == {1: {2}}
+    assert change.flood == {1}
+    assert not change.routes and not change.links
+
+
+def test_punt_rate_touches_only_that_port():
+    change = _diff(lambda d: d['port_config'][2][2].update({'punt': {'arp': 50}}))
+    assert change.ports == {2: {2}}
+    assert not change.flood
+
+
+def test_gateway_mac_touches_its_vlan_ports():
+    change = _diff(lambda d: d['gateway_macs'].update({20: '00:00:00:00:02:14'}))
+    # The trunks carry VLAN 20 too
+    assert change.ports == {1: {2, 3}, 2: {1}}
+    assert change.gateway_macs == {20: ('00:00:00:00:01:14', '00:00:00:00:02:14')}
+    assert not change.gateway_ips and not change.routes
+
+
+def test_gateway_ip_touches_every_port():
+    change = _diff(lambda d: d['gateway_ips'].update({10: '10.0.10.1'}))
+    assert change.ports == {1: {1, 2, 3}, 2: {1, 2}}
+    assert change.gateway_ips == {10: ('10.0.10.254', '10.0.10.1')}
+    assert change.routes
+
+
+def test_link_and_route_changes():
+    def edit(doc):
+        doc['link_params'][0]['bw'] = 10
+        doc['static_routes']['172.16.0.0/12'] = '10.0.20.1'
+    change = _diff(edit)
+    assert change.links == {(1, 3)}
+    assert change.routes and not change.ports
+    assert _diff(lambda d: d['gateway_ips'].update({20: '10.0.20.254/24'})).routes
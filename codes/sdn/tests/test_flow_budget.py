@@ -0,0 +1,57 @@
+import socket
+import struct
+
+import flow_budget
+
+
+def _ip(s):
+    return struct.unpack('!I', socket.inet_aton(s))[0]
+
+
+def test_evicts_least_traffic_among_oldest():
+    table = flow_budget.FlowTable(capacity=10, evict_at=1.0, evict_to=0.8, candidates=2)
+    for i in range(9):
+        table.add(i, 2, 50, None, now=i)
+    assert table.evict() == []
+    # Oldest two: 0 still carries traffic, 1 is idle
+    table.update(0, 100, now=0.5)
+    table.add(9, 2, 50, None, now=9)
+    victims = [key for key, _ in table.evict()]
+    assert len(victims) == 2 and 0 not in victims and 1 in victims
+    assert len(table) == 8 and table.evicted == 2
+
+
+def test_update_moves_used_entries_back():
+    table = flow_budget.FlowTable(capacity=100)
+    table.add('a', 2, 50, None, now=0)
+    table.add('b', 2, 50, None, now=0)
+    table.update('a', 500, now=5)
+    assert list(table.entries) == ['b', 'a']
+    assert table.entries['a'].rate == 100.0
+    assert table.add('a', 2, 50, None, now=6) is False
+
+
+def test_aggregate_and_split():
+    agg = flow_budget.RouteAggregator(min_plen=24)
+    a, b = ('m1', 10), ('m2', 10)
+    installs, removes = agg.add(_ip('10.0.0.0'), a)
+    assert installs == [(_ip('10.0.0.0'), 32, a)] and removes == []
+    # The sibling /32 with the same next hop merges into a /31
+    installs, removes = agg.add(_ip('10.0.0.1'), a)
+    assert installs == [(_ip('10.0.0.0'), 31, a)]
+    assert sorted(removes) == [(_ip('10.0.0.0'), 32, a)]
+    assert agg.covering(_ip('10.0.0.1')) == (_ip('10.0.0.0'), 31)
+    # Same action again: refresh only
+    assert agg.add(_ip('10.0.0.1'), a) == ([(_ip('10.0.0.0'), 31, a)], [])
+    # A different next hop inside the /31 splits it back
+    installs, removes = agg.add(_ip('10.0.0.1'), b)
+    assert removes == [(_ip('10.0.0.0'), 31, a)]
+    assert sorted(installs) == sorted([(_ip('10.0.0.0'), 32, a), (_ip('10.0.0.1'), 32, b)])
+    assert len(agg) == 2
+
+
+def test_merge_stops_at_min_plen():
+    agg = flow_budget.RouteAggregator(min_plen=31)
+    for last in range(4):
+        agg.add(_ip(f'10.0.0.{last}'), 'x')
+    assert sorted(agg.prefixes) == [(_ip('10.0.0.0'), 31), (_ip('10.0.0.2'), 31)]
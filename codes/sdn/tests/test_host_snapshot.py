@@ -0,0 +1,124 @@
+import os
+
+import host_snapshot
+import host_table
+
+MAC1, MAC2, MAC3 = '00:00:00:00:00:01', '00:00:00:00:00:02', '00:00:00:00:00:03'
+
+
+def _hosts():
+    hosts = host_table.HostTable()
+    hosts.learn_ip(1, '10.0.10.1', MAC1, 3, 10, now=100.0)
+    hosts.learn_mac(2, MAC1, 4, 10, now=100.0)
+    hosts.learn_ip(1, '10.0.20.2', MAC2, 5, 20, now=50.0)
+    hosts.learn_mac(2, MAC3, 6, 20, now=100.0)
+    return hosts
+
+
+def _state(hosts):
+    return ({mac: (h.vlan, h.ts, h.dpids, h.ports) for mac, h in hosts.by_mac.items()},
+            {ip: (h.mac, h.ip_ts, h.ip_dpids) for ip, h in hosts.by_ip.items()})
+
+
+def _load(path, **aging):
+    hosts = host_table.HostTable()
+    counts = host_snapshot.HostSnapshot(path).load(hosts, **aging)
+    return hosts, counts
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'hosts.log')
+    hosts = _hosts()
+    log = host_snapshot.HostSnapshot(path)
+    assert log.append(hosts, *hosts.take_dirty()) == 5
+    assert log.append(hosts, *hosts.take_dirty()) == 0
+    hosts.remove_mac(MAC3)
+    hosts.learn_mac(3, MAC2, 1, 20, now=120.0)
+    assert log.append(hosts, *hosts.take_dirty()) == 2
+    assert log.size == os.path.getsize(path)
+    restored, counts = _load(path)
+    assert counts == (2, 2)
+    assert _state(restored) == _state(hosts)
+    assert restored.take_dirty() == (set(), set())
+
+
+def test_aged_entries_are_skipped(tmp_path):
+    path = str(tmp_path / 'hosts.log')
+    hosts = _hosts()
+    host_snapshot.HostSnapshot(path).append(hosts, *hosts.take_dirty())
+    restored, counts = _load(path, mac_aging=60, arp_aging=60, now=130.0)
+    assert counts == (2, 1)
+    assert set(restored.by_mac) == {MAC1, MAC3} and set(restored.by_ip) == {'10.0.10.1'}
+
+
+def test_compaction(tmp_path):
+    path = str(tmp_path / 'hosts.log')
+    hosts = _hosts()
+    log = host_snapshot.HostSnapshot(path, compact_min=0, compact_ratio=1.5)
+    log.append(hosts, *hosts.take_dirty())
+    for ts in range(200, 210):
+        hosts.learn_mac(1, MAC1, 3, 10, now=float(ts))
+        log.append(hosts, *hosts.take_dirty())
+    assert log.compactions > 0
+    assert log.size <= 1.5 * log.base_size and not os.path.exists(path + '.tmp')
+    assert _state(_load(path)[0]) == _state(hosts)
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    path = str(tmp_path / 'hosts.log')
+    hosts = _hosts()
+    host_snapshot.HostSnapshot(path).append(hosts, *hosts.take_dirty())
+    good = os.path.getsize(path)
+    hosts.learn_mac(1, MAC3, 9, 20, now=150.0)
+    record = host_snapshot.encode_mac(hosts.by_mac[MAC3])
+    with open(path, 'ab') as f:
+        f.write(record[:-3])
+    restored = host_table.HostTable()
+    log = host_snapshot.HostSnapshot(path)
+    assert log.load(restored) == (3, 2)
+    assert os.path.getsize(path) == good == log.size
+    assert restored.mac_location(1, MAC3) is None
+    # Appends after the cut are read back
+    log.append(hosts, {MAC3}, ())
+    assert _load(path)[0].mac_location(1, MAC3) == (9, 20)
+
+
+def test_foreign_file_is_replaced(tmp_path):
+    path = str(tmp_path / 'hosts.log')
+    with open(path, 'wb') as f:
+        f.write(b'not a host log\n' * 100)
+    hosts = host_table.HostTable()
+    log = host_snapshot.HostSnapshot(path)
+    assert log.load(hosts) == (0, 0)
+    with open(path, 'rb') as f:
+        assert f.read() == host_snapshot.MAGIC
+    assert log.size == len(host_snapshot.MAGIC)
+    hosts.learn_ip(1, '10.0.10.1', MAC1, 3, 10, now=100.0)
+    log.append(hosts, *hosts.take_dirty())
+    restored, counts = _load(path)
+    assert counts == (1, 1)
+    assert restored.ip_location(1, '10.0.10.1') == (MAC1, 3, 10)
+
+
+def test_io_through_run_and_pauses(tmp_path):
+    path = str(tmp_path / 'hosts.log')
+    calls, pauses = [], []
+
+    def run(fn, *args):
+        calls.append(fn.__name__)
+        return fn(*args)
+
+    hosts = _hosts()
+    log = host_snapshot.HostSnapshot(path, run=run, pause=lambda: pauses.append(1), chunk=2)
+    log.append(hosts, *hosts.take_dirty())
+    log.compact(hosts)
+    assert calls == ['_append', '_replace']
+    # 5 records appended, MAGIC + 5 records compacted: 2 pauses each
+    assert len(pauses) == 4
+    restored = host_table.HostTable()
+    restored.learn_mac(7, MAC3, 1, 20, now=200.0)
+    host_snapshot.HostSnapshot(path, run=run).load(restored)
+    assert calls[2:] == ['_read', 'decode']
+    # Hosts learned while the log is replayed are newer and kept
+    assert restored.mac_location(7, MAC3) == (1, 20) and restored.mac_location(2, MAC3) is None
+    assert len(restored) == 3
@@ -0,0 +1,71 @@
+import host_table
+
+MAC1, MAC2 = '00:00:00:00:00:01', '00:00:00:00:00:02'
+
+
+def test_learn_and_locate():
+    hosts = host_table.HostTable()
+    assert hosts.learn_mac(1, MAC1, 3, 10, now=1.0) is True
+    assert hosts.learn_mac(2, MAC1, 4, 10, now=2.0) is True
+    assert hosts.learn_mac(2, MAC1, 4, 10, now=3.0) is False      # refresh only
+    assert hosts.mac_location(1, MAC1) == (3, 10)
+    assert hosts.mac_location(2, MAC1) == (4, 10)
+    assert hosts.mac_location(3, MAC1) is None
+    assert hosts.mac_last_seen(MAC1) == 3.0
+    assert hosts.learn_mac(1, MAC1, 2, 10, now=4.0) is True        # moved on switch 1
+    assert hosts.mac_location(1, MAC1) == (2, 10)
+    assert len(hosts) == 1
+
+
+def test_arp_binding_moves_between_macs():
+    hosts = host_table.HostTable()
+    assert hosts.learn_ip(1, '10.0.10.1', MAC1, 1, 10, now=1.0) is True
+    assert hosts.learn_ip(1, '10.0.10.1', MAC1, 1, 10, now=2.0) is False
+    assert hosts.ip_location(1, '10.0.10.1') == (MAC1, 1, 10)
+    # The IP is taken over by another MAC
+    hosts.learn_ip(1, '10.0.10.1', MAC2, 2, 10, now=3.0)
+    assert hosts.by_ip['10.0.10.1'].mac == MAC2
+    assert hosts.by_mac[MAC1].ip is None
+    assert list(hosts.ips_on(1)) == [('10.0.10.1', MAC2, 2, 10)]
+
+
+def test_remove_port_drops_host_on_last_switch():
+    hosts = host_table.HostTable()
+    hosts.learn_ip(1, '10.0.10.1', MAC1, 1, 10, now=1.0)
+    hosts.learn_mac(2, MAC1, 4, 10, now=1.0)
+    hosts.remove_port(1, MAC1)
+    assert hosts.mac_location(1, MAC1) is None
+    assert MAC1 in hosts.by_mac
+    hosts.remove_port(2, MAC1)
+    assert MAC1 not in hosts.by_mac and '10.0.10.1' not in hosts.by_ip
+
+
+def test_dirty_keys():
+    hosts = host_table.HostTable()
+    hosts.learn_ip(1, '10.0.10.1', MAC1, 1, 10, now=1.0)
+    assert hosts.take_dirty() == ({MAC1}, {'10.0.10.1'})
+    assert hosts.take_dirty() == (set(), set())
+    hosts.remove_ip('10.0.10.1')
+    assert hosts.take_dirty() == (set(), {'10.0.10.1'})
+    # Restored entries are not dirty
+    hosts.restore(MAC2, 20, 5.0, [1], [7])
+    assert hosts.restore_ip('10.0.20.1', MAC2, 5.0, [1]) is not None
+    assert hosts.take_dirty() == (set(), set())
+    assert hosts.ip_location(1, '10.0.20.1') == (MAC2, 7, 20)
+
+
+def test_stop_tracking():
+    hosts = host_table.HostTable()
+    hosts.stop_tracking()
+    hosts.learn_ip(1, '10.0.10.1', MAC1, 1, 10, now=1.0)
+    hosts.remove_mac(MAC1)
+    assert hosts.take_dirty() == (set(), set())
+
+
+def test_restore_keeps_live_bindings():
+    hosts = host_table.HostTable()
+    hosts.learn_ip(1, '10.0.10.1', MAC1, 1, 10, now=9.0)
+    hosts.restore(MAC2, 10, 5.0, [1], [2])
+    assert hosts.restore_ip('10.0.10.1', MAC2, 5.0, [1]) is None
+    assert hosts.restore_ip('10.0.10.2', MAC1, 5.0, [1]) is None
+    assert hosts.by_ip['10.0.10.1'].mac == MAC1 and hosts.by_mac[MAC2].ip is None
@@ -0,0 +1,65 @@
+import random
+import socket
+import struct
+
+import icmp_echo
+
+HOST_MAC = bytes.fromhex('020000000001')
+GW_MAC = bytes.fromhex('00000000010a')
+HOST_IP, GW_IP = socket.inet_aton('10.0.10.1'), socket.inet_aton('10.0.10.254')
+
+
+def _request(payload, ident=0x1234, seq=1, vlan=None):
+    icmp = struct.pack('!BBHHH', icmp_echo.ICMP_ECHO_REQUEST, 0, 0, ident, seq) + payload
+    icmp = icmp[:2] + struct.pack('!H', icmp_echo.checksum(icmp)) + icmp[4:]
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(icmp), 7, 0, 63, 1, 0, HOST_IP, GW_IP)
+    ip = ip[:10] + struct.pack('!H', icmp_echo.checksum(ip)) + ip[12:]
+    eth = GW_MAC + HOST_MAC
+    if vlan is not None:
+        eth += struct.pack('!HH', 0x8100, vlan)
+    return eth + b'\x08\x00' + ip + icmp
+
+
+def _check_reply(reply, request, l3_offset):
+    assert reply[:6] == HOST_MAC and reply[6:12] == GW_MAC and reply[12:14] == b'\x08\x00'
+    ip, icmp = reply[14:34], reply[34:]
+    assert icmp_echo.checksum(ip) == 0
+    assert icmp_echo.checksum(icmp) == 0
+    assert ip[12:16] == GW_IP and ip[16:20] == HOST_IP and ip[8] == icmp_echo.REPLY_TTL
+    assert struct.unpack('!H', ip[2:4])[0] == 20 + len(icmp)
+    assert icmp[0] == 0 and icmp[4:] == request[l3_offset + 24:]
+
+
+def test_reply_checksums_verify():
+    replies = icmp_echo.EchoReplies()
+    rng = random.Random(3)
+    for size in [0, 1, 7, 56, 57, 1471]:
+        request = _request(bytes(rng.getrandbits(8) for _ in range(size)), seq=size)
+        _check_reply(replies.reply(request, 14, GW_MAC), request, 14)
+    tagged = _request(b'odd', vlan=10)
+    _check_reply(replies.reply(tagged, 18, GW_MAC), tagged, 18)
+
+
+def test_checksum_update_matches_full_sum():
+    rng = random.Random(5)
+    for _ in range(500):
+        payload = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 33)))
+        request = _request(payload, ident=rng.getrandbits(16), seq=rng.getrandbits(16))
+        icmp = bytearray(request[34:])
+        icmp[0] = 0
+        request_csum = struct.unpack('!H', request[36:38])[0]
+        icmp[2:4] = struct.pack('!H', icmp_echo.echo_reply_checksum(request_csum))
+        assert icmp_echo.checksum(bytes(icmp)) == 0
+
+
+def test_templates_and_non_echo():
+    replies = icmp_echo.EchoReplies(max_templates=1)
+    first = replies.reply(_request(b'abc', seq=1), 14, GW_MAC)
+    second = replies.reply(_request(b'xyz', seq=2), 14, GW_MAC)
+    assert first[:34] == second[:34] and (replies.misses, replies.hits) == (1, 1)
+    replies.reply(_request(b'abcd'), 14, GW_MAC)
+    assert replies.misses == 2 and len(replies.templates) == 1
+    reply = bytearray(_request(b'abc'))
+    reply[34] = 0                            # already a reply
+    assert replies.reply(bytes(reply), 14, GW_MAC) is None
+    assert replies.reply(_request(b'')[:40], 14, GW_MAC) is None
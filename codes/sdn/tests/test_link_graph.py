@@ -0,0 +1,135 @@
+import heapq
+import random
+
+import link_graph
+
+INF = link_graph.INF
+
+
+def _dijkstra(links, src):
+    """Distances from src over the directed links, from scratch"""
+    dist = {src: 0}
+    heap = [(0, src)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        for link in links:
+            if link.src == node and d + link.cost < dist.get(link.dst, INF):
+                dist[link.dst] = d + link.cost
+                heapq.heappush(heap, (d + link.cost, link.dst))
+    return dist
+
+
+def _check(graph):
+    links = list(graph.links.values())
+    nodes = {l.src for l in links} | {l.dst for l in links}
+    for src in nodes:
+        want = _dijkstra(links, src)
+        for dst in nodes:
+            assert graph.distance(src, dst) == want.get(dst, INF), (src, dst)
+            port = graph.next_port(src, dst)
+            if src == dst or dst not in want:
+                assert port is None
+                continue
+            # The next hop is a link on some shortest path
+            link = graph.links[(src, port)]
+            assert link.cost + _dijkstra(links, link.dst).get(dst, INF) == want[dst]
+            hops = graph.path(src, dst)
+            assert sum(graph.links[hop].cost for hop in hops) == want[dst]
+            assert hops[0] == (src, port)
+
+    # Flood tree: the unblocked links form a spanning forest of the undirected graph
+    root = {}
+
+    def find(x):
+        while root.get(x, x) != x:
+            x = root[x]
+        return x
+
+    edges = set()
+    for link in links:
+        if link.src_port not in graph.flood_blocked(link.src):
+            edges.add(frozenset(((link.src, link.src_port), (link.dst, link.dst_port))))
+    for edge in edges:
+        (a, _), (b, _) = sorted(edge)
+        ra, rb = find(a), find(b)
+        assert ra != rb, "flood tree has a loop"
+        root[ra] = rb
+    components = {find(l.src) for l in links} | {find(l.dst) for l in links}
+    for link in links:
+        assert find(link.src) == find(link.dst)
+    assert len(edges) == len(nodes) - len(components)
+
+
+def test_incremental_paths_match_full_recompute():
+    rng = random.Random(7)
+    costs = {}
+
+    def cost_fn(dpid, port):
+        return costs.setdefault((dpid, port), rng.randint(1, 5))
+
+    graph = link_graph.LinkGraph(cost_fn, timeout=10.0)
+    now = 0.0
+    for _ in range(400):
+        step = rng.random()
+        if step < 0.6:
+            a, b = rng.sample(range(1, 8), 2)
+            pa, pb = rng.randint(1, 4), rng.randint(1, 4)
+            graph.add_link(a, pa, b, pb, now)
+            if rng.random() < 0.9:
+                graph.add_link(b, pb, a, pa, now)
+        elif step < 0.75 and graph.links:
+            graph.remove_port(*rng.choice(sorted(graph.links)))
+        elif step < 0.8:
+            graph.remove_switch(rng.randint(1, 7))
+        else:
+            # Time passes: some links are re-probed, the rest may age out
+            now += rng.uniform(1, 6)
+            for link in list(graph.links.values()):
+                if rng.random() < 0.7:
+                    graph.add_link(link.src, link.src_port, link.dst, link.dst_port, now)
+            graph.expire(now)
+        _check(graph)
+    assert graph.relaxations and graph.recomputes
+
+
+def _square(graph, now=0.0):
+    """1 - 2 - 4 and 1 - 3 - 4, plus a costly direct 1 - 4"""
+    for a, pa, b, pb in [(1, 1, 2, 1), (2, 2, 4, 1), (1, 2, 3, 1), (3, 2, 4, 2), (1, 3, 4, 3)]:
+        graph.add_link(a, pa, b, pb, now)
+        graph.add_link(b, pb, a, pa, now)
+
+
+def test_downstream_and_flood_blocked():
+    costs = {(1, 3): 10, (4, 3): 10}
+    graph = link_graph.LinkGraph(lambda dpid, port: costs.get((dpid, port), 1))
+    _square(graph)
+    assert graph.distance(1, 4) == 2
+    # Every neighbor closer to 4 is a loop-free next hop, the costly direct link too
+    assert graph.downstream(1, 4) == [(1, 2), (2, 3), (3, 4)]
+    assert graph.downstream(2, 1) == [(1, 1)]
+    assert graph.downstream(4, 4) == []
+    # Four switches, five links: two links off the tree, the costly one among them
+    blocked = {(d, p) for d in (1, 2, 3, 4) for p in graph.flood_blocked(d)}
+    assert {(1, 3), (4, 3)} <= blocked and len(blocked) == 4
+    assert graph.flood_blocked(9) == ()
+
+
+def test_recovers_after_link_ages_out():
+    graph = link_graph.LinkGraph(timeout=10.0)
+    _square(graph)
+    assert graph.next_port(1, 4) == 3
+    for a, pa, b, pb in [(1, 1, 2, 1), (2, 1, 1, 1), (2, 2, 4, 1), (4, 1, 2, 2),
+                         (1, 2, 3, 1), (3, 1, 1, 2), (3, 2, 4, 2), (4, 2, 3, 2)]:
+        graph.add_link(a, pa, b, pb, 8.0)
+    assert graph.expire(12.0) >= {1, 4}
+    assert not graph.is_link_port(1, 3) and not graph.is_link_port(4, 3)
+    assert graph.distance(1, 4) == 2 * link_graph.link_cost()
+    assert graph.next_port(1, 4) in (1, 2)
+    # The remaining ring still needs one link off the flood tree
+    assert sum(len(graph.flood_blocked(d)) for d in (1, 2, 3, 4)) == 2
+    # The direct link comes back
+    graph.add_link(1, 3, 4, 3, 13.0)
+    graph.add_link(4, 3, 1, 3, 13.0)
+    assert graph.next_port(1, 4) == 3
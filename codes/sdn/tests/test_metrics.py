@@ -0,0 +1,89 @@
+import pytest
+
+import metrics
+
+
+def test_bucket_boundaries_are_inclusive():
+    hist = metrics.Histogram(buckets=(0.1, 1.0))
+    for value in (0.1, 0.10001, 1.0, 5.0):
+        hist.observe(value)
+    # le="0.1" holds 0.1 itself, anything above 1.0 lands in +Inf
+    assert hist.counts == [1, 2, 1]
+    assert hist.count == 4 and hist.sum == pytest.approx(6.20001)
+
+
+def test_quantiles():
+    hist = metrics.Histogram(buckets=(1.0, 2.0, 5.0))
+    assert hist.quantile(0.5) == 0.0
+    for value in [0.5] * 50 + [1.5] * 40 + [3.0] * 9 + [9.0]:
+        hist.observe(value)
+    assert hist.quantile(0.5) == 1.0
+    assert hist.quantile(0.51) == 2.0
+    assert hist.quantile(0.9) == 2.0
+    assert hist.quantile(0.99) == 5.0
+    assert hist.quantile(1.0) == float('inf')
+
+
+def test_render_text_format():
+    reg = metrics.Registry(prefix='sdn')
+    hist = reg.histogram('packet_in_seconds', 'PacketIn handling time', type='arp')
+    assert reg.histogram('packet_in_seconds', type='arp') is hist
+    hist.observe(0.0005)
+    hist.observe(0.02)
+    reg.histogram('packet_in_seconds', type='l2')
+    text = reg.render(counters=[('packets_in', 'PacketIns', [({'dpid': 1}, 7)])],
+                      gauges=[('hosts', 'Known hosts', [({}, 2.5)])])
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    assert lines[:6] == [
+        '# HELP sdn_packets_in PacketIns',
+        '# TYPE sdn_packets_in counter',
+        'sdn_packets_in{dpid="1"} 7',
+        '# HELP sdn_hosts Known hosts',
+        '# TYPE sdn_hosts gauge',
+        'sdn_hosts 2.5',
+    ]
+    assert lines[6:8] == ['# HELP sdn_packet_in_seconds PacketIn handling time',
+                          '# TYPE sdn_packet_in_seconds histogram']
+    buckets = lines[8:8 + len(metrics.LATENCY_BUCKETS) + 1]
+    assert buckets[0] == 'sdn_packet_in_seconds_bucket{type="arp",le="1e-05"} 0'
+    assert 'sdn_packet_in_seconds_bucket{type="arp",le="0.0005"} 1' in buckets
+    assert 'sdn_packet_in_seconds_bucket{type="arp",le="0.01"} 1' in buckets
+    assert 'sdn_packet_in_seconds_bucket{type="arp",le="0.02"} 2' in buckets
+    assert buckets[-1] == 'sdn_packet_in_seconds_bucket{type="arp",le="+Inf"} 2'
+    assert lines[8 + len(buckets):10 + len(buckets)] == [
+        'sdn_packet_in_seconds_sum{type="arp"} 0.0205',
+        'sdn_packet_in_seconds_count{type="arp"} 2']
+    # One HELP/TYPE per family, the second series follows the first
+    assert text.count('# TYPE sdn_packet_in_seconds') == 1
+    assert lines[-1] == 'sdn_packet_in_seconds_count{type="l2"} 0'
+
+
+class Sock(object):
+    def __init__(self, request):
+        self.request = request
+        self.sent = b''
+        self.closed = False
+
+    def recv(self, n):
+        return self.request[:n]
+
+    def sendall(self, data):
+        self.sent += data
+
+    def close(self):
+        self.closed = True
+
+
+def test_handle_http():
+    sock = Sock(b'GET /metrics?x=1 HTTP/1.1\r\nHost: x\r\n\r\n')
+    metrics.handle_http(sock, lambda: 'sdn_up 1\n')
+    head, body = sock.sent.split(b'\r\n\r\n', 1)
+    assert head.startswith(b'HTTP/1.0 200 OK\r\n') and b'version=0.0.4' in head
+    assert b'Content-Length: 9' in head and body == b'sdn_up 1\n' and sock.closed
+
+    for request in (b'GET / HTTP/1.1\r\n\r\n', b'POST /metrics HTTP/1.1\r\n\r\n', b''):
+        sock = Sock(request)
+        metrics.handle_http(sock, lambda: pytest.fail("rendered for a bad request"))
+        assert sock.sent.startswith(b'HTTP/1.0 404 Not Found\r\n') and sock.closed
+        assert sock.sent.endswith(b'\r\n\r\nnot found\n')
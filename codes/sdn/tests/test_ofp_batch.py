@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import ofp_batch
+
+
+class Msg(object):
+    def __init__(self, name, xid=None):
+        self.name = name
+        self.xid = xid
+
+    def serialize(self):
+        self.buf = f"{self.name}#{self.xid};".encode()
+
+
+class OFPBarrierRequest(Msg):
+    def __init__(self, dp):
+        super(OFPBarrierRequest, self).__init__('barrier')
+
+
+class Datapath(object):
+    def __init__(self, dpid):
+        self.id = dpid
+        self.ofproto_parser = SimpleNamespace(OFPBarrierRequest=OFPBarrierRequest)
+        self.writes = []
+        self.xid = 0
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.xid = self.xid
+
+    def send(self, data):
+        self.writes.append(data.decode().rstrip(';').split(';'))
+
+
+class Timers(object):
+    """spawn_after stand-in: timers run when the test says so"""
+
+    def __init__(self):
+        self.pending = []
+
+    def __call__(self, seconds, fn, *args):
+        self.pending.append((seconds, fn, args))
+
+    def fire(self):
+        pending, self.pending = self.pending, []
+        for _, fn, args in pending:
+            fn(*args)
+
+
+def test_window_flush_in_order():
+    timers = Timers()
+    sender = ofp_batch.BatchSender(window=0.002, max_batch=8, spawn_after=timers)
+    dp1, dp2 = Datapath(1), Datapath(2)
+    sender.send(dp1, Msg('a'))
+    sender.send(dp2, Msg('x'))
+    sender.send(dp1, Msg('b', xid=40))
+    sender.send(dp1, Msg('c'), barrier=True)
+    # One timer per datapath and window, nothing written yet
+    assert [(s, args) for s, _, args in timers.pending] == [(0.002, (1,)), (0.002, (2,))]
+    assert dp1.writes == [] and sender.depth() == 4
+    timers.fire()
+    assert dp1.writes == [['a#1', 'b#40', 'c#2', 'barrier#3']]
+    assert dp2.writes == [['x#1']]
+    assert sender.barriers.keys() == {(1, 3)}
+    assert sender.barrier_reply(1, 3) is not None and sender.barrier_reply(1, 3) is None
+    summary = sender.summary()
+    assert (summary['batches'], summary['flushed'], summary['depth']) == (2, 5, 0)
+
+
+def test_full_batch_flushes_at_once():
+    timers = Timers()
+    sender = ofp_batch.BatchSender(max_batch=3, spawn_after=timers)
+    dp = Datapath(1)
+    for name in 'abcde':
+        sender.send(dp, Msg(name))
+    assert dp.writes == [['a#1', 'b#2', 'c#3']]
+    assert sender.summary()['max_depth'] == 3
+    timers.fire()
+    assert dp.writes[1] == ['d#4', 'e#5']
+    # The window timer of a batch that was already flushed writes nothing
+    sender.send(dp, Msg('f'))
+    sender.flush(1)
+    timers.fire()
+    assert len(dp.writes) == 3
+
+
+def test_forget_drops_datapath_state():
+    timers = Timers()
+    sender = ofp_batch.BatchSender(spawn_after=timers)
+    dp = Datapath(1)
+    sender.send(dp, Msg('a'), barrier=True)
+    sender.send(Datapath(2), Msg('b'))
+    sender.forget(1)
+    assert 1 not in sender.queues and 1 not in sender.datapaths
+    assert 1 not in sender.scheduled and 1 not in sender.max_depth
+    assert 1 not in sender.want_barrier and 1 not in sender.first_enqueued
+    timers.fire()
+    assert dp.writes == []
+    # A reconnect starts a fresh window
+    dp = Datapath(1)
+    sender.send(dp, Msg('c'))
+    assert timers.pending[-1][2] == (1,)
+    timers.fire()
+    assert dp.writes == [['c#1']]
@@ -0,0 +1,99 @@
+import pytest
+
+import bench
+import packet_parser
+
+
+def test_arp_request_untagged():
+    hdr = packet_parser.parse(bench.FRAMES['arp-request'])
+    assert hdr.eth_dst == 'ff:ff:ff:ff:ff:ff'
+    assert hdr.eth_src == '00:00:00:00:00:01'
+    assert hdr.ethertype == packet_parser.ETH_TYPE_ARP
+    assert hdr.vlan_id is None
+    assert hdr.l3_offset == 14
+    assert (hdr.arp_op, hdr.arp_src_mac, hdr.arp_src_ip, hdr.arp_dst_ip) == \
+        (1, '00:00:00:00:00:01', '10.0.10.11', '10.0.10.254')
+    assert hdr.ip_dst is None
+
+
+def test_arp_reply_tagged():
+    hdr = packet_parser.parse(bench.FRAMES['arp-reply-tagged'])
+    assert hdr.vlan_id == 20
+    assert hdr.ethertype == packet_parser.ETH_TYPE_ARP
+    assert hdr.l3_offset == 18
+    assert (hdr.arp_op, hdr.arp_src_ip, hdr.arp_dst_mac, hdr.arp_dst_ip) == \
+        (2, '10.0.20.11', '00:00:00:00:00:01', '10.0.10.11')
+
+
+def test_icmp_echo():
+    hdr = packet_parser.parse(bench.FRAMES['icmp-echo'])
+    assert (hdr.ip_src, hdr.ip_dst, hdr.ip_proto, hdr.ip_ttl, hdr.icmp_type) == \
+        ('10.0.10.11', '10.0.10.254', 1, 64, 8)
+
+
+def test_tcp_tagged_has_no_icmp_type():
+    hdr = packet_parser.parse(bench.FRAMES['tcp-syn-tagged'])
+    assert hdr.vlan_id == 10
+    assert (hdr.ip_dst, hdr.ip_proto, hdr.icmp_type) == ('10.0.20.11', 6, None)
+
+
+def test_truncated_frames():
+    assert packet_parser.parse(b'\x00' * 13) is None
+    # Tagged header cut inside the 802.1Q tag
+    assert packet_parser.parse(bench.FRAMES['arp-reply-tagged'][:16]) is None
+    # ARP body cut short: Ethernet fields only
+    hdr = packet_parser.parse(bench.FRAMES['arp-request'][:30])
+    assert hdr.ethertype == packet_parser.ETH_TYPE_ARP and hdr.arp_op is None
+
+
+# ─── Against Ryu's own parser ────────────────────────────────
+def _ryu_frames():
+    pytest.importorskip('ryu.lib.packet')
+    from ryu.lib.packet import packet, ethernet, vlan, arp, ipv4, icmp, tcp
+    from ryu.ofproto import ether, inet
+
+    def build(*protocols):
+        pkt = packet.Packet()
+        for proto in protocols:
+            pkt.add_protocol(proto)
+        pkt.serialize()
+        return bytes(pkt.data)
+
+    mac1, mac2 = '00:00:00:00:00:01', '00:00:00:00:00:03'
+    return [
+        build(ethernet.ethernet('ff:ff:ff:ff:ff:ff', mac1, ether.ETH_TYPE_ARP),
+              arp.arp_ip(arp.ARP_REQUEST, mac1, '10.0.10.11', '00:00:00:00:00:00', '10.0.10.254')),
+        build(ethernet.ethernet(mac1, mac2, ether.ETH_TYPE_8021Q),
+              vlan.vlan(vid=20, ethertype=ether.ETH_TYPE_ARP),
+              arp.arp_ip(arp.ARP_REPLY, mac2, '10.0.20.11', mac1, '10.0.10.11')),
+        build(ethernet.ethernet(mac2, mac1, ether.ETH_TYPE_IP),
+              ipv4.ipv4(src='10.0.10.11', dst='10.0.10.254', proto=inet.IPPROTO_ICMP, ttl=63),
+              icmp.icmp(icmp.ICMP_ECHO_REQUEST, data=icmp.echo(1, 1, b'x' * 56))),
+        build(ethernet.ethernet(mac2, mac1, ether.ETH_TYPE_8021Q),
+              vlan.vlan(vid=10, ethertype=ether.ETH_TYPE_IP),
+              ipv4.ipv4(src='10.0.10.11', dst='10.0.20.11', proto=inet.IPPROTO_TCP),
+              tcp.tcp(src_port=50000, dst_port=5001, bits=tcp.TCP_SYN)),
+    ] + list(bench.FRAMES.values())
+
+
+def test_matches_ryu():
+    frames = _ryu_frames()
+    from ryu.lib.packet import packet, ethernet, vlan, arp, ipv4, icmp
+
+    for data in frames:
+        hdr = packet_parser.parse(data)
+        pkt = packet.Packet(data)
+        eth = pkt.get_protocol(ethernet.ethernet)
+        tag = pkt.get_protocol(vlan.vlan)
+        assert (hdr.eth_dst, hdr.eth_src) == (eth.dst, eth.src)
+        assert hdr.vlan_id == (tag.vid if tag else None)
+        assert hdr.ethertype == (tag.ethertype if tag else eth.ethertype)
+        a = pkt.get_protocol(arp.arp)
+        if a is not None:
+            assert (hdr.arp_op, hdr.arp_src_mac, hdr.arp_src_ip, hdr.arp_dst_mac, hdr.arp_dst_ip) == \
+                (a.opcode, a.src_mac, a.src_ip, a.dst_mac, a.dst_ip)
+        ip = pkt.get_protocol(ipv4.ipv4)
+        if ip is not None:
+            assert (hdr.ip_src, hdr.ip_dst, hdr.ip_proto, hdr.ip_ttl) == (ip.src, ip.dst, ip.proto, ip.ttl)
+            echo = pkt.get_protocol(icmp.icmp)
+            assert hdr.icmp_type == (echo.type if echo else None)
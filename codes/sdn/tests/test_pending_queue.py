@@ -0,0 +1,32 @@
+import pending_queue
+
+
+def test_first_packet_asks_for_arp():
+    q = pending_queue.PendingQueue(ttl=3.0, max_per_target=2)
+    assert q.add((1, '10.0.20.11'), 'a', now=0) is True
+    assert q.add((1, '10.0.20.11'), 'b', now=0.1) is False
+    assert q.add((1, '10.0.20.11'), 'c', now=0.2) is False    # over max_per_target
+    assert q.counters['dropped'] == 1
+    assert q.release((1, '10.0.20.11')) == ['a', 'b']
+    assert q.release((1, '10.0.20.11')) == []
+    assert len(q) == 0
+
+
+def test_expire_and_max_targets():
+    q = pending_queue.PendingQueue(ttl=3.0, max_targets=2)
+    q.add((1, '10.0.0.1'), 'a', now=0)
+    q.add((1, '10.0.0.2'), 'b', now=2)
+    assert q.add((1, '10.0.0.3'), 'c', now=2.5) is False      # table full
+    assert q.expire(now=3.5) == 1
+    assert list(q.targets) == [(1, '10.0.0.2')]
+    # The next add expires lazily too
+    assert q.add((2, '10.0.0.3'), 'c', now=6) is True
+    assert list(q.targets) == [(2, '10.0.0.3')]
+
+
+def test_forget_switch():
+    q = pending_queue.PendingQueue()
+    q.add((1, '10.0.0.1'), 'a', now=0)
+    q.add((2, '10.0.0.1'), 'b', now=0)
+    q.forget(1)
+    assert list(q.targets) == [(2, '10.0.0.1')]
@@ -0,0 +1,100 @@
+import pytest
+
+import route_table
+
+
+def _table():
+    routes = route_table.RouteTable()
+    routes.add('10.0.10.254/24', vlan=10)
+    routes.add('10.0.20.254/24', vlan=20)
+    routes.add('10.10.10.0/24', vlan=10)
+    routes.add('192.168.100.0/30', next_hop='10.10.10.1')
+    routes.add('192.168.0.0/16', next_hop='10.0.20.1')
+    return routes
+
+
+def test_helpers():
+    assert route_table.ip_to_int('10.0.10.1') == 0x0a000a01
+    assert route_table.int_to_ip(0x0a000a01) == '10.0.10.1'
+    assert route_table.prefix_mask(0) == 0 and route_table.prefix_mask(20) == 0xfffff000
+    # Host bits are masked off, a bare address is a /32
+    assert route_table.parse_prefix('10.0.10.254/24') == (0x0a000a00, 24)
+    assert route_table.parse_prefix('10.0.10.7') == (0x0a000a07, 32)
+
+
+def test_longest_match_wins():
+    routes = _table()
+    assert routes.lookup('192.168.100.2').prefix == '192.168.100.0/30'
+    assert routes.lookup('192.168.100.4').prefix == '192.168.0.0/16'
+    assert routes.lookup('10.0.10.9').vlan == 10
+    assert routes.lookup('10.0.11.9') is None
+    routes.add('0.0.0.0/0', next_hop='10.0.10.1')
+    assert routes.lookup('8.8.8.8').prefix == '0.0.0.0/0'
+    assert routes.lookup('10.0.20.5').vlan == 20
+
+
+def test_resolve_follows_static_next_hops():
+    routes = _table()
+    assert routes.resolve('10.0.20.7') == (20, '10.0.20.7')
+    assert routes.resolve('192.168.100.1') == (10, '10.10.10.1')
+    assert routes.resolve('172.16.0.1') is None
+    # A next hop that routes back onto itself gives up after max_depth
+    routes.add('172.16.0.0/16', next_hop='172.16.0.1')
+    assert routes.resolve('172.16.0.9') is None
+
+
+def test_replace_and_remove():
+    routes = _table()
+    routes.add('10.10.10.0/24', vlan=20)
+    assert routes.lookup('10.10.10.5').vlan == 20 and len(routes) == 5
+    assert routes.remove('192.168.100.0/30').prefix == '192.168.100.0/30'
+    assert 30 not in routes.by_len
+    assert routes.lookup('192.168.100.2').prefix == '192.168.0.0/16'
+    assert [r.plen for r in routes] == sorted((r.plen for r in routes), reverse=True)
+
+
+def test_needs_exactly_one_target():
+    with pytest.raises(ValueError):
+        route_table.RouteTable().add('10.0.0.0/8')
+    with pytest.raises(ValueError):
+        route_table.RouteTable().add('10.0.0.0/8', vlan=10, next_hop='10.0.0.1')
+
+
+def test_cached_lookups_follow_changes():
+    routes = route_table.RouteTable(cache_size=2)
+    routes.add('10.0.0.0/8', vlan=10)
+    assert routes.lookup('10.1.2.3').plen == 8
+    assert routes.lookup('172.16.0.1') is None
+    routes.add('10.1.0.0/16', vlan=20)
+    routes.add('172.16.0.0/12', next_hop='10.0.0.1')
+    assert routes.lookup('10.1.2.3').plen == 16
+    assert routes.lookup('172.16.0.1').plen == 12
+    routes.remove('10.1.0.0/16')
+    assert routes.lookup('10.1.2.3').plen == 8
+    # A full cache starts over instead of growing
+    for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+        routes.lookup(ip)
+    assert len(routes._cache) <= 2
+
+
+def test_overlaps():
+    net, _ = route_table.parse_prefix('10.0.10.0/24')
+    assert route_table.overlaps(net, 24, route_table.ip_to_int('10.0.10.7'), 32)
+    assert route_table.overlaps(net, 24, 0, 0)
+    assert not route_table.overlaps(net, 24, route_table.ip_to_int('10.0.11.7'), 32)
+
+
+def test_changed_prefixes():
+    old, new = _table(), _table()
+    assert route_table.changed_prefixes(old, new) == set()
+    new.remove('192.168.100.0/30')
+    new.add('172.16.0.0/12', next_hop='10.0.20.1')
+    # 10.10.10.1 now sits on VLAN 20: the static route through it moves with it
+    new.add('10.10.10.0/24', vlan=20)
+    assert route_table.changed_prefixes(old, new) == {
+        route_table.parse_prefix('192.168.100.0/30'), route_table.parse_prefix('172.16.0.0/12'),
+        route_table.parse_prefix('10.10.10.0/24')}
+    new.add('192.168.100.0/30', next_hop='10.10.10.1')
+    assert route_table.parse_prefix('192.168.100.0/30') in route_table.changed_prefixes(old, new)
+    new.add('10.10.10.0/24', vlan=10)
+    assert route_table.changed_prefixes(old, new) == {route_table.parse_prefix('172.16.0.0/12')}
@@ -0,0 +1,62 @@
+import json
+import socket
+import threading
+from collections import Counter
+
+import sharding
+import state_service
+
+
+def test_owner_of():
+    members = [0, 1, 2]
+    assert sharding.owner_of(5, []) is None
+    owners = [sharding.owner_of(dpid, members) for dpid in range(1, 301)]
+    assert set(owners) == set(members)
+    # Consecutive dpids spread evenly
+    assert min(Counter(owners).values()) >= 80
+    # Stable for the same membership, only a dead worker's switches move
+    alive = [0, 2]
+    for dpid, owner in zip(range(1, 301), owners):
+        assert sharding.owner_of(dpid, members) == owner
+        assert sharding.owner_of(dpid, alive) in alive
+    # Explicit assignment wins while its worker is alive
+    assert sharding.owner_of(7, members, {7: 1}) == 1
+    assert sharding.owner_of(7, alive, {7: 1}) == sharding.owner_of(7, alive)
+
+
+def _connect(path, worker):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.sendall((json.dumps({'op': 'hello', 'worker': worker}) + '\n').encode())
+    return sock
+
+
+def test_stuck_worker_does_not_stall_the_others(tmp_path):
+    path = str(tmp_path / 'state.sock')
+    server = state_service._Server(path, state_service._Handler)
+    server.service = state_service.StateService()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        stuck = _connect(path, 2)          # never reads
+        fast = _connect(path, 1)
+        reader = fast.makefile('rb')
+        assert json.loads(reader.readline())['workers'] == [1, 2]
+        publisher = _connect(path, 0)
+        publisher.settimeout(10)
+        n = 20000                           # far more than the stuck socket buffers
+        lines = [json.dumps({'op': 'mac', 'dpid': 1, 'mac': '02:00:00:00:%02x:%02x' % (i >> 8, i & 0xff),
+                             'port': 1, 'vlan': 10, 'ts': float(i)}) + '\n' for i in range(n)]
+        fast.settimeout(10)
+        publisher.sendall(''.join(lines).encode())
+        macs = 0
+        while macs < n:
+            msg = json.loads(reader.readline())
+            macs += msg['op'] == 'mac'
+        stats = state_service.query_stats(path)
+        assert stats['members'] == [0, 1, 2] and stats['hosts'] == n
+        stuck.close()
+        publisher.close()
+        fast.close()
+    finally:
+        server.shutdown()
+        server.server_close()
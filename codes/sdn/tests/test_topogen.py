@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+import pytest
+
+import fabric_config
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'mininet'))
+import topogen  # noqa: E402
+
+SDN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _config(fabric):
+    # Through JSON, as topogen.py --config writes it
+    return fabric_config.FabricConfig(json.loads(json.dumps(fabric.controller_config())))
+
+
+def test_lab_matches_fabric_lab_yaml():
+    pytest.importorskip('yaml')
+    generated = _config(topogen.lab())
+    shipped = fabric_config.load(os.path.join(SDN_DIR, 'fabric_lab.yaml'))
+    assert generated.port_config == shipped.port_config
+    assert generated.gateway_ips == shipped.gateway_ips
+    assert generated.gateway_macs == shipped.gateway_macs
+    assert generated.link_params == shipped.link_params
+
+
+@pytest.mark.parametrize('build, switches, links', [
+    (lambda: topogen.linear(switches=4), 4, 3),
+    (lambda: topogen.leaf_spine(leaves=4, spines=2), 6, 8),
+    (lambda: topogen.fat_tree(k=4), 20, 32),
+])
+def test_presets_load_as_fabric_config(build, switches, links):
+    fabric = build()
+    config = _config(fabric)
+    assert len(config.switches) == switches
+    assert len(config.link_params) == 2 * links
+    # Every host sits on an access port of its VLAN, every link end is a trunk
+    for host in fabric.hosts:
+        assert config.switch(host['switch']).vlan_of[host['port']] == host['vlan']
+    for a, pa, b, pb, _, _ in fabric.links:
+        assert config.switch(a).is_trunk(pa) and config.switch(b).is_trunk(pb)
+
+
+def test_too_many_hosts_per_vlan():
+    with pytest.raises(ValueError):
+        topogen.linear(hosts_per_vlan=topogen.MAX_HOSTS_PER_VLAN + 1)
+
+
+def test_fat_tree_needs_even_k():
+    with pytest.raises(ValueError):
+        topogen.fat_tree(k=3)
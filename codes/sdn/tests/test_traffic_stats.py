@@ -0,0 +1,61 @@
+import pytest
+
+import traffic_stats
+
+
+def test_ewma_rate_from_counter_deltas():
+    meter = traffic_stats.RateMeter(alpha=0.5)
+    assert meter.update('k', 1000, 0.0) == 0.0           # first sample: no rate yet
+    assert meter.update('k', 2000, 1.0) == 1000.0        # first rate taken as is
+    assert meter.update('k', 5000, 2.0) == 2000.0        # halfway to 3000
+    assert meter.update('k', 5000, 2.0) == 2000.0        # same timestamp: ignored
+    # Counter reset: rebased, the rate is kept rather than read as 0 or negative
+    assert meter.update('k', 100, 3.0) == 2000.0
+    assert meter.update('k', 2100, 4.0) == 2000.0
+    assert meter.rate('k') == 2000.0 and meter.rate('other') == 0.0
+    meter.update(('s1', 1), 0, 0.0)
+    meter.forget(lambda key: key[0] == 's1')
+    assert set(meter.samples) == {'k'}
+
+
+def test_no_smoothing():
+    meter = traffic_stats.RateMeter(alpha=1.0)
+    meter.update('k', 0, 0.0)
+    meter.update('k', 800, 2.0)
+    assert meter.update('k', 1000, 3.0) == 200.0
+
+
+CAP = {1: 1e9, 2: 1e9, 3: 1e9}
+
+
+def test_moves_heaviest_flow_to_least_loaded_path():
+    util = {1: 0.9, 2: 0.3, 3: 0.1}
+    flows = [('small', 0.05e9, {1}, [1, 2, 3]), ('big', 0.2e9, {1}, [1, 2, 3])]
+    moves = traffic_stats.plan_migrations(util, CAP, flows, high=0.8, low=0.5)
+    assert moves == [('big', 1, 3)]
+
+
+def test_hysteresis_band():
+    flows = [('f', 0.2e9, {1}, [1, 2])]
+    # Not above the high watermark: nothing moves
+    assert traffic_stats.plan_migrations({1: 0.8, 2: 0.0}, CAP, flows) == []
+    # The only alternative would end at or above the low watermark: stay put
+    assert traffic_stats.plan_migrations({1: 0.95, 2: 0.3}, CAP, flows) == []
+    assert traffic_stats.plan_migrations({1: 0.95, 2: 0.29}, CAP, flows) == [('f', 1, 2)]
+
+
+def test_stops_once_under_high_and_single_path():
+    util = {1: 0.85, 2: 0.0}
+    flows = [('a', 0.1e9, {1}, [1, 2]), ('b', 0.08e9, {1}, [1, 2])]
+    assert traffic_stats.plan_migrations(util, CAP, flows) == [('a', 1, 2)]
+    # One path only: nowhere to go
+    assert traffic_stats.plan_migrations({1: 0.99}, CAP, [('a', 0.5e9, {1}, [1])]) == []
+    assert traffic_stats.plan_migrations({1: 0.99}, CAP, [('a', 0.5e9, {1}, [])]) == []
+
+
+@pytest.mark.parametrize('alpha', [0.25, 1.0])
+def test_rate_converges(alpha):
+    meter = traffic_stats.RateMeter(alpha=alpha)
+    for t in range(40):
+        rate = meter.update('k', t * 500, float(t))
+    assert rate == pytest.approx(500.0)
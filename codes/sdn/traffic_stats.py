@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Counter rates and congestion-driven flow migration
+─────────────────────────────────────────────────────────────
+• RateMeter: byte counters sampled by stats replies -> bytes/s,
+  smoothed as an EWMA over the polls so one burst doesn't trigger a move
+• plan_migrations(): on a switch, move the heaviest flows off links
+  above the high watermark onto alternatives that stay below the low
+  watermark after the move (high/low gap = hysteresis)
+"""
+
+
+class RateMeter(object):
+    """Rates of monotonically increasing counters"""
+
+    def __init__(self, alpha=0.5):
+        """alpha: weight of the newest sample (1.0 = no smoothing)"""
+        self.alpha = alpha
+        self.samples = {}   # key -> (value, timestamp)
+        self.rates = {}     # key -> units/s
+
+    def update(self, key, value, now):
+        last = self.samples.get(key)
+        self.samples[key] = (value, now)
+        # A counter that went back (flow re-added) only rebases the sample
+        if last is not None and now > last[1] and value >= last[0]:
+            sample = (value - last[0]) / (now - last[1])
+            old = self.rates.get(key)
+            self.rates[key] = sample if old is None else old + self.alpha * (sample - old)
+        return self.rates.get(key, 0.0)
+
+    def rate(self, key):
+        return self.rates.get(key, 0.0)
+
+    def forget(self, match):
+        """Drop every key for which match(key) is true"""
+        for key in [k for k in self.samples if match(k)]:
+            del self.samples[key]
+            self.rates.pop(key, None)
+
+
+def plan_migrations(util, capacity, flows, high=0.8, low=0.5):
+    """
+    util: port -> utilization (0..1), capacity: port -> bits/s,
+    flows: [(key, bits/s, ports it uses now, candidate ports)].
+    Returns [(key, from port, to port)] for one switch.
+    """
+    util = dict(util)
+    moves = []
+    moved = set()
+    for port in sorted((p for p, u in util.items() if u > high), key=lambda p: -util[p]):
+        on_port = sorted((f for f in flows if port in f[2] and f[0] not in moved),
+                         key=lambda f: -f[1])
+        for key, rate, _, candidates in on_port:
+            if util[port] <= high:
+                break
+            best = None
+            for cand in candidates:
+                if cand == port or cand not in capacity:
+                    continue
+                after = util.get(cand, 0.0) + rate / capacity[cand]
+                if after < low and (best is None or after < best[1]):
+                    best = (cand, after)
+            if best is None:
+                continue
+            util[port] -= rate / capacity.get(port, rate or 1)
+            util[best[0]] = best[1]
+            moved.add(key)
+            moves.append((key, port, best[0]))
+    return moves